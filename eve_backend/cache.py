@@ -1,10 +1,144 @@
 import json
+import os
+import tempfile
+import threading
+import time
 from pathlib import Path
 import logging
-from typing import Optional
+from typing import Dict, Iterable, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# image downloads larger than this are discarded (portraits/logos are well below 1 MB)
+MAX_IMAGE_BYTES = 2 * 1024 * 1024
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+JPEG_SIGNATURE = b'\xff\xd8\xff'
+# size of images cached before sizes were part of the file name (`<id>.png`)
+LEGACY_IMAGE_SIZE = 64
+# image directories are re-listed at most this often to pick up files written
+# by other processes; writes made through a CacheManager update the index at once
+IMAGE_RECHECK_INTERVAL = 1.0
+# listings taken this soon after a directory changed may miss a change made
+# within the same timestamp tick, so they are redone on the next check
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+def is_image_data(head: bytes) -> bool:
+    """Return True if `head` starts with a PNG or JPEG signature."""
+    return head.startswith(PNG_SIGNATURE) or head.startswith(JPEG_SIGNATURE)
+
+
+def _parse_image_name(name: str) -> Optional[Tuple[str, int]]:
+    """(id, size) of a cached image file name, or None for other files."""
+    if name.startswith('.') or not name.endswith('.png'):
+        return None
+    stem = name[:-4]
+    if '_' not in stem:
+        return stem, LEGACY_IMAGE_SIZE
+    id, _, size = stem.rpartition('_')
+    try:
+        return id, int(size)
+    except ValueError:
+        return None
+
+
+class _ImageIndex:
+    """{id: {size: path}} for one img/<kind> directory, shared per process.
+
+    Built from one directory listing and kept current by the CacheManager
+    write paths, so per-image lookups are dictionary hits instead of globs.
+    The directory is re-listed when its mtime changed (checked at most every
+    IMAGE_RECHECK_INTERVAL seconds) to notice files written elsewhere.
+    """
+
+    def __init__(self, path: Path, clock=time.monotonic):
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sizes: Optional[Dict[str, Dict[int, Path]]] = None
+        self._mtime_ns = None
+        self._checked = 0.0
+        self._racy = True
+
+    def _refresh(self):
+        now = self._clock()
+        if self._sizes is not None and now - self._checked < IMAGE_RECHECK_INTERVAL:
+            return
+        self._checked = now
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._sizes, self._mtime_ns = {}, None
+            return
+        if self._sizes is not None and mtime_ns == self._mtime_ns and not self._racy:
+            return
+        sizes: Dict[str, Dict[int, Path]] = {}
+        try:
+            with os.scandir(self.path) as it:
+                for e in it:
+                    parsed = _parse_image_name(e.name)
+                    if parsed is None:
+                        continue
+                    by_size = sizes.setdefault(parsed[0], {})
+                    if '_' in e.name:
+                        by_size[parsed[1]] = Path(e.path)
+                    else:
+                        # a sized copy wins over the legacy file of the same size
+                        by_size.setdefault(parsed[1], Path(e.path))
+        except OSError:
+            pass
+        self._sizes = sizes
+        self._mtime_ns = mtime_ns
+        self._racy = time.time_ns() - mtime_ns < RACY_WINDOW_NS
+
+    def sizes(self, id: str) -> Dict[int, Path]:
+        with self._lock:
+            self._refresh()
+            return dict(self._sizes.get(id, ()))
+
+    def add(self, id: str, size: int, path: Path):
+        with self._lock:
+            self._refresh()
+            self._sizes.setdefault(id, {})[size] = path
+
+    def discard(self, id: str, size: int):
+        with self._lock:
+            if self._sizes is not None and id in self._sizes:
+                self._sizes[id].pop(size, None)
+                if not self._sizes[id]:
+                    del self._sizes[id]
+
+
+_image_indexes: Dict[str, _ImageIndex] = {}
+_image_indexes_lock = threading.Lock()
+
+
+def _image_index(path: Path) -> _ImageIndex:
+    key = os.path.abspath(str(path))
+    with _image_indexes_lock:
+        index = _image_indexes.get(key)
+        if index is None:
+            index = _image_indexes[key] = _ImageIndex(Path(key))
+        return index
+
+
+class CacheManifest:
+    """Snapshot of what is in the cache, built from one directory listing per kind.
+
+    json_mtimes: {kind: {id: mtime_ns}} for cached JSON documents
+    image_sizes: {kind: {id: largest cached size}}
+    """
+
+    def __init__(self, json_mtimes: Dict[str, Dict[str, int]], image_sizes: Dict[str, Dict[str, int]]):
+        self.json_mtimes = json_mtimes
+        self.image_sizes = image_sizes
+
+    def has_json(self, id: str, kind: str) -> bool:
+        return str(id) in self.json_mtimes.get(kind, {})
+
+    def has_image(self, id: str, kind: str, min_size: int = 0) -> bool:
+        return self.image_sizes.get(kind, {}).get(str(id), 0) >= min_size
+
 
 class CacheManager:
     def __init__(self, base: Optional[Path] = None):
@@ -22,12 +156,122 @@ class CacheManager:
             return self.base / 'corp' / f'{id}.json'
         raise ValueError('unknown kind')
 
-    def image_path(self, id: str, kind: str) -> Path:
-        if kind == 'char':
-            return self.base / 'img' / 'char' / f'{id}.png'
-        if kind == 'corp':
-            return self.base / 'img' / 'corp' / f'{id}.png'
-        raise ValueError('unknown kind')
+    def image_path(self, id: str, kind: str, size: Optional[int] = None) -> Path:
+        """Path of the cached image; `size=None` is the legacy unsized file (64px)."""
+        if kind not in ('char', 'corp'):
+            raise ValueError('unknown kind')
+        name = f'{id}.png' if size is None else f'{id}_{int(size)}.png'
+        return self.base / 'img' / kind / name
+
+    def _images(self, kind: str) -> _ImageIndex:
+        if kind not in ('char', 'corp'):
+            raise ValueError('unknown kind')
+        return _image_index(self.base / 'img' / kind)
+
+    def image_sizes(self, id: str, kind: str) -> Dict[int, Path]:
+        """Return {size: path} for every cached resolution of an image."""
+        return self._images(kind).sizes(str(id))
+
+    def _existing(self, id: str, kind: str, size: int, p: Path) -> bool:
+        # the index may lag behind files removed by someone else
+        if p.exists():
+            return True
+        self._images(kind).discard(str(id), size)
+        return False
+
+    def image_fingerprint(self, id: str, kind: str) -> Optional[str]:
+        """Identity of the largest cached copy ('<size>:<bytes>:<mtime_ns>'), or None.
+
+        Changes whenever a better resolution lands or the file is replaced, so
+        it can key anything rendered from the image without reading it.
+        """
+        sizes = self.image_sizes(id, kind)
+        for size in sorted(sizes, reverse=True):
+            try:
+                st = sizes[size].stat()
+            except OSError:
+                self._images(kind).discard(str(id), size)
+                continue
+            return f'{size}:{st.st_size}:{st.st_mtime_ns}'
+        return None
+
+    def composite_path(self, id: str, px: int, key: str) -> Path:
+        """Path of a rendered character tile (portrait + corp logo) at `px` device pixels."""
+        return self.base / 'img' / 'tile' / f'{id}_{int(px)}_{key}.png'
+
+    def prune_composites(self, id: str, px: int, keep: Path) -> None:
+        """Remove outdated tiles of one character at one size."""
+        for p in keep.parent.glob(f'{id}_{int(px)}_*.png'):
+            if p != keep:
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+
+    def manifest(self) -> CacheManifest:
+        """List the cache directories once instead of probing files one by one."""
+        json_mtimes = {}
+        image_sizes = {}
+        for kind in ('char', 'corp'):
+            entries = {}
+            try:
+                with os.scandir(self.base / kind) as it:
+                    for e in it:
+                        if e.name.endswith('.json'):
+                            entries[e.name[:-5]] = e.stat().st_mtime_ns
+            except FileNotFoundError:
+                pass
+            json_mtimes[kind] = entries
+
+            sizes = {}
+            try:
+                with os.scandir(self.base / 'img' / kind) as it:
+                    for e in it:
+                        parsed = _parse_image_name(e.name)
+                        if parsed is None:
+                            continue
+                        id, size = parsed
+                        if size > sizes.get(id, 0):
+                            sizes[id] = size
+            except FileNotFoundError:
+                pass
+            image_sizes[kind] = sizes
+        return CacheManifest(json_mtimes, image_sizes)
+
+    def char_corp_index(self, char_ids: Iterable[str], manifest: Optional[CacheManifest] = None) -> Dict[str, int]:
+        """Return {char_id: corporation_id} for cached characters.
+
+        Results are kept in cache/char_corp_index.json keyed by the JSON file's
+        mtime, so character JSON is only re-read when it changed.
+        """
+        manifest = manifest or self.manifest()
+        index_path = self.base / 'char_corp_index.json'
+        try:
+            index = json.loads(index_path.read_text())
+        except Exception:
+            index = {}
+        changed = False
+        result = {}
+        mtimes = manifest.json_mtimes.get('char', {})
+        for cid in char_ids:
+            cid = str(cid)
+            mtime = mtimes.get(cid)
+            if mtime is None:
+                continue
+            entry = index.get(cid)
+            if not entry or entry[1] != mtime:
+                data = self.load_json(cid, 'char') or {}
+                entry = [data.get('corporation_id'), mtime]
+                index[cid] = entry
+                changed = True
+            if entry[0]:
+                result[cid] = entry[0]
+        if changed:
+            fd, tmp = tempfile.mkstemp(prefix='.char_corp_index.', suffix='.part', dir=str(self.base))
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(index, fh)
+            os.replace(tmp, index_path)
+        return result
 
     def load_json(self, id: str, kind: str) -> Optional[dict]:
         p = self.json_path(id, kind)
@@ -42,18 +286,139 @@ class CacheManager:
 
     def save_json(self, id: str, kind: str, data: dict) -> None:
         p = self.json_path(id, kind)
-        p.write_text(json.dumps(data, indent=2))
+        # write aside and rename, so a crash never leaves truncated JSON behind
+        fd, tmp = tempfile.mkstemp(prefix=f'.{p.stem}.', suffix='.part', dir=str(p.parent))
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(data, fh, indent=2)
+            os.replace(tmp, p)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
         logger.info('Saved JSON cache %s/%s -> %s', kind, id, p)
 
-    def load_image(self, id: str, kind: str) -> Optional[Path]:
-        p = self.image_path(id, kind)
-        if p.exists():
-            logger.debug('Image cache hit %s/%s -> %s', kind, id, p)
+    def load_image(self, id: str, kind: str, size: Optional[int] = None, derive: bool = True) -> Optional[Path]:
+        """Return a cached image path.
+
+        Without `size` the largest cached copy is returned. With `size` only an
+        image of exactly that size is returned; if missing and `derive` is set it
+        is generated locally by downscaling the largest larger cached copy.
+        """
+        sizes = self.image_sizes(id, kind)
+        if size is None:
+            for s in sorted(sizes, reverse=True):
+                if self._existing(id, kind, s, sizes[s]):
+                    logger.debug('Image cache hit %s/%s -> %s', kind, id, sizes[s])
+                    return sizes[s]
+            return None
+        p = sizes.get(int(size))
+        if p and self._existing(id, kind, int(size), p):
+            logger.debug('Image cache hit %s/%s@%s -> %s', kind, id, size, p)
             return p
+        if derive:
+            return self.derive_image(id, kind, int(size), sizes)
         return None
 
-    def save_image_bytes(self, id: str, kind: str, data: bytes) -> Path:
-        p = self.image_path(id, kind)
+    def derive_image(self, id: str, kind: str, size: int, sizes: Optional[Dict[int, Path]] = None) -> Optional[Path]:
+        """Downscale the largest cached copy to `size` and store it in the cache.
+
+        Returns None if no cached copy is at least `size` pixels or Qt's image
+        support is unavailable; callers then fall back to fetching.
+        """
+        sizes = sizes if sizes is not None else self.image_sizes(id, kind)
+        larger = [s for s in sizes if s > size]
+        if not larger:
+            return None
+        src = sizes[max(larger)]
+        try:
+            # import Qt lazily; the backend itself does not require PySide6
+            from PySide6.QtCore import Qt
+            from PySide6.QtGui import QImage
+        except Exception:
+            return None
+        img = QImage(str(src))
+        if img.isNull():
+            logger.warning('Failed to decode cached image %s', src)
+            return None
+        scaled = img.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        p = self.image_path(id, kind, size)
+        fd, tmp = tempfile.mkstemp(prefix=f'.{p.stem}.', suffix='.part', dir=str(p.parent))
+        os.close(fd)
+        try:
+            if not scaled.save(tmp, 'PNG'):
+                return None
+            os.replace(tmp, p)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        self._images(kind).add(str(id), size, p)
+        logger.info('Derived image %s/%s@%s from %s', kind, id, size, src.name)
+        return p
+
+    def save_image_bytes(self, id: str, kind: str, data: bytes, size: Optional[int] = None) -> Path:
+        p = self.image_path(id, kind, size)
         p.write_bytes(data)
+        self._images(kind).add(str(id), LEGACY_IMAGE_SIZE if size is None else int(size), p)
+        self._drop_smaller(id, kind, size)
         logger.info('Saved image cache %s/%s -> %s', kind, id, p)
         return p
+
+    def _drop_smaller(self, id: str, kind: str, size: Optional[int]) -> None:
+        # smaller copies were derived from (or are older than) the new image;
+        # they are re-derived from it on demand
+        if size is None:
+            return
+        index = self._images(kind)
+        for s, p in index.sizes(str(id)).items():
+            if s < int(size):
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+                index.discard(str(id), s)
+
+    def save_image_stream(self, id: str, kind: str, chunks: Iterable[bytes], max_bytes: int = MAX_IMAGE_BYTES,
+                          size: Optional[int] = None) -> Optional[Path]:
+        """Write image chunks to a temp file and atomically move it into the cache.
+
+        Nothing is persisted if the data does not start with a PNG/JPEG signature
+        or grows beyond `max_bytes`; returns None in that case.
+        """
+        p = self.image_path(id, kind, size)
+        fd, tmp = tempfile.mkstemp(prefix=f'.{p.stem}.', suffix='.part', dir=str(p.parent))
+        ok = False
+        try:
+            written = 0
+            head = b''
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    written += len(chunk)
+                    if written > max_bytes:
+                        logger.warning('Image %s/%s exceeds %s bytes, discarding', kind, id, max_bytes)
+                        return None
+                    if len(head) < len(PNG_SIGNATURE):
+                        head += chunk[:len(PNG_SIGNATURE) - len(head)]
+                        if len(head) >= len(PNG_SIGNATURE) and not is_image_data(head):
+                            logger.warning('Image %s/%s is not PNG/JPEG data, discarding', kind, id)
+                            return None
+                    fh.write(chunk)
+            if not is_image_data(head):
+                logger.warning('Image %s/%s is empty or not PNG/JPEG data, discarding', kind, id)
+                return None
+            os.replace(tmp, p)
+            ok = True
+            self._images(kind).add(str(id), LEGACY_IMAGE_SIZE if size is None else int(size), p)
+            self._drop_smaller(id, kind, size)
+            logger.info('Saved image cache %s/%s -> %s (%s bytes)', kind, id, p, written)
+            return p
+        finally:
+            if not ok:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
@@ -0,0 +1,343 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import logging
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .filecopy import FileCopier, hash_cache, matches_digest, same_content
+from .prefetcher import CancelToken
+
+logger = logging.getLogger(__name__)
+
+# files copied from the source profile into a newly created profile
+TEMPLATE_FILES = [
+    "core_char__.dat",
+    "core_char_('char', None, 'dat').dat",
+    "core_user__.dat",
+    "core_public__.yaml",
+    "prefs.ini",
+]
+# threads writing the destinations of one source file; writes are small and
+# mostly wait on the disk, so a few in flight are enough to keep it busy
+FANOUT_WORKERS = 4
+
+
+class CopyJob:
+    """What to copy: one source character's settings onto other characters.
+
+    destinations: [(character id, account id)]; an unknown account (None)
+    fails the job before anything is written.
+    new_profile: create dest_profile and seed it with TEMPLATE_FILES first.
+    use_account_config: overwrite existing destination account files too,
+    instead of only creating missing ones.
+    """
+
+    def __init__(self, source_profile: Path, dest_profile: Path, source_char_id: str,
+                 source_account_id: str, destinations: Sequence[Tuple[str, Optional[str]]],
+                 use_account_config: bool = False, new_profile: bool = False,
+                 new_profile_name: str = ''):
+        self.source_profile = Path(source_profile)
+        self.dest_profile = Path(dest_profile)
+        self.source_char_id = str(source_char_id)
+        self.source_account_id = str(source_account_id)
+        self.destinations = [(str(c), str(a) if a else None) for c, a in destinations]
+        self.use_account_config = use_account_config
+        self.new_profile = new_profile
+        self.new_profile_name = new_profile_name
+
+
+class FileCopy:
+    """One planned file copy and, after the run, its outcome.
+
+    kind: 'template', 'char' or 'account'
+    status: 'pending', 'copied', 'skipped' (same file or nothing to do),
+    'unchanged' (destination already identical), 'failed' or 'cancelled'
+    """
+
+    def __init__(self, kind: str, src: Path, dst: Path, owner: str = ''):
+        self.kind = kind
+        self.src = src
+        self.dst = dst
+        self.owner = owner  # character / account the file belongs to
+        self.status = 'pending'
+        self.error: Optional[str] = None
+        # how a copied file was written: 'reflink', 'copy_file_range', 'sendfile' or 'userspace'
+        self.method: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return self.dst.name
+
+    def __repr__(self):
+        return f'FileCopy({self.kind!r}, {self.name!r}, {self.status!r})'
+
+
+class CopyResult:
+    """Outcome of a CopyEngine run.
+
+    status: 'ok', 'error' or 'cancelled'; message is ready to show the user.
+    """
+
+    def __init__(self, status: str, message: str, files: List[FileCopy], char_count: int = 0):
+        self.status = status
+        self.message = message
+        self.files = files
+        self.char_count = char_count
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'ok'
+
+    def copied(self, kind: Optional[str] = None) -> List[FileCopy]:
+        return [f for f in self.files if f.status == 'copied' and (kind is None or f.kind == kind)]
+
+    def failed(self) -> List[FileCopy]:
+        return [f for f in self.files if f.status == 'failed']
+
+    def unchanged(self) -> List[FileCopy]:
+        return [f for f in self.files if f.status == 'unchanged']
+
+    def methods(self) -> Dict[str, int]:
+        """Number of copied files per copy method."""
+        counts: Dict[str, int] = {}
+        for f in self.copied():
+            counts[f.method] = counts.get(f.method, 0) + 1
+        return counts
+
+
+class CopyEngine:
+    """Copies profile settings files for a CopyJob, off the GUI thread.
+
+    `plan()` lists every file copy up front (so progress has a total);
+    `run()` performs them grouped by source file, stopping at the first error
+    or when the cancel token fires. A source with several destinations (one
+    character layout rolled out to many characters) is written out by a small
+    thread pool. Files are copied by FileCopier (reflink first, userspace
+    last); each FileCopy records the method used. Files written before a stop
+    are left in place. Destinations that already hold the same bytes are
+    left alone (size compared first, then cached content hashes), so
+    re-running a job neither rewrites files nor bumps their mtimes.
+    """
+
+    def __init__(self, job: CopyJob):
+        self.job = job
+        self._copier = FileCopier()
+        self._hashes = hash_cache()
+
+    def plan(self) -> List[FileCopy]:
+        job = self.job
+        files: List[FileCopy] = []
+        if job.new_profile:
+            for name in TEMPLATE_FILES:
+                src = job.source_profile / name
+                if src.exists():
+                    files.append(FileCopy('template', src, job.dest_profile / name))
+        src_char = job.source_profile / f'core_char_{job.source_char_id}.dat'
+        src_account = job.source_profile / f'core_user_{job.source_account_id}.dat'
+        has_account = src_account.exists()
+        accounts = set()
+        for char_id, account_id in job.destinations:
+            files.append(FileCopy('char', src_char, job.dest_profile / f'core_char_{char_id}.dat', char_id))
+            if has_account and account_id and account_id not in accounts:
+                accounts.add(account_id)
+                files.append(FileCopy('account', src_account,
+                                      job.dest_profile / f'core_user_{account_id}.dat', account_id))
+        return files
+
+    def run(self, progress_callback: Optional[Callable[[int, int, FileCopy], None]] = None,
+            cancel_token: Optional[CancelToken] = None) -> CopyResult:
+        """Copy the planned files.
+
+        progress_callback(done, total, file) is called after each file.
+        """
+        job = self.job
+        char_count = len(job.destinations)
+        for char_id, account_id in job.destinations:
+            if not account_id:
+                return CopyResult('error', f'Could not determine account for character {char_id}', [])
+        src_char = job.source_profile / f'core_char_{job.source_char_id}.dat'
+        if not src_char.exists():
+            return CopyResult('error', f'Source character file not found: {src_char.name}', [])
+        files = self.plan()
+        if job.new_profile:
+            try:
+                job.dest_profile.mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                return CopyResult('error', f'Error creating new profile: {e}', files, char_count)
+
+        report = _Reporter(progress_callback, len(files))
+        for group in _by_source(files):
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            if len(group) == 1:
+                self._copy(group[0])
+                report(group[0])
+            else:
+                self._fan_out(group, report, cancel_token)
+            failed = [f for f in group if f.status == 'failed']
+            if failed:
+                return CopyResult('error', _error_message(failed[0]), files, char_count)
+        if any(f.status in ('pending', 'cancelled') for f in files):
+            for f in files:
+                if f.status == 'pending':
+                    f.status = 'cancelled'
+            copied = len(self._counted(files))
+            return CopyResult('cancelled', f'Cancelled after copying {copied} files', files, char_count)
+
+        message = f'Successfully copied {len(self._counted(files))} files to {char_count} character(s)'
+        if job.new_profile:
+            message += f" in new profile '{job.new_profile_name}'"
+        unchanged = sum(f.status == 'unchanged' for f in files)
+        if unchanged:
+            message += f', {unchanged} skipped unchanged'
+        return CopyResult('ok', message, files, char_count)
+
+    def _skip(self, f: FileCopy) -> bool:
+        """Decide whether `f` needs no write; sets its status if so."""
+        # an existing account file is kept unless the account config is wanted
+        if f.kind == 'account' and not self.job.use_account_config and f.dst.exists():
+            f.status = 'skipped'
+        elif f.dst.exists() and f.src.resolve() == f.dst.resolve():
+            # e.g. the source character also picked as a destination
+            f.status = 'skipped'
+        return f.status == 'skipped'
+
+    def _unchanged(self, f: FileCopy) -> bool:
+        if same_content(f.src, f.dst, self._hashes):
+            f.status = 'unchanged'
+        return f.status == 'unchanged'
+
+    def _copy(self, f: FileCopy):
+        try:
+            if not self._skip(f) and not self._unchanged(f):
+                f.method = self._copier.copy(f.src, f.dst)
+                f.status = 'copied'
+        except Exception as e:
+            _fail(f, e)
+
+    def _fan_out(self, group: List[FileCopy], report: Callable[[FileCopy], None],
+                 cancel_token: Optional[CancelToken]):
+        """Copy one source to many destinations in parallel.
+
+        The source is hashed at most once (and only if some destination has
+        its size), and where a userspace copy is needed it is read only once.
+        After the first failed write the remaining destinations are left
+        untouched.
+        """
+        todo = []
+        for f in group:
+            try:
+                skipped = self._skip(f)
+            except Exception as e:
+                _fail(f, e)
+                skipped = True
+            if skipped:
+                report(f)
+            else:
+                todo.append(f)
+        if not todo or any(f.status == 'failed' for f in group):
+            return
+        src = todo[0].src
+        try:
+            size, digest = self._source_digest(src, todo)
+        except Exception as e:
+            _fail(todo[0], e)
+            report(todo[0])
+            return
+        buffer = _SharedRead(src)
+        stop = threading.Event()
+
+        def write(f: FileCopy) -> FileCopy:
+            if stop.is_set():
+                return f
+            if cancel_token is not None and cancel_token.cancelled:
+                f.status = 'cancelled'
+                return f
+            try:
+                if digest is not None and matches_digest(f.dst, size, digest, self._hashes):
+                    f.status = 'unchanged'
+                else:
+                    f.method = self._copier.copy(src, f.dst, read=buffer.read)
+                    f.status = 'copied'
+            except Exception as e:
+                _fail(f, e)
+                stop.set()
+            return f
+
+        with ThreadPoolExecutor(max_workers=min(FANOUT_WORKERS, len(todo)),
+                                thread_name_prefix='copy-fanout') as pool:
+            for fut in as_completed([pool.submit(write, f) for f in todo]):
+                f = fut.result()
+                if f.status != 'pending':
+                    report(f)
+
+    def _source_digest(self, src: Path, files: List[FileCopy]) -> Tuple[int, Optional[bytes]]:
+        """Size of `src`, and its hash if any destination has that size."""
+        st = os.stat(src)
+        for f in files:
+            try:
+                if os.stat(f.dst).st_size == st.st_size:
+                    return st.st_size, self._hashes.digest(src, st)
+            except FileNotFoundError:
+                pass
+        return st.st_size, None
+
+    @staticmethod
+    def _counted(files: List[FileCopy]) -> List[FileCopy]:
+        # the summary counts character and account files; templates are reported separately
+        return [f for f in files if f.status == 'copied' and f.kind != 'template']
+
+
+class _SharedRead:
+    """Content of one file, read on first use and then shared between threads."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data: Optional[bytes] = None
+
+    def read(self) -> bytes:
+        with self._lock:
+            if self._data is None:
+                self._data = self.path.read_bytes()
+            return self._data
+
+
+class _Reporter:
+    """Numbers finished files for progress_callback(done, total, file)."""
+
+    def __init__(self, callback, total: int):
+        self.callback = callback
+        self.total = total
+        self.done = 0
+
+    def __call__(self, f: FileCopy):
+        self.done += 1
+        if self.callback:
+            try:
+                self.callback(self.done, self.total, f)
+            except Exception:
+                logger.exception('Copy progress callback failed')
+
+
+def _by_source(files: List[FileCopy]) -> List[List[FileCopy]]:
+    """Files grouped by source path, in order of first appearance."""
+    groups: Dict[Path, List[FileCopy]] = {}
+    for f in files:
+        groups.setdefault(f.src, []).append(f)
+    return list(groups.values())
+
+
+def _fail(f: FileCopy, e: Exception):
+    logger.warning('Failed to copy %s -> %s: %s', f.src, f.dst, e)
+    f.status = 'failed'
+    f.error = str(e)
+
+
+def _error_message(f: FileCopy) -> str:
+    if f.kind == 'template':
+        return f'Error copying template {f.name}: {f.error}'
+    if f.kind == 'char':
+        return f'Error copying character file for {f.owner}: {f.error}'
+    return f'Error copying account file for {f.owner}: {f.error}'
@@ -1,39 +1,310 @@
 import logging
 import os
-from typing import Optional
+import threading
+import time
+from typing import List, Optional
 from urllib.parse import urljoin
 
-from .cache import CacheManager
+from .cache import CacheManager, MAX_IMAGE_BYTES
 
 logger = logging.getLogger(__name__)
 # control whether to log full ESI responses (set env EVE_BACKEND_LOG_ESI_RESPONSE=1)
 LOG_ESI_RESPONSES = os.getenv('EVE_BACKEND_LOG_ESI_RESPONSE', '0').lower() in ('1', 'true', 'yes')
 
 
-ESI_BASE = 'https://esi.evetech.net/latest/'
-IMG_BASE = 'https://images.evetech.net/'
+# base URLs can be pointed at a local stand-in server (see tests/esi_stub.py)
+ESI_BASE = os.getenv('EVE_BACKEND_ESI_BASE', 'https://esi.evetech.net/latest/')
+IMG_BASE = os.getenv('EVE_BACKEND_IMG_BASE', 'https://images.evetech.net/')
+IMAGE_CHUNK_SIZE = 16 * 1024
+# POST /characters/affiliation/ accepts at most this many IDs per call
+AFFILIATION_BATCH = 1000
+# how often a request in flight re-checks its cancel token
+CANCEL_POLL_INTERVAL = 0.05
+# keep-alive connections kept per host; enough for every prefetch stage's
+# workers and the refresher to each hold one
+HTTP_POOL_SIZE = 32
 
 
-def get_character(character_id: int, cache: Optional[CacheManager] = None) -> Optional[dict]:
+class RequestCancelled(Exception):
+    """Raised inside a download when its cancel token fires."""
+
+
+class CircuitBreaker:
+    """Stop hitting ESI/image server after repeated connection failures.
+
+    States: 'closed' (requests allowed), 'open' (requests short-circuited until
+    `reset_timeout` seconds passed) and 'half_open' (a single probe request is
+    allowed; success closes the breaker, failure opens it again).
+    Offline mode (set_offline / env EVE_BACKEND_OFFLINE=1) blocks all requests.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.offline = os.getenv('EVE_BACKEND_OFFLINE', '0').lower() in ('1', 'true', 'yes')
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half_open'
+        return 'open'
+
+    def allow_request(self) -> bool:
+        if self.offline:
+            return False
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._probing:
+                # let exactly one probe through to test whether the server is back
+                self._probing = True
+                logger.info('Circuit breaker half-open, probing')
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info('Circuit breaker closed')
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    logger.warning('Circuit breaker open after %s failure(s)', self._failures)
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def reset(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+
+circuit_breaker = CircuitBreaker()
+
+
+def set_offline(offline: bool = True):
+    """Enable/disable offline mode: all fetchers return cached data or None without network access."""
+    circuit_breaker.offline = bool(offline)
+    logger.info('ESI offline mode %s', 'enabled' if offline else 'disabled')
+
+
+def is_offline() -> bool:
+    return circuit_breaker.offline
+
+
+def is_available() -> bool:
+    """True when requests are currently going out (not offline, breaker closed)."""
+    return not circuit_breaker.offline and circuit_breaker.state == 'closed'
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def http_session():
+    """The process-wide requests.Session, reusing connections across threads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            # import requests lazily to avoid hard dep on import time
+            import requests
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+
+class FetchOutcome:
+    """How the last request of a fetch went, for callers that need more than its result.
+
+    status_code stays None when no HTTP answer arrived (skipped by the
+    breaker / offline mode, connection error, timeout, cancelled).
+    stale_size is set when an image fetch returned a cached copy of another
+    size instead, because no request could be made.
+    """
+
+    def __init__(self):
+        self.status_code: Optional[int] = None
+        self.stale_size = False
+
+    @property
+    def answered(self) -> bool:
+        """True if the server gave a definite (non-5xx) answer."""
+        return self.status_code is not None and self.status_code < 500
+
+
+def _request(url: str, what: str, stream: bool = False, cancel_token=None, stats=None, json_body=None,
+             outcome: Optional[FetchOutcome] = None):
+    """GET `url` through the circuit breaker, on the shared http_session().
+
+    Returns the response, or None when the breaker is open, offline mode is on,
+    or the request failed. Connection errors/timeouts (requests raises OSError
+    subclasses) and 5xx responses count as failures; anything else that got an
+    answer from the server counts as success. `stats` (a
+    prefetch_progress.RequestStats) counts requests actually sent. With
+    `json_body` the request is a POST of that JSON document. `outcome` gets
+    the status code of the answer, if any. Once `cancel_token` fires the
+    request is abandoned and None returned, even while it is in flight.
+    """
+    if cancel_token is not None and cancel_token.cancelled:
+        return None
+    if not circuit_breaker.allow_request():
+        logger.debug('Skipping %s: ESI unavailable (offline or circuit open)', what)
+        return None
+    session = http_session()
+    logger.debug('Request URL: %s', url)
+    if stats is not None:
+        stats.add_request()
+
+    def send():
+        try:
+            if json_body is not None:
+                r = session.post(url, json=json_body, timeout=10)
+            elif stream:
+                r = session.get(url, timeout=10, stream=True)
+            else:
+                r = session.get(url, timeout=10)
+        except OSError:
+            circuit_breaker.record_failure()
+            logger.warning('Connection failed for %s', what)
+            return None
+        except Exception:
+            circuit_breaker.record_failure()
+            logger.exception('Request failed for %s', what)
+            return None
+        if outcome is not None:
+            outcome.status_code = r.status_code
+        if r.status_code >= 500:
+            circuit_breaker.record_failure()
+        else:
+            circuit_breaker.record_success()
+        return r
+
+    if cancel_token is None:
+        return send()
+    r = _until_cancelled(send, cancel_token)
+    if r is not None and cancel_token.cancelled:
+        # answered just as the token fired: drop it like the abandoned ones
+        _close(r)
+        return None
+    return r
+
+
+def _until_cancelled(send, cancel_token):
+    """Run `send()` on a helper thread and wait for it or for the cancel token.
+
+    requests cannot interrupt a blocking read, so a cancelled request is
+    abandoned instead: the caller gets None right away, and the response is
+    closed whenever it arrives.
+    """
+    lock = threading.Lock()
+    state = {}
+    done = threading.Event()
+
+    def call():
+        r = send()
+        with lock:
+            state['response'] = r
+            abandoned = state.get('abandoned', False)
+        done.set()
+        if abandoned and r is not None:
+            _close(r)
+
+    threading.Thread(target=call, name='esi-request', daemon=True).start()
+    while not done.wait(CANCEL_POLL_INTERVAL):
+        if cancel_token.cancelled:
+            with lock:
+                if 'response' not in state:
+                    state['abandoned'] = True
+                    return None
+            break
+    return state['response']
+
+
+def _close(r):
+    close = getattr(r, 'close', None)
+    if close:
+        close()
+
+
+def _watch_chunks(chunks, cancel_token, stats):
+    """Pass chunks through, aborting on cancel and counting received bytes."""
+    for chunk in chunks:
+        if cancel_token is not None and cancel_token.cancelled:
+            raise RequestCancelled()
+        if stats is not None:
+            stats.add_bytes(len(chunk))
+        yield chunk
+
+
+def _download_image(r, cid: str, kind: str, size: int, cache: CacheManager, max_bytes: int,
+                    cancel_token=None, stats=None):
+    """Stream a 200 image response into the cache; returns the cached path or None."""
+    try:
+        if r.status_code != 200:
+            return None
+        length = None
+        try:
+            length = int(getattr(r, 'headers', {}).get('Content-Length'))
+        except (TypeError, ValueError):
+            pass
+        if LOG_ESI_RESPONSES:
+            logger.debug('Image response length for %s/%s: %s', kind, cid, length)
+        if length is not None and length > max_bytes:
+            logger.warning('Image %s/%s too large (%s bytes), skipping', kind, cid, length)
+            return None
+        chunks = _watch_chunks(r.iter_content(chunk_size=IMAGE_CHUNK_SIZE), cancel_token, stats)
+        return cache.save_image_stream(cid, kind, chunks, max_bytes=max_bytes, size=size)
+    finally:
+        _close(r)
+
+
+def get_character(character_id: int, cache: Optional[CacheManager] = None, cancel_token=None,
+                  stats=None, refresh: bool = False, outcome: Optional[FetchOutcome] = None) -> Optional[dict]:
+    """Character JSON, from the cache unless `refresh` is set."""
     cache = cache or CacheManager()
     cid = str(character_id)
-    cached = cache.load_json(cid, 'char')
+    cached = None if refresh else cache.load_json(cid, 'char')
     if cached:
         logger.debug('Character %s cache hit', cid)
+        if stats is not None:
+            stats.add_cache_hit()
         return cached
-    # import requests lazily to avoid hard dep on import time
-    import requests
-    url = f'https://esi.evetech.net/latest/characters/{character_id}'
+    url = f'{ESI_BASE}characters/{character_id}'
     try:
         logger.info('Fetching character %s from ESI', cid)
-        logger.debug('Request URL: %s', url)
-        r = requests.get(url, timeout=10)
+        r = _request(url, f'character {cid}', cancel_token=cancel_token, stats=stats, outcome=outcome)
+        if r is None:
+            return None
         logger.debug('ESI response for character %s: %s', cid, r.status_code)
         if LOG_ESI_RESPONSES:
             try:
                 logger.debug('ESI response body for %s: %s', cid, r.text[:4000])
             except Exception:
                 logger.debug('Failed to read response body for %s', cid)
+        if stats is not None:
+            stats.add_bytes(len(getattr(r, 'content', b'') or b''))
         if r.status_code == 200:
             data = r.json()
             cache.save_json(cid, 'char', data)
@@ -44,25 +315,31 @@ def get_character(character_id: int, cache: Optional[CacheManager] = None) -> Op
     return None
 
 
-def get_corporation(corporation_id: int, cache: Optional[CacheManager] = None) -> Optional[dict]:
+def get_corporation(corporation_id: int, cache: Optional[CacheManager] = None, cancel_token=None,
+                    stats=None, refresh: bool = False, outcome: Optional[FetchOutcome] = None) -> Optional[dict]:
+    """Corporation JSON, from the cache unless `refresh` is set."""
     cache = cache or CacheManager()
     cid = str(corporation_id)
-    cached = cache.load_json(cid, 'corp')
+    cached = None if refresh else cache.load_json(cid, 'corp')
     if cached:
         logger.debug('Corporation %s cache hit', cid)
+        if stats is not None:
+            stats.add_cache_hit()
         return cached
-    import requests
-    url = f'https://esi.evetech.net/latest/corporations/{corporation_id}'
+    url = f'{ESI_BASE}corporations/{corporation_id}'
     try:
         logger.info('Fetching corporation %s from ESI', cid)
-        logger.debug('Request URL: %s', url)
-        r = requests.get(url, timeout=10)
+        r = _request(url, f'corporation {cid}', cancel_token=cancel_token, stats=stats, outcome=outcome)
+        if r is None:
+            return None
         logger.debug('ESI response for corp %s: %s', cid, r.status_code)
         if LOG_ESI_RESPONSES:
             try:
                 logger.debug('ESI response body for corp %s: %s', cid, r.text[:4000])
             except Exception:
                 logger.debug('Failed to read corp response body for %s', cid)
+        if stats is not None:
+            stats.add_bytes(len(getattr(r, 'content', b'') or b''))
         if r.status_code == 200:
             data = r.json()
             cache.save_json(cid, 'corp', data)
@@ -73,57 +350,98 @@ def get_corporation(corporation_id: int, cache: Optional[CacheManager] = None) -
     return None
 
 
-def fetch_character_image(character_id: int, size: int = 64, cache: Optional[CacheManager] = None):
+def get_affiliations(character_ids, cancel_token=None, stats=None) -> Optional[List[dict]]:
+    """Current corporation/alliance of up to AFFILIATION_BATCH characters in one request.
+
+    Returns ESI's list of {character_id, corporation_id, alliance_id?}, or None
+    when the request could not be made or failed. Not cached.
+    """
+    ids = [int(c) for c in character_ids]
+    if not ids:
+        return []
+    if len(ids) > AFFILIATION_BATCH:
+        raise ValueError(f'at most {AFFILIATION_BATCH} ids per affiliation request')
+    url = f'{ESI_BASE}characters/affiliation/'
+    try:
+        logger.info('Fetching affiliations for %s characters', len(ids))
+        r = _request(url, f'affiliation of {len(ids)} characters', cancel_token=cancel_token, stats=stats,
+                     json_body=ids)
+        if r is None:
+            return None
+        if stats is not None:
+            stats.add_bytes(len(getattr(r, 'content', b'') or b''))
+        if r.status_code == 200:
+            return r.json()
+        logger.warning('Affiliation lookup returned %s', r.status_code)
+    except Exception:
+        logger.exception('Failed to fetch affiliations')
+    return None
+
+
+def _stale_image(cache: CacheManager, cid: str, kind: str, outcome: Optional[FetchOutcome]):
+    img = cache.load_image(cid, kind)
+    if img is not None and outcome is not None:
+        outcome.stale_size = True
+    return img
+
+
+def fetch_character_image(character_id: int, size: int = 64, cache: Optional[CacheManager] = None,
+                          max_bytes: int = MAX_IMAGE_BYTES, cancel_token=None, stats=None,
+                          outcome: Optional[FetchOutcome] = None):
     cache = cache or CacheManager()
     cid = str(character_id)
-    img = cache.load_image(cid, 'char')
+    img = cache.load_image(cid, 'char', size)
     if img:
-        logger.debug('Character image %s cache hit', cid)
+        logger.debug('Character image %s@%s cache hit', cid, size)
+        if stats is not None:
+            stats.add_cache_hit()
         return img
-    import requests
     url = f'{IMG_BASE}characters/{character_id}/portrait?size={size}'
-    logger.debug('Request URL: %s', url)
-    r = requests.get(url, timeout=10)
     try:
         logger.info('Fetching character image %s', cid)
+        r = _request(url, f'character image {cid}', stream=True, cancel_token=cancel_token, stats=stats,
+                     outcome=outcome)
+        if r is None:
+            # offline or ESI down: serve whatever resolution we have
+            return _stale_image(cache, cid, 'char', outcome)
         logger.debug('Image response status for %s: %s', cid, r.status_code)
-        if LOG_ESI_RESPONSES:
-            try:
-                logger.debug('Image response length for %s: %s', cid, len(r.content))
-            except Exception:
-                logger.debug('Failed to read image content length for %s', cid)
-        if r.status_code == 200:
-            path = cache.save_image_bytes(cid, 'char', r.content)
+        path = _download_image(r, cid, 'char', size, cache, max_bytes, cancel_token, stats)
+        if path:
             logger.info('Saved character image %s -> %s', cid, path)
-            return path
+        return path
+    except RequestCancelled:
+        logger.info('Character image %s download cancelled', cid)
     except Exception:
         logger.exception('Failed to fetch character image %s', cid)
     return None
 
 
-def fetch_corporation_logo(corporation_id: int, size: int = 64, cache: Optional[CacheManager] = None):
+def fetch_corporation_logo(corporation_id: int, size: int = 64, cache: Optional[CacheManager] = None,
+                           max_bytes: int = MAX_IMAGE_BYTES, cancel_token=None, stats=None,
+                           outcome: Optional[FetchOutcome] = None):
     cache = cache or CacheManager()
     cid = str(corporation_id)
-    img = cache.load_image(cid, 'corp')
+    img = cache.load_image(cid, 'corp', size)
     if img:
-        logger.debug('Corporation logo %s cache hit', cid)
+        logger.debug('Corporation logo %s@%s cache hit', cid, size)
+        if stats is not None:
+            stats.add_cache_hit()
         return img
-    import requests
     url = f'{IMG_BASE}corporations/{corporation_id}/logo?size={size}'
-    logger.debug('Request URL: %s', url)
-    r = requests.get(url, timeout=10)
     try:
         logger.info('Fetching corporation logo %s', cid)
+        r = _request(url, f'corp logo {cid}', stream=True, cancel_token=cancel_token, stats=stats,
+                     outcome=outcome)
+        if r is None:
+            # offline or ESI down: serve whatever resolution we have
+            return _stale_image(cache, cid, 'corp', outcome)
         logger.debug('Corp logo response status for %s: %s', cid, r.status_code)
-        if LOG_ESI_RESPONSES:
-            try:
-                logger.debug('Corp logo response length for %s: %s', cid, len(r.content))
-            except Exception:
-                logger.debug('Failed to read corp logo content length for %s', cid)
-        if r.status_code == 200:
-            path = cache.save_image_bytes(cid, 'corp', r.content)
+        path = _download_image(r, cid, 'corp', size, cache, max_bytes, cancel_token, stats)
+        if path:
             logger.info('Saved corp logo %s -> %s', cid, path)
-            return path
+        return path
+    except RequestCancelled:
+        logger.info('Corp logo %s download cancelled', cid)
     except Exception:
         logger.exception('Failed to fetch corp logo %s', cid)
     return None
@@ -0,0 +1,219 @@
+import errno
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+import logging
+from typing import Callable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# a file modified this close to when it was hashed may change again within the
+# same timestamp tick without its (size, mtime) changing; such hashes are not kept
+RACY_WINDOW_NS = 2 * 10 ** 9
+HASH_CACHE_SIZE = 4096
+
+# errors meaning "this method does not work between these devices"; EINVAL
+# only counts as such if the method never worked for the pair
+_UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY}
+# errors that make a method fail for one file only (e.g. a file the kernel
+# refuses to splice); that file falls back to the next method
+_FILE_ONLY = {errno.EINVAL, errno.EPERM, errno.EBADF}
+
+
+def _reflink(in_fd: int, out_fd: int, size: int) -> bool:
+    """Share the source's extents (btrfs, XFS, ...): no data is read or written."""
+    if not sys.platform.startswith('linux'):
+        return False
+    import fcntl
+    fcntl.ioctl(out_fd, FICLONE, in_fd)
+    return True
+
+
+def _copy_file_range(in_fd: int, out_fd: int, size: int) -> bool:
+    """In-kernel copy; may become a server-side copy or a reflink itself."""
+    if not hasattr(os, 'copy_file_range'):
+        return False
+    offset = 0
+    while offset < size:
+        n = os.copy_file_range(in_fd, out_fd, size - offset, offset, offset)
+        if n == 0:
+            # some filesystems report success without copying anything, or the
+            # file shrank meanwhile: fall back for this file
+            return False
+        offset += n
+    return True
+
+
+def _sendfile(in_fd: int, out_fd: int, size: int) -> bool:
+    """In-kernel copy through the page cache, without a userspace buffer."""
+    if not hasattr(os, 'sendfile') or not sys.platform.startswith('linux'):
+        return False
+    offset = 0
+    while offset < size:
+        n = os.sendfile(out_fd, in_fd, offset, size - offset)
+        if n == 0:
+            return False
+        offset += n
+    return True
+
+
+# tried in order; a userspace copy is the last resort
+METHODS: List[Tuple[str, Callable[[int, int, int], bool]]] = [
+    ('reflink', _reflink),
+    ('copy_file_range', _copy_file_range),
+    ('sendfile', _sendfile),
+]
+
+
+class FileCopier:
+    """Copies files like shutil.copy2, using the cheapest method that works.
+
+    Each copy tries a reflink, then copy_file_range, then sendfile, then
+    a plain read/write, and returns the name of the method that did it.
+    A method that turns out unsupported between two devices (see
+    _UNSUPPORTED) is not tried again for that pair, so a large fan-out pays
+    for the probing only once; a method that merely fails for one file (no
+    progress, EPERM, ...) is skipped for that file only.
+    Thread-safe.
+    """
+
+    def __init__(self, methods=None):
+        self.methods = list(METHODS if methods is None else methods)
+        self._lock = threading.Lock()
+        self._unsupported: Set[Tuple[str, int, int]] = set()
+        self._worked: Set[Tuple[str, int, int]] = set()
+
+    def copy(self, src: Path, dst: Path, read: Optional[Callable[[], bytes]] = None) -> str:
+        """Copy `src` to `dst` with metadata; returns the method used.
+
+        read: returns the source content for a userspace copy, e.g. from a
+        buffer shared by many copies of the same file.
+        """
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            in_fd, out_fd = fsrc.fileno(), fdst.fileno()
+            st = os.fstat(in_fd)
+            devs = (st.st_dev, os.fstat(out_fd).st_dev)
+            method = None
+            for name, fn in self.methods:
+                key = (name, *devs)
+                if key in self._unsupported:
+                    continue
+                try:
+                    if fn(in_fd, out_fd, st.st_size):
+                        method = name
+                        if key not in self._worked:
+                            with self._lock:
+                                self._worked.add(key)
+                        break
+                    logger.debug('%s made no progress for %s -> %s', name, src, dst)
+                except OSError as e:
+                    unsupported = e.errno in _UNSUPPORTED or (e.errno == errno.EINVAL and key not in self._worked)
+                    if not unsupported and e.errno not in _FILE_ONLY:
+                        raise
+                    if unsupported:
+                        logger.debug('%s unsupported for %s -> %s', name, src, dst)
+                        with self._lock:
+                            self._unsupported.add(key)
+                    else:
+                        logger.debug('%s failed for %s -> %s: %s', name, src, dst, e)
+                # start the next method from a clean, empty file
+                os.ftruncate(out_fd, 0)
+                os.lseek(out_fd, 0, os.SEEK_SET)
+            if method is None:
+                if read is not None:
+                    fdst.write(read())
+                else:
+                    shutil.copyfileobj(fsrc, fdst)
+                method = 'userspace'
+        shutil.copystat(src, dst)
+        return method
+
+
+class HashCache:
+    """Content hashes of files keyed by (path, size, mtime_ns).
+
+    A hit costs one stat, so re-checking an unchanged destination reads no
+    data. Least recently used entries are dropped beyond `max_entries`.
+    Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = HASH_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple[str, int, int], bytes]' = OrderedDict()
+
+    def digest(self, path: Path, st: Optional[os.stat_result] = None) -> bytes:
+        if st is None:
+            st = os.stat(path)
+        key = (os.path.abspath(str(path)), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._entries.get(key)
+            if digest is not None:
+                self._entries.move_to_end(key)
+                return digest
+        digest = self._hash(path)
+        if time.time_ns() - st.st_mtime_ns >= RACY_WINDOW_NS:
+            with self._lock:
+                self._entries[key] = digest
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return digest
+
+    @staticmethod
+    def _hash(path: Path) -> bytes:
+        h = hashlib.blake2b()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(1 << 20), b''):
+                h.update(chunk)
+        return h.digest()
+
+
+def same_content(src: Path, dst: Path, hashes: Optional[HashCache] = None) -> bool:
+    """True if `dst` exists with the same bytes as `src` (sizes compared first)."""
+    try:
+        dst_st = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    src_st = os.stat(src)
+    if src_st.st_size != dst_st.st_size:
+        return False
+    if hashes is None:
+        hashes = hash_cache()
+    return hashes.digest(src, src_st) == hashes.digest(dst, dst_st)
+
+
+def matches_digest(dst: Path, size: int, digest: bytes, hashes: Optional[HashCache] = None) -> bool:
+    """True if `dst` exists with `size` bytes hashing to `digest`.
+
+    Lets many destinations be checked against one source hashed only once.
+    """
+    try:
+        dst_st = os.stat(dst)
+    except FileNotFoundError:
+        return False
+    if dst_st.st_size != size:
+        return False
+    if hashes is None:
+        hashes = hash_cache()
+    return hashes.digest(dst, dst_st) == digest
+
+
+_hash_cache: Optional[HashCache] = None
+_hash_cache_lock = threading.Lock()
+
+
+def hash_cache() -> HashCache:
+    """The process-wide HashCache."""
+    global _hash_cache
+    with _hash_cache_lock:
+        if _hash_cache is None:
+            _hash_cache = HashCache()
+        return _hash_cache
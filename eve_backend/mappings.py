@@ -0,0 +1,238 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# a file modified this close to when it was read may be rewritten within the
+# same timestamp tick; such "racy" loads are verified by content on next access
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+class MappingsSnapshot:
+    """Immutable view of one version of mappings.json with lookup indexes.
+
+    status: 'ok', 'missing' (no file) or 'bad' (unreadable / invalid JSON)
+    accounts: account keys in numeric order
+    """
+
+    def __init__(self, data: Optional[Dict] = None, status: str = 'ok', version: int = 0):
+        self.data = data or {}
+        self.status = status
+        self.version = version
+        self.dat_roots: List[str] = list(self.data.get('dat_roots', []))
+        self._chars: Dict[str, Tuple[str, ...]] = {}
+        self._account_of: Dict[str, str] = {}
+        for acc, info in self.data.get('mappings', {}).items():
+            chars = tuple(str(c) for c in info.get('chars', []))
+            self._chars[str(acc)] = chars
+            for cid in chars:
+                self._account_of.setdefault(cid, str(acc))
+        self.accounts: List[str] = sorted(self._chars, key=_account_sort_key)
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'ok'
+
+    def chars_of(self, account) -> Tuple[str, ...]:
+        return self._chars.get(str(account), ())
+
+    def account_of(self, char_id) -> Optional[str]:
+        return self._account_of.get(str(char_id))
+
+    def char_ids(self) -> List[int]:
+        """Unique character IDs over all accounts, sorted."""
+        return sorted(int(c) for c in self._account_of)
+
+    def items(self) -> List[Tuple[str, Tuple[str, ...]]]:
+        """[(account, chars)] in account order."""
+        return [(acc, self._chars[acc]) for acc in self.accounts]
+
+    def first_dat_root(self) -> Optional[Path]:
+        return Path(self.dat_roots[0]) if self.dat_roots else None
+
+
+def _account_sort_key(acc: str):
+    try:
+        return (0, int(acc), acc)
+    except ValueError:
+        return (1, 0, acc)
+
+
+class MappingsModel:
+    """Shared, thread-safe in-memory copy of mappings.json.
+
+    The file is parsed once and re-read only when its size or mtime changes
+    (`snapshot()` costs one stat otherwise). Callers take a snapshot per
+    operation and use its O(1) char -> account / account -> chars lookups.
+
+    Listeners registered with `subscribe()` are called as
+    `callback(old_snapshot, new_snapshot)` whenever the content changes, on
+    the thread that noticed the change (a reader, `refresh()` or a write
+    through this model); GUI code should hop threads via a Qt signal.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._snapshot = MappingsSnapshot(status='missing')
+        self._stat_key = None
+        self._raw = None
+        self._racy = False
+        self._version = 0
+        self._listeners: List[Callable] = []
+        self._loaded = False
+
+    # -- reading ---------------------------------------------------------
+
+    def snapshot(self) -> MappingsSnapshot:
+        """Current mappings, revalidated against the file."""
+        changed = None
+        with self._lock:
+            old, was_loaded = self._snapshot, self._loaded
+            if self._revalidate() and was_loaded:
+                changed = (old, self._snapshot)
+        if changed:
+            self._notify(*changed)
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Re-check the file now; returns True if the content changed."""
+        before = self._snapshot
+        return self.snapshot() is not before
+
+    def _revalidate(self) -> bool:
+        try:
+            st = self.path.stat()
+        except OSError:
+            if self._stat_key is None and self._loaded:
+                return False
+            self._set(MappingsSnapshot(status='missing', version=self._version + 1), None, None)
+            return True
+        key = (st.st_size, st.st_mtime_ns, st.st_ino)
+        if key == self._stat_key and not self._racy:
+            return False
+        try:
+            raw = self.path.read_bytes()
+        except OSError:
+            raw = None
+        if self._loaded and raw is not None and raw == self._raw:
+            # same content (e.g. a touch, or a racy load that turned out fine)
+            self._stat_key = key
+            self._racy = time.time_ns() - st.st_mtime_ns < RACY_WINDOW_NS
+            return False
+        snap = self._parse(raw)
+        self._set(snap, key, raw)
+        self._racy = time.time_ns() - st.st_mtime_ns < RACY_WINDOW_NS
+        return True
+
+    def _parse(self, raw: Optional[bytes]) -> MappingsSnapshot:
+        version = self._version + 1
+        if raw is None:
+            return MappingsSnapshot(status='bad', version=version)
+        try:
+            data = json.loads(raw)
+            if not isinstance(data, dict):
+                raise ValueError('mappings.json must contain an object')
+        except Exception:
+            logger.warning('Failed to read %s', self.path)
+            return MappingsSnapshot(status='bad', version=version)
+        return MappingsSnapshot(data, version=version)
+
+    def _set(self, snap: MappingsSnapshot, stat_key, raw):
+        self._snapshot = snap
+        self._version = snap.version
+        self._stat_key = stat_key
+        self._raw = raw
+        self._loaded = True
+
+    # -- writing ---------------------------------------------------------
+
+    def remove_account(self, account: str) -> bool:
+        """Drop one account from mappings.json; False if it was not there."""
+        def edit(data):
+            mappings = data.get('mappings', {})
+            if str(account) not in mappings:
+                return False
+            del mappings[str(account)]
+            data['mappings'] = mappings
+            return True
+        return self._update(edit)
+
+    def clear_accounts(self) -> bool:
+        def edit(data):
+            data['mappings'] = {}
+            return True
+        return self._update(edit)
+
+    def _update(self, edit: Callable[[Dict], bool]) -> bool:
+        # pick up (and announce) outside changes first, so the edit applies to them
+        self.snapshot()
+        with self._lock:
+            self._revalidate()
+            old = self._snapshot
+            if not old.ok:
+                return False
+            data = json.loads(self._raw)
+            if not edit(data):
+                return False
+            raw = json.dumps(data, indent=2).encode()
+            fd, tmp = tempfile.mkstemp(prefix='.mappings.', suffix='.tmp', dir=str(self.path.parent))
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    fh.write(raw)
+                os.replace(tmp, self.path)
+            except OSError:
+                logger.exception('Failed to write %s', self.path)
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                return False
+            st = self.path.stat()
+            self._set(MappingsSnapshot(data, version=self._version + 1),
+                      (st.st_size, st.st_mtime_ns, st.st_ino), raw)
+            self._racy = True
+            new = self._snapshot
+        self._notify(old, new)
+        return True
+
+    # -- change notification ----------------------------------------------
+
+    def subscribe(self, callback: Callable[[MappingsSnapshot, MappingsSnapshot], None]) -> Callable[[], None]:
+        """Call `callback(old, new)` on every change; returns an unsubscribe function."""
+        with self._lock:
+            self._listeners.append(callback)
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._listeners:
+                    self._listeners.remove(callback)
+        return unsubscribe
+
+    def _notify(self, old: MappingsSnapshot, new: MappingsSnapshot):
+        with self._lock:
+            listeners = list(self._listeners)
+        for cb in listeners:
+            try:
+                cb(old, new)
+            except Exception:
+                logger.exception('Mappings listener failed')
+
+
+_models: Dict[str, MappingsModel] = {}
+_models_lock = threading.Lock()
+
+
+def shared_mappings(path=None) -> MappingsModel:
+    """The process-wide MappingsModel for `path` (default ./mappings.json)."""
+    path = Path(path) if path else Path.cwd() / 'mappings.json'
+    key = os.path.abspath(str(path))
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = _models[key] = MappingsModel(Path(key))
+        return model
@@ -0,0 +1,136 @@
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# share of the query's trigrams a name needs for a fuzzy (typo tolerant) match
+FUZZY_THRESHOLD = 0.5
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """Character id <-> name lookups plus ranked name search for completion.
+
+    `search()` ranks, in this order: names starting with the query, names with
+    a word starting with it, names containing it, and names sharing most of
+    its trigrams (typos, transpositions). Prefix lookups bisect sorted lists
+    and the rest go through a trigram index, so a search over thousands of
+    names takes well under a millisecond instead of a scan per keystroke;
+    queries too short for trigrams (one or two characters) fall back to a
+    linear substring scan. Characters sharing a name appear once in
+    `search` results; `search_labels` lists each of them separately as
+    'Name (id)', and `id_of_label` maps such a label back to its character.
+    Built once per roster; not thread-safe for concurrent rebuilds.
+    """
+
+    def __init__(self, pairs: Iterable[Tuple[str, str]] = ()):
+        self.rebuild(pairs)
+
+    def rebuild(self, pairs: Iterable[Tuple[str, str]]):
+        """Replace the index with [(character id, name)]."""
+        self._name_of: Dict[str, str] = {}
+        self._id_of: Dict[str, List[str]] = {}
+        self._id_of_lower: Dict[str, List[str]] = {}
+        for cid, name in pairs:
+            cid = str(cid)
+            name = name or cid
+            self._name_of[cid] = name
+            self._id_of.setdefault(name, []).append(cid)
+            self._id_of_lower.setdefault(name.lower(), []).append(cid)
+        self._label_of: Dict[str, str] = {}
+        self._id_of_label: Dict[str, str] = {}
+        for name, ids in self._id_of.items():
+            for cid in ids:
+                label = name if len(ids) == 1 else f'{name} ({cid})'
+                self._label_of[cid] = label
+                self._id_of_label.setdefault(label, cid)
+        names = sorted(self._id_of, key=lambda n: (n.lower(), n))
+        self._names: List[str] = names
+        self._sorted: List[Tuple[str, str]] = [(n.lower(), n) for n in names]
+        self._words: List[Tuple[str, str]] = sorted(
+            (n.lower()[i:], n) for n in names for i in range(1, len(n)) if n[i - 1] in ' -_.\'' and n[i] != ' ')
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        for lower, name in self._sorted:
+            for t in _trigrams(lower):
+                self._trigrams[t].add(name)
+
+    def __len__(self):
+        return len(self._name_of)
+
+    def name_of(self, cid) -> Optional[str]:
+        return self._name_of.get(str(cid))
+
+    def id_of(self, name: str) -> Optional[str]:
+        """Character id of an exact name, falling back to a case-insensitive match.
+
+        With several characters of that name, the first one indexed.
+        """
+        ids = self.ids_of(name)
+        return ids[0] if ids else None
+
+    def ids_of(self, name: str) -> List[str]:
+        """Ids of all characters with this name (exact match, else case-insensitive)."""
+        return list(self._id_of.get(name) or self._id_of_lower.get(name.lower()) or ())
+
+    def label_of(self, cid) -> Optional[str]:
+        """Name to show for a character: 'Name (id)' when others share its name."""
+        return self._label_of.get(str(cid))
+
+    def id_of_label(self, label: str) -> Optional[str]:
+        """Character id of a label from `search_labels`, else of a name (see `id_of`)."""
+        return self._id_of_label.get(label) or self.id_of(label)
+
+    def names(self) -> List[str]:
+        """All names, case-insensitively sorted."""
+        return list(self._names)
+
+    def search(self, query: str, limit: int = 50) -> List[str]:
+        q = query.strip().lower()
+        if not q:
+            return self._names[:limit]
+        results: List[str] = []
+        seen: Set[str] = set()
+
+        def take(names) -> bool:
+            for name in names:
+                if name not in seen:
+                    seen.add(name)
+                    results.append(name)
+                    if len(results) >= limit:
+                        return True
+            return False
+
+        if take(_prefixed(self._sorted, q)) or take(_prefixed(self._words, q)):
+            return results
+        grams = _trigrams(q)
+        if not grams:
+            # too short for the trigram index: scan for substrings instead
+            take(name for lower, name in self._sorted if q in lower)
+            return results
+        counts = Counter()
+        for t in grams:
+            counts.update(self._trigrams.get(t, ()))
+        # substring matches contain every trigram of the query
+        full = sorted((n for n, c in counts.items() if c == len(grams) and q in n.lower()), key=str.lower)
+        if take(full):
+            return results
+        needed = len(grams) * FUZZY_THRESHOLD
+        fuzzy = sorted((n for n, c in counts.items() if c >= needed), key=lambda n: (-counts[n], n.lower()))
+        take(fuzzy)
+        return results
+
+    def search_labels(self, query: str, limit: int = 50) -> List[str]:
+        """Like `search`, with one label per character (see `label_of`)."""
+        labels: List[str] = []
+        for name in self.search(query, limit):
+            labels.extend(self._label_of[cid] for cid in self._id_of[name])
+        return labels[:limit]
+
+
+def _prefixed(entries: List[Tuple[str, str]], q: str):
+    i = bisect_left(entries, (q,))
+    while i < len(entries) and entries[i][0].startswith(q):
+        yield entries[i][1]
+        i += 1
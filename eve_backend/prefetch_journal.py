@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+import logging
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# retry delay after the n-th consecutive failure: BASE * 2**(n-1), capped at MAX
+RETRY_BASE_DELAY = 60.0
+RETRY_MAX_DELAY = 24 * 3600.0
+
+
+def item_key(stage: str, id) -> str:
+    """Journal key for a work item, e.g. 'portrait:12345'."""
+    return f'{stage}:{id}'
+
+
+class PrefetchJournal:
+    """On-disk record of planned, completed and failed prefetch work items.
+
+    Stored as JSON (default cache/prefetch_journal.json):
+      planned:  keys planned by a run that has not finished yet; the next run
+                resumes these first
+      failures: {key: {attempts, next_retry, last_error}}; failed items are
+                skipped until `next_retry` (exponential backoff across runs)
+
+    Updates are buffered and written atomically every `flush_every` updates
+    or `flush_interval` seconds, and on `finish()`.
+    """
+
+    def __init__(self, path: Path, flush_every: int = 50, flush_interval: float = 2.0):
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._last_flush = time.monotonic()
+        self.planned: List[str] = []
+        self._planned_set = set()
+        self.failures = {}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text())
+            self.planned = list(data.get('planned', []))
+            self._planned_set = set(self.planned)
+            self.failures = dict(data.get('failures', {}))
+        except Exception:
+            logger.warning('Ignoring unreadable prefetch journal %s', self.path)
+
+    def pending(self) -> List[str]:
+        """Keys left over from an interrupted run, in their original order."""
+        with self._lock:
+            return list(self.planned)
+
+    def should_attempt(self, key: str, now: Optional[float] = None) -> bool:
+        with self._lock:
+            f = self.failures.get(key)
+        if not f:
+            return True
+        return (now if now is not None else time.time()) >= f.get('next_retry', 0)
+
+    def start(self, keys: Iterable[str]):
+        """Record the work planned for this run (replaces the previous plan)."""
+        with self._lock:
+            self.planned = list(keys)
+            self._planned_set = set(self.planned)
+            self._dirty += 1
+        self.flush()
+
+    def add(self, key: str):
+        """Add a work item discovered while the run is in progress."""
+        with self._lock:
+            if key not in self._planned_set:
+                self.planned.append(key)
+                self._planned_set.add(key)
+                self._dirty += 1
+        self.maybe_flush()
+
+    def mark_done(self, key: str):
+        with self._lock:
+            self._planned_set.discard(key)
+            self.failures.pop(key, None)
+            self._dirty += 1
+        self.maybe_flush()
+
+    def mark_failed(self, key: str, error: str = ''):
+        with self._lock:
+            self._planned_set.discard(key)
+            f = self.failures.get(key) or {'attempts': 0}
+            f['attempts'] += 1
+            delay = min(RETRY_BASE_DELAY * 2 ** (f['attempts'] - 1), RETRY_MAX_DELAY)
+            f['next_retry'] = time.time() + delay
+            f['last_error'] = error
+            self.failures[key] = f
+            self._dirty += 1
+        logger.info('Prefetch item %s failed (attempt %s), retry in %.0fs', key, f['attempts'], delay)
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        with self._lock:
+            due = self._dirty >= self.flush_every or (
+                self._dirty and time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            # keep only unfinished items, preserving plan order
+            self.planned = [k for k in self.planned if k in self._planned_set]
+            data = {'version': 1, 'planned': self.planned, 'failures': self.failures}
+            self._dirty = 0
+            self._last_flush = time.monotonic()
+            fd, tmp = tempfile.mkstemp(prefix='.prefetch_journal.', suffix='.part', dir=str(self.path.parent))
+            try:
+                with os.fdopen(fd, 'w') as fh:
+                    json.dump(data, fh)
+                os.replace(tmp, self.path)
+            except Exception:
+                logger.exception('Failed to write prefetch journal %s', self.path)
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+
+    def finish(self):
+        """Flush at the end of a run.
+
+        Items that were neither completed nor failed (cancelled, offline, circuit
+        open) stay planned and are resumed first by the next run.
+        """
+        self.flush()
@@ -0,0 +1,152 @@
+import threading
+import time
+from typing import Dict, Optional
+
+# stages in pipeline order
+STAGES = ('char', 'portrait', 'corp', 'logo')
+
+
+def _format_bytes(n: int) -> str:
+    if n >= 1024 * 1024:
+        return f'{n / (1024 * 1024):.1f} MB'
+    if n >= 1024:
+        return f'{n / 1024:.0f} KB'
+    return f'{n} B'
+
+
+class StageStats:
+    """Counters for one pipeline stage."""
+
+    def __init__(self):
+        self.total = 0
+        self.done = 0
+        self.errors = 0
+
+    def to_dict(self) -> dict:
+        return {'total': self.total, 'done': self.done, 'errors': self.errors}
+
+
+class RequestStats:
+    """Network counters filled in by esi_client (requests sent, bytes received, cache hits).
+
+    Shared by all worker threads of a run, so updates are locked.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes = 0
+        self.cache_hits = 0
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_bytes(self, n: int):
+        with self._lock:
+            self.bytes += n
+
+    def add_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+
+class ProgressEvent:
+    """Snapshot of a prefetch run, passed to Prefetcher's `event_callback`.
+
+    kind: 'plan' (once, before fetching), 'progress' (after each item),
+          'complete' or 'cancelled' (once, at the end)
+    message: the human readable message also sent to `progress_callback`
+    done/total: work items processed / planned over all stages
+    stages: {stage: {total, done, errors}}
+    rate: items per second so far; eta: estimated seconds left (None if unknown)
+    """
+
+    def __init__(self, kind: str, message: str, stage: Optional[str], done: int, total: int,
+                 stages: Dict[str, dict], requests: int, bytes: int, cache_hits: int, errors: int,
+                 elapsed: float, rate: float, eta: Optional[float]):
+        self.kind = kind
+        self.message = message
+        self.stage = stage
+        self.done = done
+        self.total = total
+        self.stages = stages
+        self.requests = requests
+        self.bytes = bytes
+        self.cache_hits = cache_hits
+        self.errors = errors
+        self.elapsed = elapsed
+        self.rate = rate
+        self.eta = eta
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            'kind': self.kind,
+            'message': self.message,
+            'stage': self.stage,
+            'done': self.done,
+            'total': self.total,
+            'stages': self.stages,
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'cache_hits': self.cache_hits,
+            'errors': self.errors,
+            'elapsed': round(self.elapsed, 3),
+            'rate': round(self.rate, 3),
+            'eta': None if self.eta is None else round(self.eta, 1),
+        }
+
+    def summary(self) -> str:
+        """Short status line, e.g. '120/480 items, 35.2/s, 1.4 MB, ETA 0:10'."""
+        parts = [f'{self.done}/{self.total} items', f'{self.rate:.1f}/s', _format_bytes(self.bytes)]
+        if self.errors:
+            parts.append(f'{self.errors} failed')
+        if self.eta is not None:
+            minutes, seconds = divmod(int(round(self.eta)), 60)
+            parts.append(f'ETA {minutes}:{seconds:02d}')
+        return ', '.join(parts)
+
+    def __repr__(self):
+        return f'ProgressEvent({self.kind!r}, {self.done}/{self.total}, {self.message!r})'
+
+
+class ProgressTracker:
+    """Per-run progress bookkeeping for Prefetcher; builds ProgressEvents."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._start = clock()
+        self.stages = {s: StageStats() for s in STAGES}
+        self.requests = RequestStats()
+
+    def add_total(self, stage: str, n: int = 1):
+        with self._lock:
+            self.stages[stage].total += n
+
+    def item_done(self, stage: str, ok: bool):
+        with self._lock:
+            st = self.stages[stage]
+            st.done += 1
+            if not ok:
+                st.errors += 1
+
+    def event(self, kind: str, message: str, stage: Optional[str] = None) -> ProgressEvent:
+        with self._lock:
+            stages = {s: st.to_dict() for s, st in self.stages.items()}
+        done = sum(s['done'] for s in stages.values())
+        total = sum(s['total'] for s in stages.values())
+        elapsed = self._clock() - self._start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if rate > 0 else None
+        if kind == 'complete':
+            eta = 0.0
+        req = self.requests
+        return ProgressEvent(kind, message, stage, done, total, stages,
+                             req.requests, req.bytes, req.cache_hits,
+                             sum(s['errors'] for s in stages.values()),
+                             elapsed, rate, eta)
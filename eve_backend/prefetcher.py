@@ -1,109 +1,517 @@
-import json
+import queue
+import threading
+import time
+from collections import deque
 from pathlib import Path
-from typing import Callable, Optional
+from typing import Callable, List, Optional, Set
 
-from .cache import CacheManager
-from .esi_client import get_character, get_corporation, fetch_character_image, fetch_corporation_logo
+from .cache import CacheManager, CacheManifest
+from .esi_client import (FetchOutcome, get_character, get_corporation, fetch_character_image,
+                         fetch_corporation_logo)
+from .mappings import shared_mappings
+from .prefetch_journal import PrefetchJournal, item_key
+from .prefetch_progress import ProgressTracker
 import logging
 
 logger = logging.getLogger(__name__)
 
+# fetch images large enough for 80px portraits / 20px logos at up to 3x scaling;
+# smaller sizes are derived locally from these
+PORTRAIT_SIZE = 256
+LOGO_SIZE = 64
+
+# sentinel telling a stage worker to exit
+_STOP = object()
+# how often blocked queue waits re-check the cancel token
+POLL_INTERVAL = 0.1
+# minimum seconds between 'progress' events (plan/complete/cancelled always go out)
+EVENT_INTERVAL = 0.1
+
 
 class CancelToken:
     def __init__(self):
-        self._cancelled = False
+        self._event = threading.Event()
 
     def cancel(self):
-        self._cancelled = True
+        self._event.set()
 
     @property
     def cancelled(self):
-        return self._cancelled
+        return self._event.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until cancelled or `timeout` elapsed; returns True if cancelled."""
+        return self._event.wait(timeout)
+
+
+class PriorityWorkQueue:
+    """Queue-compatible work list whose order can be changed while it drains.
+
+    Items are handed out in insertion order, except that ids passed to
+    `prioritize` jump ahead (in the given order) whenever they are still
+    pending. `put(_STOP)` sentinels are only handed out once all work is gone.
+    Unlike the bounded corp/logo queues this one is unbounded, so `put` never
+    blocks: it holds every planned id (one int each) so they can be reordered.
+    """
+
+    def __init__(self, items=()):
+        self._cond = threading.Condition()
+        self._items = dict.fromkeys(items)
+        self._priority: deque = deque()
+        self._stops = 0
+
+    def prioritize(self, ids):
+        with self._cond:
+            self._priority = deque(i for i in ids if i in self._items)
+
+    def put(self, item):
+        with self._cond:
+            if item is _STOP:
+                self._stops += 1
+            else:
+                self._items[item] = None
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None):
+        with self._cond:
+            while True:
+                while self._priority:
+                    item = self._priority.popleft()
+                    if item in self._items:
+                        del self._items[item]
+                        return item
+                if self._items:
+                    item = next(iter(self._items))
+                    del self._items[item]
+                    return item
+                if self._stops:
+                    self._stops -= 1
+                    return _STOP
+                if not self._cond.wait(timeout):
+                    raise queue.Empty
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+
+class PrefetchPlan:
+    """Minimal work list for a prefetch run, computed from the cache manifest.
+
+    chars/portraits: character IDs whose JSON / portrait is missing
+    corps/logos: corporation IDs (known from cached characters) whose JSON /
+    logo is missing; corps of characters fetched during the run are planned
+    on the fly.
+    """
+
+    def __init__(self, char_ids: List[int], chars: List[int], portraits: List[int],
+                 corps: List[int], logos: List[int], known_corps: Set[int],
+                 manifest: Optional[CacheManifest] = None):
+        self.char_ids = char_ids
+        self.chars = chars
+        self.portraits = portraits
+        self.corps = corps
+        self.logos = logos
+        self.known_corps = known_corps
+        self.manifest = manifest
+        self.deferred = 0
+        self._deferred_chars = set()
+
+    @property
+    def total(self) -> int:
+        return len(self.char_ids)
+
+    @property
+    def work_chars(self) -> List[int]:
+        """Characters with at least one missing item, in roster order."""
+        need = set(self.chars) | set(self.portraits)
+        return [cid for cid in self.char_ids if cid in need]
+
+    @property
+    def cached(self) -> int:
+        return self.total - len(self.work_chars) - len(self._deferred_chars - set(self.work_chars))
+
+    @property
+    def empty(self) -> bool:
+        return not (self.chars or self.portraits or self.corps or self.logos)
+
+    def keys(self) -> List[str]:
+        """Journal keys of all planned items."""
+        return ([item_key('char', c) for c in self.chars] + [item_key('portrait', c) for c in self.portraits]
+                + [item_key('corp', c) for c in self.corps] + [item_key('logo', c) for c in self.logos])
+
+    def apply_journal(self, journal: PrefetchJournal) -> None:
+        """Drop items still in retry backoff and move unfinished items of an interrupted run to the front."""
+        now = time.time()
+
+        def keep(stage, ids):
+            kept = []
+            for i in ids:
+                if journal.should_attempt(item_key(stage, i), now):
+                    kept.append(i)
+                else:
+                    self.deferred += 1
+                    if stage in ('char', 'portrait'):
+                        self._deferred_chars.add(i)
+            return kept
+
+        self.chars = keep('char', self.chars)
+        self.portraits = keep('portrait', self.portraits)
+        self.corps = keep('corp', self.corps)
+        self.logos = keep('logo', self.logos)
+
+        resumed = []
+        for key in journal.pending():
+            stage, _, id = key.partition(':')
+            if stage in ('char', 'portrait') and id.isdigit():
+                resumed.append(int(id))
+        if resumed:
+            first = [c for c in dict.fromkeys(resumed) if c in set(self.char_ids)]
+            rest = set(first)
+            self.char_ids = first + [c for c in self.char_ids if c not in rest]
 
 
 class Prefetcher:
     """Prefetch character and corporation data/images for IDs found in mappings.json.
 
     Usage: Prefetcher().run(progress_callback=callable, cancel_token=CancelToken())
-    progress_callback receives a string message.
+    progress_callback receives a string message (possibly from a worker thread);
+    event_callback, if given, receives prefetch_progress.ProgressEvent objects
+    with per-stage counts, request/byte totals, throughput and ETA.
+    item_callback, if given, is called as item_callback(stage, id) each time
+    an item lands in the cache (stage: 'char', 'portrait', 'corp' or 'logo'),
+    so views can update just the affected entity.
+
+    A planning step first diffs the roster against the cache manifest (see
+    `plan`), so only missing items are fetched. The work then runs as a
+    pipeline of stages, each served by `workers` threads. The character
+    stages draw from reorderable work lists of the planned ids; the
+    corporation stages are fed through bounded queues (backpressure):
+
+        char ids -> character JSON -> corporation JSON
+                 |                 -> corporation logo
+                 -> portrait
+
+    Corporation IDs are deduplicated as they are discovered. Progress counts a
+    character as done once all of its missing items were processed, so the
+    total is the number of characters that needed work.
+
+    Characters are processed in roster order unless `prioritize` was called
+    (e.g. by the GUI with the characters currently on screen); those jump
+    ahead of the remaining work, and the list can be updated at any time.
     """
 
-    def __init__(self, cache: Optional[CacheManager] = None, mappings_path: Optional[str] = None):
+    def __init__(self, cache: Optional[CacheManager] = None, mappings_path: Optional[str] = None,
+                 workers: int = 4, queue_size: int = 64, journal: Optional[PrefetchJournal] = None):
         self.cache = cache or CacheManager()
         self.mappings_path = Path(mappings_path) if mappings_path else (Path.cwd() / 'mappings.json')
+        self.journal = journal or PrefetchJournal(self.cache.base / 'prefetch_journal.json')
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+        self._emit_lock = threading.Lock()
+        self._priority_lock = threading.Lock()
+        self._priority: List[int] = []
+        self._priority_queues: List[PriorityWorkQueue] = []
 
-    def _emit(self, cb: Optional[Callable], msg: str):
+    def prioritize(self, char_ids) -> None:
+        """Fetch these characters first (thread-safe; replaces the previous list)."""
+        ids = [int(c) for c in char_ids]
+        with self._priority_lock:
+            self._priority = ids
+            queues = list(self._priority_queues)
+        for q in queues:
+            q.prioritize(ids)
+
+    def _emit(self, cb: Optional[Callable], *args):
         if cb:
             try:
-                cb(msg)
+                with self._emit_lock:
+                    cb(*args)
             except Exception:
                 pass
 
-    def run(self, progress_callback: Optional[Callable] = None, cancel_token: Optional[CancelToken] = None):
+    def _report(self, progress_callback, event_callback, tracker: ProgressTracker, state: dict,
+                kind: str, message: str, stage: Optional[str] = None):
+        """Send `message` to progress_callback (if non-empty) and a throttled event to event_callback."""
+        if message:
+            self._emit(progress_callback, message)
+        if not event_callback:
+            return
+        now = time.monotonic()
+        with self._emit_lock:
+            if kind == 'progress' and now - state.get('last_event', 0.0) < EVENT_INTERVAL:
+                return
+            state['last_event'] = now
+        self._emit(event_callback, tracker.event(kind, message, stage))
+
+    def run(self, progress_callback: Optional[Callable] = None, cancel_token: Optional[CancelToken] = None,
+            event_callback: Optional[Callable] = None, item_callback: Optional[Callable] = None):
         cancel_token = cancel_token or CancelToken()
         logger.info('Prefetcher starting with mappings: %s', self.mappings_path)
-        if not self.mappings_path.exists():
+        snap = shared_mappings(self.mappings_path).snapshot()
+        if snap.status == 'missing':
             self._emit(progress_callback, 'mappings.json not found')
             return {'status': 'no_mappings'}
-
-        try:
-            data = json.loads(self.mappings_path.read_text())
-        except Exception:
+        if not snap.ok:
             self._emit(progress_callback, 'failed to read mappings.json')
             return {'status': 'bad_mappings'}
 
-        mappings = data.get('mappings', {})
-        # collect unique char ids
-        char_ids = set()
-        for acc, info in mappings.items():
-            for c in info.get('chars', []):
-                char_ids.add(int(c))
+        plan = self.plan(snap.char_ids())
+        plan.apply_journal(self.journal)
+        tracker = ProgressTracker()
+        for stage, ids in (('char', plan.chars), ('portrait', plan.portraits),
+                           ('corp', plan.corps), ('logo', plan.logos)):
+            tracker.add_total(stage, len(ids))
+        event_state = {}
+
+        def report(message, kind='progress', stage=None):
+            self._report(progress_callback, event_callback, tracker, event_state, kind, message, stage)
+
+        report(f'{plan.cached} of {plan.total} already cached', kind='plan')
+        if plan.deferred:
+            self._emit(progress_callback, f'{plan.deferred} failed item(s) deferred until retry')
+        logger.info('Prefetch plan: %s of %s chars cached; missing %s char JSON, %s portraits, %s corp JSON, %s logos',
+                    plan.cached, plan.total, len(plan.chars), len(plan.portraits), len(plan.corps), len(plan.logos))
+        if plan.empty:
+            self.journal.start([])
+            report('prefetch complete', kind='complete')
+            return {'status': 'ok', 'done': plan.total, 'cached': plan.cached, 'fetched': 0, 'failed': 0,
+                    'deferred': plan.deferred}
+        self.journal.start(plan.keys())
+        return self._run_pipeline(plan, report, tracker, cancel_token, item_callback)
+
+    def plan(self, char_ids: List[int], manifest: Optional[CacheManifest] = None) -> PrefetchPlan:
+        """Diff `char_ids` against the cache without touching the network."""
+        manifest = manifest or self.cache.manifest()
+        chars = [cid for cid in char_ids if not manifest.has_json(str(cid), 'char')]
+        portraits = [cid for cid in char_ids if not manifest.has_image(str(cid), 'char', PORTRAIT_SIZE)]
+        corp_of = self.cache.char_corp_index([str(cid) for cid in char_ids], manifest)
+        known_corps = set()
+        for cid in char_ids:
+            corp_id = corp_of.get(str(cid))
+            if corp_id:
+                known_corps.add(int(corp_id))
+        corps = sorted(c for c in known_corps if not manifest.has_json(str(c), 'corp'))
+        logos = sorted(c for c in known_corps if not manifest.has_image(str(c), 'corp', LOGO_SIZE))
+        return PrefetchPlan(list(char_ids), chars, portraits, corps, logos, known_corps, manifest)
+
+    def _run_pipeline(self, plan: PrefetchPlan, report: Callable, tracker: ProgressTracker, cancel_token,
+                      item_callback: Optional[Callable] = None):
+        manifest = plan.manifest or self.cache.manifest()
+        work_chars = plan.work_chars
+        total = len(work_chars)
+        # all character work is known up front, so these hold the whole list
+        # (cheap: one int per item) and can be reordered by prioritize()
+        need_json = set(plan.chars)
+        need_portrait = set(plan.portraits)
+        char_q = PriorityWorkQueue(cid for cid in work_chars if cid in need_json)
+        portrait_q = PriorityWorkQueue(cid for cid in work_chars if cid in need_portrait)
+        with self._priority_lock:
+            self._priority_queues = [char_q, portrait_q]
+            priority = list(self._priority)
+        char_q.prioritize(priority)
+        portrait_q.prioritize(priority)
+        corp_q = queue.Queue(maxsize=self.queue_size)
+        logo_q = queue.Queue(maxsize=self.queue_size)
+
+        lock = threading.Lock()
+        # per-character stages still outstanding (JSON and/or portrait)
+        pending = {cid: 0 for cid in work_chars}
+        for cid in plan.chars:
+            pending[cid] += 1
+        for cid in plan.portraits:
+            pending[cid] += 1
+        seen_corps = set(plan.known_corps)
+        # done: characters processed; fetched: those whose every missing item arrived
+        state = {'done': 0, 'fetched': 0}
+        failed_chars = set()
+        stats = tracker.requests
 
-        total = len(char_ids)
-        i = 0
-        for cid in sorted(char_ids):
+        def char_step_done(cid):
+            with lock:
+                pending[cid] -= 1
+                if pending[cid] or cancel_token.cancelled:
+                    return
+                state['done'] += 1
+                if cid not in failed_chars:
+                    state['fetched'] += 1
+                done = state['done']
+            report(f'Fetched char {cid} ({done}/{total})', stage='char')
+
+        journal = self.journal
+
+        def record(stage, id, result, outcome: FetchOutcome):
+            key = item_key(stage, id)
+            if outcome.stale_size:
+                # a cached image of another size, served because nothing went out
+                result = None
             if cancel_token.cancelled:
-                self._emit(progress_callback, 'cancelled')
-                logger.info('Prefetcher cancelled after %s items', i)
-                return {'status': 'cancelled', 'done': i}
-            i += 1
-            self._emit(progress_callback, f'Fetching char {cid} ({i}/{total})')
-            logger.info('Prefetcher fetching char %s (%s/%s)', cid, i, total)
-
-            # fetch JSON
+                # the run is winding down; whatever landed is picked up by the next plan
+                return
+            tracker.item_done(stage, result is not None)
+            if result is None and stage in ('char', 'portrait'):
+                with lock:
+                    failed_chars.add(id)
+            if result is not None:
+                journal.mark_done(key)
+                self._emit(item_callback, stage, id)
+            elif outcome.answered:
+                # the server answered (4xx, or nothing usable): back off
+                journal.mark_failed(key, f'HTTP {outcome.status_code}')
+            # else no answer (offline, circuit open, connection error, 5xx):
+            # leave it planned so the next run resumes it
+            if stage in ('corp', 'logo'):
+                report('', stage=stage)
+
+        def handle_char(cid):
+            outcome = FetchOutcome()
             try:
-                char = get_character(cid, cache=self.cache)
+                char = get_character(cid, cache=self.cache, cancel_token=cancel_token, stats=stats,
+                                     outcome=outcome)
                 logger.debug('get_character(%s) returned type=%s', cid, type(char))
             except Exception:
                 char = None
                 logger.exception('get_character(%s) raised', cid)
+            record('char', cid, char, outcome)
+            # fetch corp info if present and not cached yet
+            corp_id = char.get('corporation_id') if isinstance(char, dict) else None
+            if corp_id:
+                with lock:
+                    new_corp = corp_id not in seen_corps
+                    seen_corps.add(corp_id)
+                if new_corp:
+                    need_json = (not manifest.has_json(str(corp_id), 'corp')
+                                 and journal.should_attempt(item_key('corp', corp_id)))
+                    need_logo = (not manifest.has_image(str(corp_id), 'corp', LOGO_SIZE)
+                                 and journal.should_attempt(item_key('logo', corp_id)))
+                    if need_json or need_logo:
+                        report(f'Fetching corp {corp_id}', stage='corp')
+                        logger.info('Prefetcher fetching corp %s for char %s', corp_id, cid)
+                    if need_json:
+                        tracker.add_total('corp')
+                        journal.add(item_key('corp', corp_id))
+                        self._put(corp_q, corp_id, cancel_token)
+                    if need_logo:
+                        tracker.add_total('logo')
+                        journal.add(item_key('logo', corp_id))
+                        self._put(logo_q, corp_id, cancel_token)
+            char_step_done(cid)
 
-            # fetch portrait
+        def handle_portrait(cid):
+            img_path = None
+            outcome = FetchOutcome()
             try:
-                img_path = fetch_character_image(cid, cache=self.cache)
+                img_path = fetch_character_image(cid, size=PORTRAIT_SIZE, cache=self.cache,
+                                                 cancel_token=cancel_token, stats=stats, outcome=outcome)
                 logger.debug('fetch_character_image(%s) -> %s', cid, img_path)
             except Exception:
                 logger.exception('Error fetching portrait for %s', cid)
-            # fetch corp info if present
-            corp_id = None
-            if isinstance(char, dict):
-                corp_id = char.get('corporation_id')
-            if corp_id:
-                self._emit(progress_callback, f'Fetching corp {corp_id}')
-                logger.info('Prefetcher fetching corp %s for char %s', corp_id, cid)
-                try:
-                    corp = get_corporation(corp_id, cache=self.cache)
-                    logger.debug('get_corporation(%s) returned type=%s', corp_id, type(corp))
-                except Exception:
-                    corp = None
-                    logger.exception('Error fetching corp %s', corp_id)
+            record('portrait', cid, img_path, outcome)
+            char_step_done(cid)
 
+        def handle_corp(corp_id):
+            corp = None
+            outcome = FetchOutcome()
+            try:
+                corp = get_corporation(corp_id, cache=self.cache, cancel_token=cancel_token, stats=stats,
+                                       outcome=outcome)
+                logger.debug('get_corporation(%s) returned type=%s', corp_id, type(corp))
+            except Exception:
+                logger.exception('Error fetching corp %s', corp_id)
+            record('corp', corp_id, corp, outcome)
+
+        def handle_logo(corp_id):
+            logo = None
+            outcome = FetchOutcome()
+            try:
+                logo = fetch_corporation_logo(corp_id, size=LOGO_SIZE, cache=self.cache,
+                                              cancel_token=cancel_token, stats=stats, outcome=outcome)
+                logger.debug('fetch_corporation_logo(%s) -> %s', corp_id, logo)
+            except Exception:
+                logger.exception('Error fetching corp logo %s', corp_id)
+            record('logo', corp_id, logo, outcome)
+
+        char_workers = self._start_workers('char', char_q, handle_char, cancel_token)
+        portrait_workers = self._start_workers('portrait', portrait_q, handle_portrait, cancel_token)
+        corp_workers = self._start_workers('corp', corp_q, handle_corp, cancel_token)
+        logo_workers = self._start_workers('logo', logo_q, handle_logo, cancel_token)
+
+        # feed the corp stages; put() blocks while queues are full (backpressure)
+        for corp_id in plan.corps:
+            if not self._put(corp_q, corp_id, cancel_token):
+                break
+        for corp_id in plan.logos:
+            if not self._put(logo_q, corp_id, cancel_token):
+                break
+
+        # shut stages down in dependency order: char JSON feeds corp/logo stages
+        self._stop_workers(char_q, char_workers, cancel_token)
+        self._stop_workers(portrait_q, portrait_workers, cancel_token)
+        self._stop_workers(corp_q, corp_workers, cancel_token)
+        self._stop_workers(logo_q, logo_workers, cancel_token)
+
+        with self._priority_lock:
+            self._priority_queues = []
+        done = state['done']
+        # unfinished items (cancelled, offline) stay in the journal for the next run
+        journal.finish()
+        if cancel_token.cancelled:
+            report('cancelled', kind='cancelled')
+            logger.info('Prefetcher cancelled after %s items', done)
+            return {'status': 'cancelled', 'done': done, 'fetched': state['fetched']}
+
+        report('prefetch complete', kind='complete')
+        logger.info('Prefetch complete (%s of %s chars fetched, %s failed, %s corps)',
+                    state['fetched'], plan.total, len(failed_chars), len(seen_corps))
+        return {'status': 'ok', 'done': plan.total, 'cached': plan.cached, 'fetched': state['fetched'],
+                'failed': len(failed_chars), 'deferred': plan.deferred}
+
+    def _start_workers(self, stage: str, q: queue.Queue, handler: Callable, cancel_token: CancelToken):
+        def loop():
+            while not cancel_token.cancelled:
                 try:
-                    logo = fetch_corporation_logo(corp_id, cache=self.cache)
-                    logger.debug('fetch_corporation_logo(%s) -> %s', corp_id, logo)
+                    item = q.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                if item is _STOP or cancel_token.cancelled:
+                    return
+                try:
+                    handler(item)
                 except Exception:
-                    logger.exception('Error fetching corp logo %s', corp_id)
+                    logger.exception('Prefetcher %s stage failed for %s', stage, item)
+
+        threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=loop, name=f'prefetch-{stage}-{i}', daemon=True)
+            t.start()
+            threads.append(t)
+        return threads
 
-        self._emit(progress_callback, 'prefetch complete')
-        logger.info('Prefetch complete (%s items)', total)
-        return {'status': 'ok', 'done': total}
+    def _stop_workers(self, q: queue.Queue, threads, cancel_token: CancelToken):
+        """Stop a stage and wait for its workers.
+
+        After a normal run they get sentinels; after cancel they exit on their
+        own, as requests in flight are abandoned (see esi_client._request), so
+        no worker outlives run().
+        """
+        for _ in threads:
+            if not self._put(q, _STOP, cancel_token):
+                break
+        for t in threads:
+            t.join()
+
+    @staticmethod
+    def _put(q: queue.Queue, item, cancel_token: CancelToken) -> bool:
+        """Put with backpressure; gives up (returns False) once cancelled."""
+        if isinstance(q, PriorityWorkQueue):
+            if cancel_token.cancelled:
+                return False
+            q.put(item)
+            return True
+        while not cancel_token.cancelled:
+            try:
+                q.put(item, timeout=POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
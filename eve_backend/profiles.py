@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+from pathlib import Path
+import logging
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PREFIX = 'settings_'
+# directories are re-stat'ed at most this often; writes made through this
+# app call invalidate() so they show up at once
+RECHECK_INTERVAL = 1.0
+# listings taken this soon after a directory changed may miss a change made
+# within the same timestamp tick, so they are redone on the next check
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+
+class ProfileInfo:
+    """One settings_<name> directory of a server."""
+
+    def __init__(self, server: str, dir_name: str, path: Path):
+        self.server = server
+        self.dir_name = dir_name
+        self.name = dir_name[len(PROFILE_PREFIX):]
+        self.path = path
+
+    def __repr__(self):
+        return f'ProfileInfo({self.server!r}, {self.dir_name!r})'
+
+
+class _Listing:
+    """Directory entries cached against the directory's mtime."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.mtime_ns = None
+        self.checked = 0.0
+        self.racy = True
+        self.entries: Optional[List[os.DirEntry]] = None
+
+    def fresh(self, now: float) -> bool:
+        if self.entries is not None and now - self.checked < RECHECK_INTERVAL:
+            return False
+        self.checked = now
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            changed = self.entries != []
+            self.entries, self.mtime_ns = [], None
+            return changed
+        if self.entries is not None and mtime_ns == self.mtime_ns and not self.racy:
+            return False
+        try:
+            with os.scandir(self.path) as it:
+                self.entries = list(it)
+        except OSError:
+            self.entries = []
+        self.mtime_ns = mtime_ns
+        self.racy = time.time_ns() - mtime_ns < RACY_WINDOW_NS
+        return True
+
+
+class ProfileIndex:
+    """Cached index of the EVE profile directories under one dat root.
+
+    server -> profiles (settings_* directories, 'cache' excluded) -> member
+    file names. Profiles are keyed by their exact name, so settings_Foo and
+    settings_foo on a case-sensitive filesystem are both listed (and logged
+    as a collision); lookups fall back to a case-insensitive match, and name
+    conflict checks ignore case, as on Windows.
+    Listings are refreshed when a directory's mtime changes (checked at most
+    every RECHECK_INTERVAL seconds), so repeated lookups, e.g. a conflict
+    check per keystroke, are dictionary lookups.
+    """
+
+    def __init__(self, root: Path, clock=time.monotonic):
+        self.root = Path(root)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # server -> (listing, {name: profile}, {lowercase name: [profiles]})
+        self._servers: Dict[str, Tuple[_Listing, Dict[str, ProfileInfo], Dict[str, List[ProfileInfo]]]] = {}
+        self._files: Dict[Tuple[str, str], Tuple[_Listing, FrozenSet[str]]] = {}
+
+    def _profiles(self, server: str) -> Tuple[Dict[str, ProfileInfo], Dict[str, List[ProfileInfo]]]:
+        listing, by_name, by_lower = self._servers.get(server) or (_Listing(self.root / server), {}, {})
+        if listing.fresh(self._clock()):
+            by_name, by_lower = {}, {}
+            for e in sorted(listing.entries, key=lambda e: e.name):
+                if e.name.startswith(PROFILE_PREFIX) and len(e.name) > len(PROFILE_PREFIX) and _is_dir(e):
+                    info = ProfileInfo(server, e.name, Path(e.path))
+                    by_name[info.name] = info
+                    by_lower.setdefault(info.name.lower(), []).append(info)
+            for same in by_lower.values():
+                if len(same) > 1:
+                    logger.warning('Profiles differing only in case on %s: %s', server,
+                                   ', '.join(p.dir_name for p in same))
+        self._servers[server] = (listing, by_name, by_lower)
+        return by_name, by_lower
+
+    def server_exists(self, server: str) -> bool:
+        return (self.root / server).is_dir()
+
+    def profiles(self, server: str) -> List[ProfileInfo]:
+        """Profiles of a server sorted by directory name."""
+        with self._lock:
+            return sorted(self._profiles(server)[0].values(), key=lambda p: p.dir_name)
+
+    def find(self, server: str, name: str) -> Optional[ProfileInfo]:
+        """Profile by name (with or without the settings_ prefix).
+
+        An exact match wins; otherwise the first profile whose name matches
+        ignoring case.
+        """
+        name = _strip_prefix(name)
+        with self._lock:
+            by_name, by_lower = self._profiles(server)
+            same = by_lower.get(name.lower())
+            return by_name.get(name) or (same[0] if same else None)
+
+    def has_profile(self, server: str, name: str) -> bool:
+        """True if a profile of this name exists, ignoring case (a conflict on Windows)."""
+        return self.find(server, name) is not None
+
+    def case_collisions(self, server: str) -> List[List[ProfileInfo]]:
+        """Groups of profiles whose names differ only in case."""
+        with self._lock:
+            return [list(same) for same in self._profiles(server)[1].values() if len(same) > 1]
+
+    def files(self, server: str, profile: str) -> FrozenSet[str]:
+        """Names of the files directly inside a profile directory."""
+        info = self.find(server, profile)
+        if info is None:
+            return frozenset()
+        key = (server, info.dir_name)
+        with self._lock:
+            listing, names = self._files.get(key) or (_Listing(info.path), frozenset())
+            if listing.fresh(self._clock()):
+                names = frozenset(e.name for e in listing.entries if _is_file(e))
+            self._files[key] = (listing, names)
+            return names
+
+    def has_file(self, server: str, profile: str, file_name: str) -> bool:
+        return file_name in self.files(server, profile)
+
+    def invalidate(self, server: Optional[str] = None):
+        """Forget cached listings (of one server), e.g. after writing profiles."""
+        with self._lock:
+            if server is None:
+                self._servers.clear()
+                self._files.clear()
+            else:
+                self._servers.pop(server, None)
+                for key in [k for k in self._files if k[0] == server]:
+                    del self._files[key]
+
+
+def _strip_prefix(name: str) -> str:
+    return name[len(PROFILE_PREFIX):] if name.startswith(PROFILE_PREFIX) else name
+
+
+def _is_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def _is_file(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_file()
+    except OSError:
+        return False
+
+
+_indexes: Dict[str, ProfileIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def profile_index(root) -> ProfileIndex:
+    """The process-wide ProfileIndex of a dat root."""
+    key = os.path.abspath(str(root))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = ProfileIndex(Path(key))
+        return index
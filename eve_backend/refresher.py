@@ -0,0 +1,213 @@
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from .cache import CacheManager
+from .mappings import shared_mappings
+from .esi_client import (AFFILIATION_BATCH, circuit_breaker, get_affiliations, get_character, get_corporation,
+                         fetch_corporation_logo, is_offline)
+from .prefetcher import CancelToken, LOGO_SIZE
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUESTS_PER_HOUR = 300
+# cached JSON older than this is refetched
+DEFAULT_MAX_AGE = 3 * 24 * 3600
+# ESI caches affiliations for an hour, so checking more often gains nothing
+AFFILIATION_INTERVAL = 3600
+# pause between refresh passes, and between idle checks while the app is busy
+PASS_INTERVAL = 15 * 60
+IDLE_POLL = 30
+
+
+class RequestBudget:
+    """Token bucket limiting requests per hour.
+
+    Tokens refill continuously at `per_hour / 3600` per second; at most five
+    minutes' worth can accumulate, so an idle period does not turn into a burst.
+    """
+
+    def __init__(self, per_hour: int, clock: Callable[[], float] = time.monotonic):
+        self.per_hour = max(1, int(per_hour))
+        self.capacity = max(1.0, self.per_hour / 12)
+        self._clock = clock
+        self._tokens = self.capacity
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.per_hour / 3600)
+        self._last = now
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def wait_time(self) -> float:
+        """Seconds until the next token is available."""
+        with self._lock:
+            self._refill()
+            return max(0.0, (1 - self._tokens) * 3600 / self.per_hour)
+
+
+class CacheRefresher:
+    """Opt-in background refresh of cached character/corporation data.
+
+    A refresh pass (`run_once`):
+      1. looks up the current corporation of every roster character with bulk
+         affiliation requests (one request per 1000 characters, at most once
+         per AFFILIATION_INTERVAL) and refetches characters whose corporation
+         changed, plus the new corporation's JSON/logo if not cached
+      2. refetches JSON older than `max_age` of roster characters and the
+         corporations they belong to, oldest first
+
+    Every request spends a token from a RequestBudget; when it runs out the
+    pass stops and resumes with the next pass. `start()` runs passes on a
+    daemon thread whenever `is_idle()` returns True and offline mode is off.
+    While the circuit breaker is open a pass stops as 'unavailable'; once it
+    turns half-open the next request goes out as the breaker's probe.
+    Only data already in the cache is refreshed; filling gaps is Prefetcher's job.
+    """
+
+    def __init__(self, cache: Optional[CacheManager] = None, mappings_path: Optional[str] = None,
+                 requests_per_hour: int = DEFAULT_REQUESTS_PER_HOUR, max_age: float = DEFAULT_MAX_AGE,
+                 is_idle: Optional[Callable[[], bool]] = None, budget: Optional[RequestBudget] = None):
+        self.cache = cache or CacheManager()
+        self.mappings_path = Path(mappings_path) if mappings_path else (Path.cwd() / 'mappings.json')
+        self.max_age = max_age
+        self.budget = budget or RequestBudget(requests_per_hour)
+        self.is_idle = is_idle or (lambda: True)
+        self._last_affiliation_check = None
+        self._stop = CancelToken()
+        self._thread = None
+
+    # -- background thread ------------------------------------------------
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop = CancelToken()
+        self._thread = threading.Thread(target=self._loop, name='cache-refresher', daemon=True)
+        self._thread.start()
+        logger.info('Background cache refresh started (%s requests/hour)', self.budget.per_hour)
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.cancel()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def _loop(self):
+        while not self._stop.cancelled:
+            # not gated on the breaker: only a request can close it again
+            if not self.is_idle() or is_offline():
+                self._stop.wait(IDLE_POLL)
+                continue
+            try:
+                res = self.run_once(self._stop)
+                logger.info('Background refresh pass: %s', res)
+            except Exception:
+                logger.exception('Background refresh pass failed')
+            self._stop.wait(PASS_INTERVAL)
+
+    # -- one pass ---------------------------------------------------------
+
+    def _char_ids(self) -> List[int]:
+        return shared_mappings(self.mappings_path).snapshot().char_ids()
+
+    def run_once(self, cancel_token: Optional[CancelToken] = None, now: Optional[float] = None) -> Dict:
+        """Run one refresh pass; returns counters and why it stopped.
+
+        status: 'ok' (all work done), 'budget' (request budget used up),
+        'busy' (app stopped being idle), 'cancelled' or 'unavailable'.
+        """
+        cancel_token = cancel_token or CancelToken()
+        now = time.time() if now is None else now
+        res = {'status': 'ok', 'requests': 0, 'changed': 0, 'refreshed': 0}
+
+        def spend() -> bool:
+            # check cheap stop conditions before each request
+            if cancel_token.cancelled:
+                res['status'] = 'cancelled'
+            elif not self.is_idle():
+                res['status'] = 'busy'
+            elif is_offline() or circuit_breaker.state == 'open':
+                res['status'] = 'unavailable'
+            elif not self.budget.try_acquire():
+                res['status'] = 'budget'
+            else:
+                res['requests'] += 1
+                return True
+            return False
+
+        manifest = self.cache.manifest()
+        char_ids = [c for c in self._char_ids() if manifest.has_json(str(c), 'char')]
+        refreshed = set()
+
+        # 1. corporation changes via bulk affiliation lookups
+        if self._last_affiliation_check is None or now - self._last_affiliation_check >= AFFILIATION_INTERVAL:
+            corp_of = self.cache.char_corp_index([str(c) for c in char_ids], manifest)
+            for i in range(0, len(char_ids), AFFILIATION_BATCH):
+                if not spend():
+                    return res
+                batch = char_ids[i:i + AFFILIATION_BATCH]
+                affiliations = get_affiliations(batch, cancel_token=cancel_token)
+                if affiliations is None:
+                    res['status'] = 'unavailable'
+                    return res
+                for a in affiliations:
+                    cid = int(a.get('character_id', 0))
+                    new_corp = a.get('corporation_id')
+                    old_corp = corp_of.get(str(cid))
+                    if new_corp and old_corp is not None and int(old_corp) != int(new_corp):
+                        if not spend():
+                            return res
+                        logger.info('Character %s moved from corp %s to %s', cid, old_corp, new_corp)
+                        if get_character(cid, cache=self.cache, cancel_token=cancel_token, refresh=True):
+                            res['changed'] += 1
+                            refreshed.add(('char', str(cid)))
+                        if not self._ensure_corp(int(new_corp), manifest, spend, cancel_token):
+                            return res
+            self._last_affiliation_check = now
+
+        # 2. stale JSON of roster characters and their current corporations, oldest first
+        roster = {str(c) for c in char_ids}
+        # a fresh manifest: step 1 may have moved characters to other corporations
+        corps = {str(c) for c in self.cache.char_corp_index(roster).values()}
+        wanted = {'char': roster, 'corp': corps}
+        cutoff_ns = int((now - self.max_age) * 1e9)
+        stale = []
+        for kind in ('char', 'corp'):
+            for id, mtime_ns in manifest.json_mtimes.get(kind, {}).items():
+                if mtime_ns < cutoff_ns and id in wanted[kind] and (kind, id) not in refreshed:
+                    stale.append((mtime_ns, kind, id))
+        for _, kind, id in sorted(stale):
+            if not spend():
+                return res
+            fetch = get_character if kind == 'char' else get_corporation
+            if fetch(int(id), cache=self.cache, cancel_token=cancel_token, refresh=True):
+                res['refreshed'] += 1
+        return res
+
+    def _ensure_corp(self, corp_id: int, manifest, spend: Callable[[], bool], cancel_token) -> bool:
+        """Fetch JSON/logo of a newly joined corporation if missing; False when out of budget."""
+        if not manifest.has_json(str(corp_id), 'corp'):
+            if not spend():
+                return False
+            get_corporation(corp_id, cache=self.cache, cancel_token=cancel_token)
+        if not manifest.has_image(str(corp_id), 'corp', LOGO_SIZE):
+            if not spend():
+                return False
+            fetch_corporation_logo(corp_id, size=LOGO_SIZE, cache=self.cache, cancel_token=cancel_token)
+        return True
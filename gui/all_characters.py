@@ -4,125 +4,39 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QPushButton,
-    QScrollArea,
     QProgressBar,
     QSizePolicy,
 )
-from PySide6.QtGui import QPixmap, QPainter, QFontMetrics
-from PySide6.QtCore import Qt, QThread, QTimer
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
 from pathlib import Path
 from typing import Optional
-import json
 
 from eve_backend.cache import CacheManager
-from eve_backend import Prefetcher
+from eve_backend.config_store import ConfigStore
+from eve_backend.mappings import shared_mappings
+from .character_grid import CharacterGridView
+from .image_registry import image_registry
+from .mappings_notifier import MappingsNotifier
 from .prefetch_worker import PrefetchWorker
 
 
-class CharacterWidget(QWidget):
-    def __init__(self, char_id: int, cache: CacheManager, parent=None):
-        super().__init__(parent)
-        self.char_id = char_id
-        self.cache = cache
-        self.layout = QVBoxLayout(self)
-        self.portrait_label = QLabel()
-        self.portrait_label.setFixedSize(80, 80)
-        self.portrait_label.setScaledContents(True)
-        self.name_label = QLabel(str(char_id))
-        # keep name width equal to portrait so it doesn't overflow
-        self.name_label.setFixedWidth(self.portrait_label.width())
-        self.name_label.setAlignment(Qt.AlignHCenter)
-        self.layout.addWidget(self.portrait_label, alignment=Qt.AlignHCenter)
-        self.layout.addWidget(self.name_label, alignment=Qt.AlignHCenter)
-        # keep widget compact so multiple widgets float/pack left instead of stretching
-        self.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        self.refresh()
-
-    def refresh(self):
-        # load name from cache if available
-        data = self.cache.load_json(str(self.char_id), 'char')
-        if data and 'name' in data:
-            name = data['name']
-            fm = QFontMetrics(self.name_label.font())
-            elided = fm.elidedText(name, Qt.ElideRight, self.name_label.width())
-            self.name_label.setText(elided)
-        else:
-            fm = QFontMetrics(self.name_label.font())
-            elided = fm.elidedText(str(self.char_id), Qt.ElideRight, self.name_label.width())
-            self.name_label.setText(elided)
-
-        pic = self.cache.load_image(str(self.char_id), 'char')
-        if pic:
-            pix = QPixmap(str(pic))
-        else:
-            pix = QPixmap(80, 80)
-            pix.fill(Qt.lightGray)
-
-        # overlay corp logo if possible
-        corp_id = data.get('corporation_id') if data else None
-        if corp_id:
-            corp_img = self.cache.load_image(str(corp_id), 'corp')
-            if corp_img:
-                corp_pix = QPixmap(str(corp_img)).scaled(20, 20, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                # composite
-                composed = QPixmap(pix.size())
-                composed.fill(Qt.transparent)
-                painter = QPainter(composed)
-                painter.drawPixmap(0, 0, pix)
-                # draw corp in bottom-right
-                x = pix.width() - corp_pix.width() - 4
-                y = pix.height() - corp_pix.height() - 4
-                painter.drawPixmap(x, y, corp_pix)
-                painter.end()
-                pix = composed
-
-        self.portrait_label.setPixmap(pix)
-
-
-class TitleWrap(QWidget):
-    """A title row with styled background and a floating delete button.
-
-    The delete button is a child widget positioned in resizeEvent so it visually
-    floats over the right edge of the styled background.
-    """
-
-    def __init__(self, text: str, on_delete, acc_key: str, parent=None):
-        super().__init__(parent)
-        self.setAttribute(Qt.WA_StyledBackground, True)
-        self.setStyleSheet('background:#eee; padding:2px;')
-        lay = QHBoxLayout(self)
-        lay.setContentsMargins(8, 2, 8, 2)
-        self.label = QLabel(text, self)
-        self.label.setStyleSheet('font-weight: bold; color:#222;')
-        lay.addWidget(self.label)
-        lay.addStretch()
-
-        self.del_btn = QPushButton('Delete', self)
-        self.del_btn.setToolTip('Delete this account')
-        self.del_btn.setFixedWidth(80)
-        # make the delete button slightly shorter so the title row is less tall
-        self.del_btn.setFixedHeight(20)
-        self.del_btn.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
-        self.del_btn.setStyleSheet('background:#d9534f; color:white; border:none; padding:4px;')
-        # wire up callback; capture acc_key
-        self.del_btn.clicked.connect(lambda: on_delete(acc_key))
-        self.del_btn.raise_()
-
-    def resizeEvent(self, ev):
-        # position delete button on the right, vertically centered
-        margin = 6
-        x = self.width() - self.del_btn.width() - margin
-        y = (self.height() - self.del_btn.height()) // 2
-        self.del_btn.move(x, y)
-        super().resizeEvent(ev)
-
-
 class AllCharactersTab(QWidget):
+    # True while a prefetch thread runs, False once it has finished
+    busy_changed = Signal(bool)
+
     def __init__(self, mappings_path: Optional[str] = None, main_window=None, parent=None):
         super().__init__(parent)
         self.cache = CacheManager()
+        # memory budget for decoded portraits/logos shared by all views
+        cfg = ConfigStore().load()
+        image_cache_mb = cfg.get('image_cache_mb')
+        if image_cache_mb:
+            image_registry().set_budget(int(image_cache_mb) * 1024 * 1024)
         self.main_window = main_window
         self.mappings_path = Path(mappings_path) if mappings_path else Path.cwd() / 'mappings.json'
+        self.mappings = shared_mappings(self.mappings_path)
+        self._mappings_notifier = MappingsNotifier(self.mappings, self)
+        self._mappings_notifier.changed.connect(lambda *_: self.reload(), Qt.QueuedConnection)
         self.layout = QVBoxLayout(self)
 
         top_bar = QHBoxLayout()
@@ -138,6 +52,12 @@ class AllCharactersTab(QWidget):
         self.prefetch_btn = QPushButton('Prefetch cache')
         self.prefetch_btn.clicked.connect(self._on_prefetch)
         top_bar.addWidget(self.prefetch_btn)
+
+        self.cancel_prefetch_btn = QPushButton('Cancel')
+        self.cancel_prefetch_btn.setToolTip('Stop the running prefetch')
+        self.cancel_prefetch_btn.clicked.connect(self._on_cancel_prefetch)
+        self.cancel_prefetch_btn.setVisible(False)
+        top_bar.addWidget(self.cancel_prefetch_btn)
         
         # Right-aligned elements
         self.delete_all_btn = QPushButton('Delete All')
@@ -160,12 +80,27 @@ class AllCharactersTab(QWidget):
         top_bar.addWidget(self.delete_all_btn)
         self.layout.addLayout(top_bar)
 
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.container = QWidget()
-        self.container_layout = QVBoxLayout(self.container)
-        self.scroll.setWidget(self.container)
-        self.layout.addWidget(self.scroll)
+        self.message_label = QLabel('')
+        self.message_label.setVisible(False)
+        self.layout.addWidget(self.message_label)
+        self.view = CharacterGridView(self.cache)
+        self.view.grid_delegate.delete_requested.connect(self._delete_account)
+        # optional: paint large rosters from a few shared atlas sheets
+        self.view.set_atlas_enabled(bool(cfg.get('sprite_atlas')))
+        self.layout.addWidget(self.view)
+        # while prefetching, tell the worker which characters are on screen
+        self._priority_timer = QTimer(self)
+        self._priority_timer.setSingleShot(True)
+        self._priority_timer.setInterval(100)
+        self._priority_timer.timeout.connect(self._update_prefetch_priority)
+        self.view.verticalScrollBar().valueChanged.connect(lambda _: self._priority_timer.start())
+        # characters to repaint as prefetch results land, coalesced per timer tick
+        self._dirty_chars = set()
+        self._dirty_corps = set()
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(50)
+        self._refresh_timer.timeout.connect(self._refresh_dirty_widgets)
 
         self._thread = None
         self._worker = None
@@ -174,44 +109,26 @@ class AllCharactersTab(QWidget):
 
         self.reload()
 
-    def reload(self):
-        self.container_layout.setAlignment(Qt.AlignTop)
-        # clear
-        while self.container_layout.count():
-            it = self.container_layout.takeAt(0)
-            if it.widget():
-                it.widget().deleteLater()
+    def _show_message(self, text: str):
+        self.message_label.setText(text)
+        self.message_label.setVisible(bool(text))
 
-        if not self.mappings_path.exists():
-            self.container_layout.addWidget(QLabel('No mappings.json found'))
+    def reload(self):
+        model = self.view.grid_model
+        snap = self.mappings.snapshot()
+        if snap.status == 'missing':
+            model.set_accounts([])
+            self._show_message('No mappings.json found')
             return
-
-        data = None
-        try:
-            data = json.loads(self.mappings_path.read_text())
-        except Exception:
-            self.container_layout.addWidget(QLabel('Failed to read mappings.json'))
+        if not snap.ok:
+            model.set_accounts([])
+            self._show_message('Failed to read mappings.json')
             return
 
-        mappings = data.get('mappings', {})
-        # for each account, create a horizontal row with title and character widgets
-        for acc, info in sorted(mappings.items(), key=lambda x: int(x[0])):
-            # use TitleWrap which handles background and floating delete button
-            title_wrap = TitleWrap(f'Account {acc}', self._delete_account, acc)
-            self.container_layout.addWidget(title_wrap)
-
-            chars_row = QHBoxLayout()
-            chars_row.setAlignment(Qt.AlignLeft)
-            chars_row.setSpacing(8)
-            for c in info.get('chars', []):
-                cw = CharacterWidget(int(c), self.cache)
-                chars_row.addWidget(cw)
-            # keep widgets packed to the left by adding a stretch at the end
-            chars_row.addStretch()
-            wrapper = QWidget()
-            wrapper.setLayout(chars_row)
-            wrapper.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
-            self.container_layout.addWidget(wrapper)
+        # one model row per account; tiles are painted by the delegate on demand.
+        # The model applies only the difference, so unchanged rows are not rebuilt.
+        model.set_accounts([(acc, [int(c) for c in chars]) for acc, chars in snap.items()])
+        self._show_message('')
 
     def _on_configure(self):
         """Handle Configure button click by calling main window's configure method."""
@@ -229,83 +146,135 @@ class AllCharactersTab(QWidget):
             return
         self._thread = QThread()
         self._worker = PrefetchWorker(mappings_path=str(self.mappings_path))
+        self._worker.prioritize(self._visible_char_ids())
         self._worker.moveToThread(self._thread)
         self._worker.started.connect(self._on_prefetch_started)
-        self._worker.progress.connect(self._on_prefetch_progress)
+        self._worker.event.connect(self._on_prefetch_event)
+        self._worker.item_done.connect(self._on_prefetch_item)
         self._worker.finished.connect(self._on_prefetch_finished)
         self._worker.finished.connect(self._thread.quit)
+        self._worker.finished.connect(self._worker.deleteLater)
+        self._worker.error.connect(self._thread.quit)
+        thread = self._thread
+        thread.finished.connect(lambda: self._forget_prefetch_thread(thread))
+        thread.finished.connect(thread.deleteLater)
         self._thread.started.connect(self._worker.run)
         self._thread.start()
+        self.busy_changed.emit(True)
+
+    def _visible_char_ids(self):
+        return self.view.visible_char_ids()
+
+    def _update_prefetch_priority(self):
+        if self._worker is not None and self._thread and self._thread.isRunning():
+            self._worker.prioritize(self._visible_char_ids())
+
+    def _on_cancel_prefetch(self):
+        # the token is thread-safe, so cancel directly instead of queueing a
+        # call onto the worker thread (which is busy inside run())
+        if self._worker is not None:
+            self._worker.cancel()
+            self.cancel_prefetch_btn.setEnabled(False)
+            self.progress_label.setText('Cancelling...')
 
     def _on_prefetch_started(self):
         self.prefetch_btn.setText('Prefetching...')
         self.prefetch_btn.setEnabled(False)
+        self.cancel_prefetch_btn.setEnabled(True)
+        self.cancel_prefetch_btn.setVisible(True)
         self.progress_bar.setVisible(True)
         self.progress_label.setVisible(True)
         self.progress_bar.setValue(0)
         self.progress_label.setText('Starting...')
 
-    def _on_prefetch_progress(self, msg: str):
-        # update label and progress when possible
-        self.progress_label.setText(msg)
-        # parse pattern like '(i/total)'
-        try:
-            if '(' in msg and '/' in msg and ')' in msg:
-                part = msg.split('(')[-1].split(')')[0]
-                if '/' in part:
-                    done, total = part.split('/')
-                    done = int(done)
-                    total = int(total)
-                    self._prefetch_total = total
-                    self._prefetch_done = done
-                    self.progress_bar.setMaximum(total)
-                    self.progress_bar.setValue(done)
-            elif msg.startswith('prefetch complete') or msg.startswith('cancelled'):
-                self.progress_bar.setValue(self.progress_bar.maximum())
-        except Exception:
-            pass
+    def _on_prefetch_event(self, ev):
+        # ProgressEvent: counts cover every planned item (chars, portraits, corps, logos)
+        self._prefetch_total = ev.total
+        self._prefetch_done = ev.done
+        self.progress_bar.setMaximum(max(ev.total, 1))
+        self.progress_bar.setValue(ev.total if ev.kind == 'complete' else ev.done)
+        if ev.kind == 'plan':
+            self.progress_label.setText(ev.message)
+        elif ev.kind in ('complete', 'cancelled'):
+            return
+        else:
+            self.progress_label.setText(ev.summary())
+
+    def _on_prefetch_item(self, stage: str, id):
+        if stage in ('char', 'portrait'):
+            self._dirty_chars.add(int(id))
+        elif stage == 'logo':
+            self._dirty_corps.add(int(id))
+        else:
+            # corp JSON: tiles only show the logo, so nothing to repaint
+            return
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start()
+
+    def _refresh_dirty_widgets(self):
+        chars, corps = self._dirty_chars, self._dirty_corps
+        self._dirty_chars, self._dirty_corps = set(), set()
+        # corps first: a char refresh forgets its cached corp id
+        self.view.refresh_corps(corps)
+        self.view.refresh_chars(chars)
+
+    def _forget_prefetch_thread(self, thread):
+        # a newer run may already have replaced it
+        if self._thread is thread:
+            self._thread = None
+            self.busy_changed.emit(False)
+
+    def shutdown(self):
+        """Cancel a running prefetch and wait for its thread; call before closing the window."""
+        if self._worker is not None:
+            self._worker.cancel()
+        if self._thread is not None and self._thread.isRunning():
+            # its quit() is queued to this (now blocked) thread, so ask directly
+            self._thread.quit()
+            self._thread.wait()
 
     def _on_prefetch_finished(self, result):
+        # deleted on its own thread from here on
+        self._worker = None
         self.prefetch_btn.setText('Prefetch cache')
         self.prefetch_btn.setEnabled(True)
-        self.progress_label.setText('Done')
-        # leave progress visible briefly; then reload UI to show cached names/images
-        self.reload()
-        # hide progress UI after a short delay
+        self.cancel_prefetch_btn.setVisible(False)
+        status = result.get('status') if isinstance(result, dict) else None
+        if status == 'cancelled':
+            self.progress_label.setText(f"Cancelled — {result.get('fetched', 0)} fetched")
+        elif status == 'no_mappings':
+            self.progress_label.setText('mappings.json not found')
+        elif status == 'bad_mappings':
+            self.progress_label.setText('Failed to read mappings.json')
+        elif status == 'ok':
+            self.progress_label.setText(self._prefetch_summary(result))
+        else:
+            self.progress_label.setText('Done')
+        # widgets were refreshed as items landed; flush any still queued
+        self._refresh_timer.stop()
+        self._refresh_dirty_widgets()
+        # hide the bar after a short delay; the label keeps the summary
         try:
-            QTimer.singleShot(2000, lambda: (self.progress_bar.setVisible(False), self.progress_label.setVisible(False)))
+            QTimer.singleShot(2000, lambda: self.progress_bar.setVisible(False))
         except Exception:
             pass
 
+    def _prefetch_summary(self, result: dict) -> str:
+        """Final label for a finished run, e.g. 'Done — 40 fetched, 440 already cached'."""
+        # characters: fetched completely, already cached, with an item that failed
+        parts = [f"{result.get('fetched', 0)} fetched", f"{result.get('cached', 0)} already cached"]
+        if result.get('failed'):
+            parts.append(f"{result['failed']} failed")
+        if result.get('deferred'):
+            parts.append(f"{result['deferred']} deferred")
+        return 'Done — ' + ', '.join(parts)
+
     def _delete_account(self, acc_key: str):
         """Remove the given account key from mappings.json but leave cache files untouched."""
-        try:
-            if not self.mappings_path.exists():
-                return
-            text = self.mappings_path.read_text()
-            data = json.loads(text)
-            mappings = data.get('mappings', {})
-            if acc_key in mappings:
-                del mappings[acc_key]
-                data['mappings'] = mappings
-                # write back with indentation for readability
-                self.mappings_path.write_text(json.dumps(data, indent=2))
-                # refresh UI
-                self.reload()
-        except Exception:
-            # on error, do not crash UI; silently ignore (could be improved)
-            return
+        if self.mappings.remove_account(acc_key):
+            self.reload()
 
     def _delete_all_accounts(self):
         """Remove all accounts from mappings.json but leave cache files untouched."""
-        try:
-            if not self.mappings_path.exists():
-                return
-            text = self.mappings_path.read_text()
-            data = json.loads(text)
-            # clear mappings dict
-            data['mappings'] = {}
-            self.mappings_path.write_text(json.dumps(data, indent=2))
+        if self.mappings.clear_accounts():
             self.reload()
-        except Exception:
-            return
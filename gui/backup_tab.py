@@ -16,13 +16,15 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QFont
 from pathlib import Path
-import json
 import shutil
 import zipfile
 from datetime import datetime
 from typing import Optional
 import os
 
+from eve_backend.mappings import shared_mappings
+from eve_backend.profiles import profile_index
+
 
 class BackupWorker(QThread):
     """Background worker for backup operations."""
@@ -39,13 +41,16 @@ class BackupWorker(QThread):
             self.progress.emit("Starting backup operation...")
             
             # Check if mappings.json exists
-            if not self.mappings_path.exists():
+            snap = shared_mappings(self.mappings_path).snapshot()
+            if snap.status == 'missing':
                 self.finished.emit(False, "mappings.json not found")
                 return
+            if not snap.ok:
+                self.finished.emit(False, "Failed to read mappings.json")
+                return
             
             # Load mappings to get dat_roots
-            data = json.loads(self.mappings_path.read_text())
-            dat_roots = data.get('dat_roots', [])
+            dat_roots = snap.dat_roots
             
             if not dat_roots:
                 self.finished.emit(False, "No dat_roots configured in mappings.json")
@@ -140,9 +145,9 @@ class RestoreWorker(QThread):
             safety_worker = BackupWorker(str(self.mappings_path), str(self.backup_dir))
             
             # Run safety backup synchronously
-            if self.mappings_path.exists():
-                data = json.loads(self.mappings_path.read_text())
-                dat_roots = data.get('dat_roots', [])
+            snap = shared_mappings(self.mappings_path).snapshot()
+            if snap.ok:
+                dat_roots = snap.dat_roots
                 
                 if dat_roots:
                     with zipfile.ZipFile(safety_backup_path, 'w', zipfile.ZIP_DEFLATED) as safety_zip:
@@ -162,12 +167,14 @@ class RestoreWorker(QThread):
                     self.progress.emit(f"Safety backup created: {safety_backup_path.name}")
             
             # Load mappings to get restore destinations
-            if not self.mappings_path.exists():
+            if snap.status == 'missing':
                 self.finished.emit(False, "mappings.json not found")
                 return
+            if not snap.ok:
+                self.finished.emit(False, "Failed to read mappings.json")
+                return
                 
-            data = json.loads(self.mappings_path.read_text())
-            dat_roots = data.get('dat_roots', [])
+            dat_roots = snap.dat_roots
             
             if not dat_roots:
                 self.finished.emit(False, "No dat_roots in mappings.json")
@@ -212,6 +219,8 @@ class RestoreWorker(QThread):
                             with backup_zip.open(file_path) as source:
                                 dest_path.write_bytes(source.read())
             
+            # restored profiles replace what the copy tab has listed
+            profile_index(restore_root).invalidate()
             self.finished.emit(True, f"Restore completed! Safety backup: {safety_backup_path.name}")
             
         except Exception as e:
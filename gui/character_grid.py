@@ -0,0 +1,679 @@
+"""Virtualized account/character grid for the All Characters tab.
+
+The roster is a flat model with one row per account; each row carries only
+the account key and a packed array of character IDs. A delegate paints the
+account title (with its Delete button) and the account's character tiles,
+so only rows inside the viewport are ever painted and nothing is created
+per character until it becomes visible. Tiles are rendered on a thread pool
+(see PortraitProvider); placeholders are painted until they arrive.
+"""
+import hashlib
+import logging
+import math
+import os
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from PySide6.QtCore import (QAbstractListModel, QModelIndex, QObject, QRect, QRunnable, QSize, QEvent, Qt,
+                            QThread, QThreadPool, Signal)
+from PySide6.QtGui import QColor, QFont, QFontMetrics, QImage, QPainter, QPixmap, QPixmapCache
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView
+
+from eve_backend.cache import CacheManager
+from .image_registry import image_registry
+from .sprite_atlas import DEFAULT_SHEET_SIDE, SpriteAtlas, build_atlas
+
+logger = logging.getLogger(__name__)
+
+# logical size of a portrait tile and of the corp logo overlay
+PORTRAIT_SIDE = 80
+LOGO_SIDE = 20
+
+TITLE_HEIGHT = 28
+MARGIN = 8
+TILE_SPACING = 8
+DELETE_WIDTH = 80
+DELETE_HEIGHT = 20
+
+AccountRole = Qt.UserRole + 1
+CharsRole = Qt.UserRole + 2
+
+
+def _decode_image(cache: CacheManager, id: str, kind: str, px: int) -> Optional[QImage]:
+    """Load a cached image at `px` device pixels, deriving it from a larger copy if needed."""
+    path = cache.load_image(id, kind, px) or cache.load_image(id, kind)
+    if not path:
+        return None
+    img = QImage(str(path))
+    if img.isNull():
+        return None
+    if img.width() != px:
+        # only reached when no cached copy is large enough (e.g. legacy 64px files)
+        img = img.scaled(px, px, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return img
+
+
+def _load_image(cache: CacheManager, id: str, kind: str, px: int, fp: str) -> Optional[QImage]:
+    """Decoded image from the shared registry, decoding it on a miss.
+
+    `fp` is the source's fingerprint, so a replaced file is never served from memory.
+    """
+    key = (str(cache.base), kind, id, px, fp)
+    return image_registry().get_or_load(key, lambda: _decode_image(cache, id, kind, px))
+
+
+class TileFingerprints:
+    """Memoized CacheManager.image_fingerprint for the tile renderers.
+
+    Fingerprints are remembered until `forget()` is told the image was
+    replaced (refresh_chars / refresh_corps), so recomposing or re-finding a
+    stored tile does not stat the cache again. Missing images are not
+    remembered. Thread-safe; shared by the pool jobs of one provider.
+    """
+
+    def __init__(self, cache: CacheManager):
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._fps: Dict[Tuple[str, str], str] = {}
+        # bumped by forget(), so a lookup racing with it is not stored
+        self._epochs: Dict[Tuple[str, str], int] = {}
+
+    def get(self, id, kind: str) -> Optional[str]:
+        key = (kind, str(id))
+        with self._lock:
+            fp = self._fps.get(key)
+            if fp is not None:
+                return fp
+            epoch = self._epochs.get(key, 0)
+        fp = self.cache.image_fingerprint(str(id), kind)
+        if fp is not None:
+            with self._lock:
+                if self._epochs.get(key, 0) == epoch:
+                    self._fps[key] = fp
+        return fp
+
+    def forget(self, kind: str, ids: Iterable):
+        with self._lock:
+            for id in ids:
+                key = (kind, str(id))
+                self._fps.pop(key, None)
+                self._epochs[key] = self._epochs.get(key, 0) + 1
+
+
+def _tile_key(cid: int, portrait_fp: Optional[str], corp_id: Optional[int], logo_fp: Optional[str],
+              dpr: float) -> str:
+    raw = f'{cid}|{portrait_fp}|{corp_id}|{logo_fp}|{PORTRAIT_SIDE}|{dpr}'
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+
+def compose_tile(cache: CacheManager, cid: int, dpr: float, fingerprints: Optional[TileFingerprints] = None):
+    """Read a character's cached data and render its tile; safe off the GUI thread.
+
+    Returns ((name, corp id), QImage of the portrait with the corp logo in the
+    bottom-right corner), sized for `dpr` device pixels per logical pixel.
+    Rendered tiles are kept in the cache (img/tile), keyed by the character,
+    both source images' fingerprints, the corp and the size, so a tile is
+    re-rendered only when one of them changed. Pass `fingerprints` to reuse
+    fingerprints looked up before.
+    """
+    fingerprint = fingerprints.get if fingerprints else cache.image_fingerprint
+    data = cache.load_json(str(cid), 'char') or {}
+    corp_id = data.get('corporation_id')
+    corp_id = int(corp_id) if corp_id else None
+    info = (data.get('name'), corp_id)
+
+    # work in device pixels so portraits stay crisp on HiDPI screens
+    px = math.ceil(PORTRAIT_SIDE * dpr)
+    portrait_fp = fingerprint(str(cid), 'char')
+    logo_fp = fingerprint(str(corp_id), 'corp') if corp_id else None
+    path = None
+    if portrait_fp or logo_fp:
+        path = cache.composite_path(str(cid), px, _tile_key(cid, portrait_fp, corp_id, logo_fp, dpr))
+        if path.exists():
+            tile = QImage(str(path))
+            if not tile.isNull():
+                tile.setDevicePixelRatio(dpr)
+                return info, tile
+
+    tile = QImage(px, px, QImage.Format_ARGB32_Premultiplied)
+    tile.fill(QColor(Qt.lightGray))
+    portrait = _load_image(cache, str(cid), 'char', px, portrait_fp) if portrait_fp else None
+    logo = _load_image(cache, str(corp_id), 'corp', math.ceil(LOGO_SIDE * dpr), logo_fp) if logo_fp else None
+    if portrait is not None or logo is not None:
+        # images from the registry are shared: draw them in device pixels
+        # instead of changing their device pixel ratio
+        painter = QPainter(tile)
+        if portrait is not None:
+            painter.drawImage(0, 0, portrait)
+        if logo is not None:
+            # corp logo in the bottom-right corner
+            x = math.ceil((PORTRAIT_SIDE - LOGO_SIDE - 4) * dpr)
+            painter.drawImage(x, x, logo)
+        painter.end()
+        _save_tile(cache, str(cid), px, tile, path)
+    tile.setDevicePixelRatio(dpr)
+    return info, tile
+
+
+def _save_tile(cache: CacheManager, id: str, px: int, tile: QImage, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f'.{path.stem}.', suffix='.part', dir=str(path.parent))
+    os.close(fd)
+    try:
+        if tile.save(tmp, 'PNG'):
+            os.replace(tmp, path)
+            cache.prune_composites(id, px, path)
+    except OSError:
+        logger.warning('Failed to store rendered tile %s', path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def build_tile_atlases(cache: CacheManager, char_ids: Sequence[int], dpr: float,
+                       fingerprints: Optional[TileFingerprints] = None):
+    """Pack the portraits of `char_ids` and their corp logos into one atlas each.
+
+    Returns ({cid: (name, corp id)}, portrait atlas, logo atlas keyed by corp id);
+    safe off the GUI thread.
+    """
+    fingerprint = fingerprints.get if fingerprints else cache.image_fingerprint
+    infos = {}
+    for cid in char_ids:
+        data = cache.load_json(str(cid), 'char') or {}
+        corp_id = data.get('corporation_id')
+        infos[cid] = (data.get('name'), int(corp_id) if corp_id else None)
+    px = math.ceil(PORTRAIT_SIDE * dpr)
+    logo_px = math.ceil(LOGO_SIDE * dpr)
+
+    def load_logo(corp_id):
+        fp = fingerprint(str(corp_id), 'corp')
+        return _load_image(cache, str(corp_id), 'corp', logo_px, fp) if fp else None
+
+    corps = sorted({corp for _, corp in infos.values() if corp})
+    portraits = build_atlas(char_ids, px, lambda cid: _decode_image(cache, str(cid), 'char', px))
+    # logos are small: size their sheet to the batch instead of a full sheet
+    logo_side = logo_px * max(1, math.ceil(math.sqrt(len(corps))))
+    logos = build_atlas(corps, logo_px, load_logo, min(logo_side, DEFAULT_SHEET_SIDE))
+    return infos, portraits, logos
+
+
+class _AtlasJob(QRunnable):
+    def __init__(self, cache: CacheManager, char_ids: List[int], dpr: float, signals: '_DecodeSignals',
+                 fingerprints: Optional[TileFingerprints] = None):
+        super().__init__()
+        self.cache = cache
+        self.char_ids = char_ids
+        self.dpr = dpr
+        self.signals = signals
+        self.fingerprints = fingerprints
+
+    def run(self):
+        try:
+            infos, portraits, logos = build_tile_atlases(self.cache, self.char_ids, self.dpr, self.fingerprints)
+        except Exception:
+            logger.exception('Failed to build sprite atlas')
+            infos, portraits, logos = dict.fromkeys(self.char_ids), None, None
+        self.signals.atlas_done.emit(self.dpr, infos, (portraits, logos))
+
+
+class _DecodeJob(QRunnable):
+    def __init__(self, cache: CacheManager, key, signals: '_DecodeSignals', fingerprints: TileFingerprints):
+        super().__init__()
+        self.cache = cache
+        self.key = key
+        self.signals = signals
+        self.fingerprints = fingerprints
+
+    def run(self):
+        cid, _, dpr = self.key
+        try:
+            info, image = compose_tile(self.cache, cid, dpr, self.fingerprints)
+        except Exception:
+            logger.exception('Failed to render tile for %s', cid)
+            info, image = (None, None), None
+        self.signals.done.emit(self.key, info, image)
+
+
+class _DecodeSignals(QObject):
+    # emitted from pool threads, delivered queued on the GUI thread
+    done = Signal(object, object, object)
+    atlas_done = Signal(object, object, object)
+
+
+class PortraitProvider(QObject):
+    """Names, corp IDs and composited portrait pixmaps for painted characters.
+
+    Tiles are decoded and composited as QImages on a thread pool; until one is
+    ready `pixmap()` returns the previous version of the tile, or a shared
+    placeholder, and `tile_ready(cid)` fires once it can be painted. Results
+    live in QPixmapCache, keyed with a per-character generation so
+    invalidation simply makes old entries unreachable.
+
+    With `build_atlases()` the portraits and logos of many characters are
+    instead packed into a few shared sheets (see sprite_atlas), and
+    `draw_tile()` paints packed characters from those; invalidated characters
+    drop out of the atlases and fall back to individual tiles.
+    """
+
+    tile_ready = Signal(object)
+    atlas_ready = Signal()
+    _instances = 0
+
+    def __init__(self, cache: CacheManager, parent=None, max_threads: Optional[int] = None):
+        super().__init__(parent)
+        self.cache = cache
+        # QPixmapCache is process-wide; keep keys of different providers apart
+        PortraitProvider._instances += 1
+        self._prefix = f'tile{PortraitProvider._instances}'
+        self._info: Dict[int, Tuple[Optional[str], Optional[int]]] = {}
+        self._generation: Dict[int, int] = {}
+        self._shown: Dict[int, str] = {}
+        self._pending = set()
+        self._placeholders: Dict[float, QPixmap] = {}
+        self._fingerprints = TileFingerprints(cache)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads or max(2, QThread.idealThreadCount() - 1))
+        self._signals = _DecodeSignals(self)
+        self._signals.done.connect(self._on_done)
+        self._signals.atlas_done.connect(self._on_atlas_done)
+        # dpr -> [(portrait atlas, logo atlas)], and the characters packed (or being packed)
+        self._atlases: Dict[float, List[Tuple[SpriteAtlas, SpriteAtlas]]] = {}
+        self._packed: Dict[float, set] = {}
+
+    def info(self, cid: int) -> Tuple[Optional[str], Optional[int]]:
+        """(name, corporation id) from the cached character JSON, once decoded."""
+        return self._info.get(cid, (None, None))
+
+    def invalidate(self, char_ids: Iterable[int]):
+        char_ids = list(char_ids)
+        for cid in char_ids:
+            self._generation[cid] = self._generation.get(cid, 0) + 1
+        self._unpack('char', char_ids)
+
+    def forget_images(self, kind: str, ids: Iterable[int]):
+        """Drop decoded copies of images that were replaced on disk."""
+        ids = list(ids)
+        registry = image_registry()
+        for id in ids:
+            registry.discard(str(self.cache.base), kind, str(id))
+        self._fingerprints.forget(kind, ids)
+        self._unpack(kind, ids)
+
+    def _unpack(self, kind: str, ids: List[int]):
+        if not self._packed:
+            return
+        for dpr, pairs in self._atlases.items():
+            for portraits, logos in pairs:
+                for id in ids:
+                    (portraits if kind == 'char' else logos).remove(id)
+            self._atlases[dpr] = [pair for pair in pairs if len(pair[0])]
+        if kind == 'char':
+            for packed in self._packed.values():
+                packed.difference_update(ids)
+
+    def chars_in_corps(self, corp_ids) -> List[int]:
+        """Characters loaded so far whose corporation is in `corp_ids`."""
+        corp_ids = set(corp_ids)
+        return [cid for cid, (_, corp) in self._info.items() if corp in corp_ids]
+
+    def _cache_key(self, key) -> str:
+        cid, gen, dpr = key
+        return f'{self._prefix}:{cid}:{gen}@{dpr}'
+
+    def pixmap(self, cid: int, dpr: float) -> QPixmap:
+        key = (cid, self._generation.get(cid, 0), dpr)
+        pix = QPixmap()
+        if QPixmapCache.find(self._cache_key(key), pix):
+            return pix
+        if key not in self._pending:
+            self._pending.add(key)
+            self.pool.start(_DecodeJob(self.cache, key, self._signals, self._fingerprints))
+        stale = self._shown.get(cid)
+        if stale and QPixmapCache.find(stale, pix):
+            return pix
+        return self._placeholder(dpr)
+
+    def _placeholder(self, dpr: float) -> QPixmap:
+        pix = self._placeholders.get(dpr)
+        if pix is None:
+            px = math.ceil(PORTRAIT_SIDE * dpr)
+            pix = QPixmap(px, px)
+            pix.fill(Qt.lightGray)
+            pix.setDevicePixelRatio(dpr)
+            self._placeholders[dpr] = pix
+        return pix
+
+    def _on_done(self, key, info, image):
+        self._pending.discard(key)
+        cid, gen, _ = key
+        if gen != self._generation.get(cid, 0) or image is None:
+            return
+        self._info[cid] = info
+        cache_key = self._cache_key(key)
+        QPixmapCache.insert(cache_key, QPixmap.fromImage(image))
+        self._shown[cid] = cache_key
+        self.tile_ready.emit(cid)
+
+    def build_atlases(self, char_ids: Iterable[int], dpr: float):
+        """Pack characters not in an atlas yet into new sheets, in the background.
+
+        Work is split into one job per portrait sheet, so a large roster is
+        packed in parallel and its first sheets show up while the rest is built.
+        """
+        packed = self._packed.setdefault(dpr, set())
+        missing = [cid for cid in char_ids if cid not in packed]
+        packed.update(missing)
+        batch = (DEFAULT_SHEET_SIDE // math.ceil(PORTRAIT_SIDE * dpr)) ** 2
+        for i in range(0, len(missing), batch):
+            self.pool.start(_AtlasJob(self.cache, missing[i:i + batch], dpr, self._signals, self._fingerprints))
+
+    def _on_atlas_done(self, dpr, infos, atlases):
+        portraits, logos = atlases
+        packed = self._packed.get(dpr, set())
+        if portraits is None:
+            packed.difference_update(infos)
+            return
+        # characters invalidated while the atlas was being built
+        for cid in portraits.ids():
+            if cid not in packed:
+                portraits.remove(cid)
+        for cid, info in infos.items():
+            if cid in packed:
+                self._info[cid] = info
+        if len(portraits):
+            self._atlases.setdefault(dpr, []).append((portraits, logos))
+            self.atlas_ready.emit()
+
+    def draw_tile(self, painter: QPainter, x: int, y: int, cid: int, dpr: float):
+        """Paint a character's tile at (x, y), from the atlases when it is packed."""
+        pairs = self._atlases.get(dpr, ())
+        target = QRect(x, y, PORTRAIT_SIDE, PORTRAIT_SIDE)
+        for portraits, _ in pairs:
+            if portraits.draw(painter, target, cid):
+                corp_id = self._info.get(cid, (None, None))[1]
+                if corp_id:
+                    # corp logo in the bottom-right corner, as in compose_tile
+                    off = PORTRAIT_SIDE - LOGO_SIDE - 4
+                    logo_rect = QRect(x + off, y + off, LOGO_SIDE, LOGO_SIDE)
+                    for _, logos in pairs:
+                        if logos.draw(painter, logo_rect, corp_id):
+                            break
+                return
+        painter.drawPixmap(x, y, self.pixmap(cid, dpr))
+
+    def wait_idle(self, msecs: int = -1) -> bool:
+        """Block until queued decodes finished (mainly for tests)."""
+        return self.pool.waitForDone(msecs)
+
+
+class CharacterGridModel(QAbstractListModel):
+    """One row per account: AccountRole -> account key, CharsRole -> character IDs."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._accounts: List[str] = []
+        self._chars: List[array] = []
+        self._row_of: Dict[int, int] = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._accounts)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._accounts):
+            return None
+        row = index.row()
+        if role == Qt.DisplayRole:
+            return f'Account {self._accounts[row]}'
+        if role == AccountRole:
+            return self._accounts[row]
+        if role == CharsRole:
+            return self._chars[row]
+        return None
+
+    def set_accounts(self, accounts: Sequence[Tuple[str, Sequence[int]]]) -> Dict[str, int]:
+        """Update the roster to [(account key, [char ids])], touching only rows that differ.
+
+        Accounts that disappeared are removed, new ones inserted, reordered
+        ones moved and accounts whose characters changed get a dataChanged
+        for CharsRole; untouched rows keep their layout and painted tiles.
+        Returns how many rows were removed/inserted/moved/changed.
+        """
+        new_keys = [acc for acc, _ in accounts]
+        new_chars = {acc: array('q', (int(c) for c in chars)) for acc, chars in accounts}
+        stats = {'removed': 0, 'inserted': 0, 'moved': 0, 'changed': 0}
+
+        # 1. removals, bottom-up in contiguous runs
+        row = len(self._accounts) - 1
+        while row >= 0:
+            if self._accounts[row] in new_chars:
+                row -= 1
+                continue
+            last = row
+            while row > 0 and self._accounts[row - 1] not in new_chars:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row, last)
+            del self._accounts[row:last + 1]
+            del self._chars[row:last + 1]
+            self.endRemoveRows()
+            stats['removed'] += last - row + 1
+            row -= 1
+
+        # 2. moves, so the surviving rows follow the new order
+        kept = set(self._accounts)
+        order = [acc for acc in new_keys if acc in kept]
+        for i, acc in enumerate(order):
+            if self._accounts[i] == acc:
+                continue
+            j = self._accounts.index(acc, i + 1)
+            self.beginMoveRows(QModelIndex(), j, j, QModelIndex(), i)
+            self._accounts.insert(i, self._accounts.pop(j))
+            self._chars.insert(i, self._chars.pop(j))
+            self.endMoveRows()
+            stats['moved'] += 1
+
+        # 3. insertions in contiguous runs
+        row = 0
+        while row < len(new_keys):
+            if new_keys[row] in kept:
+                row += 1
+                continue
+            first = row
+            while row < len(new_keys) and new_keys[row] not in kept:
+                row += 1
+            self.beginInsertRows(QModelIndex(), first, row - 1)
+            self._accounts[first:first] = new_keys[first:row]
+            self._chars[first:first] = [new_chars[acc] for acc in new_keys[first:row]]
+            self.endInsertRows()
+            stats['inserted'] += row - first
+
+        # 4. accounts whose characters changed
+        for row, acc in enumerate(self._accounts):
+            if acc in kept and self._chars[row] != new_chars[acc]:
+                self._chars[row] = new_chars[acc]
+                idx = self.index(row, 0)
+                self.dataChanged.emit(idx, idx, [CharsRole])
+                stats['changed'] += 1
+
+        self._reindex()
+        return stats
+
+    def _reindex(self):
+        self._row_of = {}
+        for row, chars in enumerate(self._chars):
+            for cid in chars:
+                self._row_of[cid] = row
+
+    def char_ids(self) -> List[int]:
+        return list(self._row_of)
+
+    def chars_changed(self, char_ids: Iterable[int]):
+        """Repaint the rows holding these characters (their tiles, not the row layout)."""
+        rows = {self._row_of[c] for c in char_ids if c in self._row_of}
+        for row in sorted(rows):
+            idx = self.index(row, 0)
+            self.dataChanged.emit(idx, idx, [Qt.DecorationRole])
+
+
+class CharacterGridDelegate(QStyledItemDelegate):
+    """Paints an account row: title strip with Delete button, then wrapped character tiles."""
+
+    delete_requested = Signal(str)
+
+    def __init__(self, view: QListView, provider: PortraitProvider):
+        super().__init__(view)
+        self.view = view
+        self.provider = provider
+
+    # -- geometry --------------------------------------------------------
+
+    def _name_height(self) -> int:
+        return QFontMetrics(self.view.font()).height() + 4
+
+    def tile_size(self) -> Tuple[int, int]:
+        return PORTRAIT_SIDE, PORTRAIT_SIDE + self._name_height()
+
+    def tiles_per_line(self, width: int) -> int:
+        tw, _ = self.tile_size()
+        return max(1, (width - 2 * MARGIN + TILE_SPACING) // (tw + TILE_SPACING))
+
+    def row_height(self, n_chars: int, width: int) -> int:
+        _, th = self.tile_size()
+        lines = max(1, math.ceil(n_chars / self.tiles_per_line(width))) if n_chars else 0
+        return TITLE_HEIGHT + MARGIN + lines * (th + TILE_SPACING)
+
+    def tile_rect(self, row_rect: QRect, i: int) -> QRect:
+        tw, th = self.tile_size()
+        per_line = self.tiles_per_line(row_rect.width())
+        line, col = divmod(i, per_line)
+        x = row_rect.left() + MARGIN + col * (tw + TILE_SPACING)
+        y = row_rect.top() + TITLE_HEIGHT + MARGIN + line * (th + TILE_SPACING)
+        return QRect(x, y, tw, th)
+
+    def delete_rect(self, row_rect: QRect) -> QRect:
+        x = row_rect.right() - DELETE_WIDTH - 6
+        y = row_rect.top() + (TITLE_HEIGHT - DELETE_HEIGHT) // 2
+        return QRect(x, y, DELETE_WIDTH, DELETE_HEIGHT)
+
+    # -- QStyledItemDelegate ---------------------------------------------
+
+    def sizeHint(self, option, index):
+        width = self.view.viewport().width()
+        chars = index.data(CharsRole) or ()
+        return QSize(width, self.row_height(len(chars), width))
+
+    def paint(self, painter: QPainter, option, index):
+        rect = option.rect
+        painter.save()
+        # title strip
+        title = QRect(rect.left(), rect.top(), rect.width(), TITLE_HEIGHT)
+        painter.fillRect(title, QColor('#eee'))
+        font = QFont(option.font)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.setPen(QColor('#222'))
+        painter.drawText(title.adjusted(8, 0, -DELETE_WIDTH - 12, 0), Qt.AlignVCenter | Qt.AlignLeft,
+                         index.data(Qt.DisplayRole))
+        btn = self.delete_rect(rect)
+        painter.fillRect(btn, QColor('#d9534f'))
+        painter.setPen(QColor('white'))
+        painter.setFont(option.font)
+        painter.drawText(btn, Qt.AlignCenter, 'Delete')
+
+        # tiles: only those inside the area being repainted
+        clip = option.rect.intersected(self.view.viewport().rect())
+        dpr = self.view.devicePixelRatioF() or 1.0
+        fm = QFontMetrics(option.font)
+        painter.setPen(option.palette.text().color())
+        for i, cid in enumerate(index.data(CharsRole) or ()):
+            tile = self.tile_rect(rect, i)
+            if not tile.intersects(clip):
+                continue
+            self.provider.draw_tile(painter, tile.left(), tile.top(), cid, dpr)
+            name, _ = self.provider.info(cid)
+            text = fm.elidedText(name or str(cid), Qt.ElideRight, PORTRAIT_SIDE)
+            name_rect = QRect(tile.left(), tile.top() + PORTRAIT_SIDE, PORTRAIT_SIDE, tile.height() - PORTRAIT_SIDE)
+            painter.drawText(name_rect, Qt.AlignHCenter | Qt.AlignVCenter, text)
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            if self.delete_rect(option.rect).contains(event.position().toPoint()):
+                self.delete_requested.emit(index.data(AccountRole))
+                return True
+        return super().editorEvent(event, model, option, index)
+
+
+class CharacterGridView(QListView):
+    """QListView configured for CharacterGridModel rows of varying height."""
+
+    def __init__(self, cache: CacheManager, parent=None):
+        super().__init__(parent)
+        self.provider = PortraitProvider(cache, self)
+        self.grid_model = CharacterGridModel(self)
+        self.provider.tile_ready.connect(lambda cid: self.grid_model.chars_changed([cid]))
+        self.provider.atlas_ready.connect(self.viewport().update)
+        self._atlas_enabled = False
+        self.grid_model.modelReset.connect(self.update_atlas)
+        self.grid_model.rowsInserted.connect(self.update_atlas)
+        self.grid_model.dataChanged.connect(self._on_data_changed)
+        self.grid_delegate = CharacterGridDelegate(self, self.provider)
+        self.setModel(self.grid_model)
+        self.setItemDelegate(self.grid_delegate)
+        self.setUniformItemSizes(False)
+        self.setResizeMode(QListView.Adjust)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSpacing(2)
+
+    def visible_char_ids(self) -> List[int]:
+        """Character IDs whose tile intersects the viewport, top to bottom."""
+        view_rect = self.viewport().rect()
+        visible = []
+        top = self.indexAt(view_rect.topLeft())
+        row = top.row() if top.isValid() else 0
+        while row < self.grid_model.rowCount():
+            idx = self.grid_model.index(row, 0)
+            rect = self.visualRect(idx)
+            if rect.top() > view_rect.bottom():
+                break
+            if rect.bottom() >= view_rect.top():
+                for i, cid in enumerate(idx.data(CharsRole) or ()):
+                    if self.grid_delegate.tile_rect(rect, i).intersects(view_rect):
+                        visible.append(cid)
+            row += 1
+        return visible
+
+    def _on_data_changed(self, top, bottom, roles=()):
+        if CharsRole in roles:
+            # a row's character list changed, and with it possibly its height
+            for row in range(top.row(), bottom.row() + 1):
+                self.grid_delegate.sizeHintChanged.emit(self.grid_model.index(row, 0))
+            self.update_atlas()
+
+    def set_atlas_enabled(self, enabled: bool):
+        """Paint the roster from sprite atlases (built in the background) instead of per-character pixmaps."""
+        self._atlas_enabled = bool(enabled)
+        self.update_atlas()
+
+    def update_atlas(self):
+        if self._atlas_enabled:
+            self.provider.build_atlases(self.grid_model.char_ids(), self.devicePixelRatioF() or 1.0)
+
+    def refresh_chars(self, char_ids: Iterable[int]):
+        char_ids = list(char_ids)
+        self.provider.forget_images('char', char_ids)
+        self.provider.invalidate(char_ids)
+        self.grid_model.chars_changed(char_ids)
+
+    def refresh_corps(self, corp_ids: Iterable[int]):
+        corp_ids = list(corp_ids)
+        self.provider.forget_images('corp', corp_ids)
+        chars = self.provider.chars_in_corps(corp_ids)
+        self.provider.invalidate(chars)
+        self.grid_model.chars_changed(chars)
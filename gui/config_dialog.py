@@ -7,11 +7,14 @@ from PySide6.QtWidgets import (
     QPushButton,
     QFileDialog,
     QMessageBox,
+    QCheckBox,
+    QSpinBox,
 )
 from pathlib import Path
 
 from eve_backend.config_store import ConfigStore
 from eve_backend.path_detector import PathDetector
+from eve_backend.refresher import DEFAULT_REQUESTS_PER_HOUR
 
 
 class ConfigureDialog(QDialog):
@@ -51,6 +54,19 @@ class ConfigureDialog(QDialog):
         hl2.addWidget(b2)
         layout.addLayout(hl2)
 
+        # opt-in background refresh of cached character/corp data
+        hl3 = QHBoxLayout()
+        self.refresh_check = QCheckBox('Refresh cached character data in the background')
+        self.refresh_check.setChecked(bool(self.config.get('background_refresh', False)))
+        hl3.addWidget(self.refresh_check)
+        hl3.addStretch()
+        hl3.addWidget(QLabel('Max requests/hour:'))
+        self.refresh_rate = QSpinBox()
+        self.refresh_rate.setRange(10, 3600)
+        self.refresh_rate.setValue(int(self.config.get('refresh_requests_per_hour', DEFAULT_REQUESTS_PER_HOUR)))
+        hl3.addWidget(self.refresh_rate)
+        layout.addLayout(hl3)
+
         # buttons: Test | Save | Cancel
         bl = QHBoxLayout()
         self.test_btn = QPushButton('Test')
@@ -93,6 +109,12 @@ class ConfigureDialog(QDialog):
         if not dat or not Path(dat).is_dir():
             QMessageBox.critical(self, 'Error', 'DAT root path is invalid or missing')
             return
-        cfg = {'logs_root': logs, 'dat_root': dat}
+        cfg = dict(self.config)
+        cfg.update({
+            'logs_root': logs,
+            'dat_root': dat,
+            'background_refresh': self.refresh_check.isChecked(),
+            'refresh_requests_per_hour': self.refresh_rate.value(),
+        })
         ConfigStore().save(cfg)
         self.accept()
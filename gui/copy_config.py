@@ -15,13 +15,22 @@ from PySide6.QtWidgets import (
     QTreeWidget,
     QTreeWidgetItem,
     QScrollArea,
+    QProgressBar,
 )
 from PySide6.QtGui import QPixmap
-from PySide6.QtCore import Qt, Signal, QStringListModel
+from PySide6.QtCore import Qt, Signal, QStringListModel, QThread
 from pathlib import Path
 import json
-import shutil
 from eve_backend.cache import CacheManager
+from eve_backend.copy_engine import CopyJob, TEMPLATE_FILES
+from eve_backend.mappings import shared_mappings
+from eve_backend.name_index import NameIndex
+from eve_backend.profiles import profile_index
+from .mappings_notifier import MappingsNotifier
+from .copy_worker import CopyWorker
+
+# names shown in the search popup
+COMPLETER_LIMIT = 50
 
 
 class CopyConfigTab(QWidget):
@@ -31,10 +40,16 @@ class CopyConfigTab(QWidget):
     All prior elements were removed as requested.
     """
 
+    # True while a copy thread runs, False once it has finished
+    busy_changed = Signal(bool)
+
     def __init__(self, mappings_path: str = None, parent=None):
         super().__init__(parent)
         self.cache = CacheManager()
         self.mappings_path = Path(mappings_path) if mappings_path else Path.cwd() / 'mappings.json'
+        self.mappings = shared_mappings(self.mappings_path)
+        self._mappings_notifier = MappingsNotifier(self.mappings, self)
+        self._mappings_notifier.changed.connect(self._on_mappings_changed, Qt.QueuedConnection)
         self.layout = QVBoxLayout(self)
 
         # thin title bar above the row, similar to AllCharacters account line
@@ -103,14 +118,16 @@ class CopyConfigTab(QWidget):
         self.char_search.setSizePolicy(QSizePolicy.Preferred, QSizePolicy.Fixed)
         row_l.addWidget(self.char_search)
 
-        # use QCompleter for autocomplete - handles focus properly
+        # use QCompleter for autocomplete - handles focus properly.
+        # Matching is done by the name index (prefix, word, substring and fuzzy
+        # matches, ranked); the completer only shows its results.
         self._completer = QCompleter()
         self._completer.setCaseSensitivity(Qt.CaseInsensitive)
-        self._completer.setFilterMode(Qt.MatchContains)
-        self._completer.setCompletionMode(QCompleter.PopupCompletion)
+        self._completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
         self._model = QStringListModel()
         self._completer.setModel(self._model)
         self.char_search.setCompleter(self._completer)
+        self.char_search.textEdited.connect(self._on_search_text)
         
         # connect when user selects from completer
         self._completer.activated.connect(self._on_completer_activated)
@@ -376,6 +393,27 @@ class CopyConfigTab(QWidget):
         self.copy_btn.setStyleSheet('QPushButton { background-color: #2196F3; color: white; font-weight: bold; border: none; border-radius: 4px; margin-top: 8px; } QPushButton:hover { background-color: #1976D2; } QPushButton:disabled { background-color: #ccc; }')
         self.copy_btn.clicked.connect(self._copy_settings)
         copy_actions_l.addWidget(self.copy_btn)
+
+        # progress of a running copy; files are copied on a worker thread
+        copy_progress_row = QWidget()
+        copy_progress_l = QHBoxLayout(copy_progress_row)
+        copy_progress_l.setContentsMargins(0, 0, 0, 0)
+        self.copy_progress = QProgressBar()
+        self.copy_progress.setMinimum(0)
+        self.copy_progress.setTextVisible(True)
+        copy_progress_l.addWidget(self.copy_progress)
+        self.cancel_copy_btn = QPushButton('Cancel')
+        self.cancel_copy_btn.setToolTip('Stop copying after the current file')
+        self.cancel_copy_btn.clicked.connect(self._cancel_copy)
+        copy_progress_l.addWidget(self.cancel_copy_btn)
+        copy_progress_row.setVisible(False)
+        self.copy_progress_row = copy_progress_row
+        copy_actions_l.addWidget(copy_progress_row)
+        self._copy_thread = None
+        self._copy_worker = None
+        # from starting a copy until its result is in; the thread itself is
+        # still winding down when the result arrives
+        self._copy_active = False
         
         # Status label
         self.copy_status = QLabel('')
@@ -392,8 +430,8 @@ class CopyConfigTab(QWidget):
         tree_section.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         self.layout.addWidget(tree_section)
 
-        # internal list of (name, id) for search
-        self._char_map = {}  # map name -> cid
+        # character id <-> name, and search for the completer
+        self._names = NameIndex()
         
         # Status tracking variables
         self._account_file_exists = False
@@ -457,52 +495,12 @@ class CopyConfigTab(QWidget):
     
     def _check_profile_exists(self):
         """Check if the entered profile name already exists and show warning (case-insensitive)."""
-        if not self.new_profile_chk.isChecked():
-            self.profile_warning.setVisible(False)
-            return
-            
-        profile_name = self.new_profile_input.text().strip()
-        if not profile_name:
-            self.profile_warning.setVisible(False)
-            return
-            
-        # Check if profile exists (case-insensitive for Windows compatibility)
-        server_path = self.dest_server_combo.currentData()
-        if not server_path:
-            self.profile_warning.setVisible(False)
-            return
-            
-        try:
-            if self.mappings_path.exists():
-                data = json.loads(self.mappings_path.read_text())
-                dat_roots = data.get('dat_roots', [])
-                if dat_roots:
-                    base_path = Path(dat_roots[0])
-                    server_dir = base_path / server_path
-                    
-                    if server_dir.exists():
-                        # Get all existing profile directories and check case-insensitively
-                        existing_profiles = []
-                        for settings_dir in server_dir.glob('settings_*'):
-                            if settings_dir.is_dir() and settings_dir.name != 'cache':
-                                # Remove "settings_" prefix to get profile name
-                                existing_name = settings_dir.name[9:]
-                                if existing_name:
-                                    existing_profiles.append(existing_name.lower())
-                        
-                        # Check if entered name conflicts case-insensitively
-                        if profile_name.lower() in existing_profiles:
-                            self.profile_warning.setVisible(True)
-                        else:
-                            self.profile_warning.setVisible(False)
-                    else:
-                        self.profile_warning.setVisible(False)
-                else:
-                    self.profile_warning.setVisible(False)
-            else:
-                self.profile_warning.setVisible(False)
-        except Exception:
-            self.profile_warning.setVisible(False)
+        self.profile_warning.setVisible(self.has_profile_name_conflict())
+    
+    def _profile_index(self):
+        """Cached profile listing of the first EVE directory, or None if not configured."""
+        base_path = self.mappings.snapshot().first_dat_root()
+        return profile_index(base_path) if base_path else None
     
     def _toggle_expand_collapse(self):
         """Toggle between expand all and collapse all."""
@@ -544,13 +542,7 @@ class CopyConfigTab(QWidget):
         self.character_tree.clear()
         
         try:
-            if not self.mappings_path.exists():
-                return
-                
-            data = json.loads(self.mappings_path.read_text())
-            mappings = data.get('mappings', {})
-            
-            for account_id, info in sorted(mappings.items(), key=lambda x: int(x[0])):
+            for account_id, char_ids in self.mappings.snapshot().items():
                 # Create account node
                 account_item = QTreeWidgetItem(self.character_tree)
                 account_item.setText(0, f"Account {account_id}")
@@ -559,9 +551,8 @@ class CopyConfigTab(QWidget):
                 account_item.setData(0, Qt.UserRole, {'type': 'account', 'id': account_id})
                 
                 # Add character nodes
-                char_ids = info.get('chars', [])
                 for char_id in sorted(char_ids, key=lambda x: int(str(x))):
-                    char_name = self._get_character_name(str(char_id))
+                    char_name = self._get_character_name_by_id(str(char_id))
                     
                     char_item = QTreeWidgetItem(account_item)
                     char_item.setText(0, char_name)
@@ -670,117 +661,65 @@ class CopyConfigTab(QWidget):
             self.select_all_chk.toggled.connect(self._on_select_all_toggled)
     
     def _populate_profiles(self):
-        """Populate the profile dropdown based on selected server.
-        Profiles are dynamic and user-specific, so we scan fresh each time."""
-        self.profile_combo.clear()
-        
-        server_path = self.server_combo.currentData()
-        if not server_path:
-            self.profile_combo.addItem("-- Select Server First --", None)
-            return
-            
-        # Add blank option first to require explicit selection
-        self.profile_combo.addItem("-- Select Profile --", None)
-            
-        try:
-            # Get the dat_roots from mappings.json
-            if not self.mappings_path.exists():
-                self.profile_combo.addItem("No mappings.json found", None)
-                return
-                
-            data = json.loads(self.mappings_path.read_text())
-            dat_roots = data.get('dat_roots', [])
-            
-            if not dat_roots:
-                self.profile_combo.addItem("No EVE directory configured", None)
-                return
-                
-            base_path = Path(dat_roots[0])
-            server_dir = base_path / server_path
-            
-            if not server_dir.exists():
-                self.profile_combo.addItem(f"Server directory not found", None)
-                return
-            
-            # Find all directories starting with "settings_" (excluding cache)
-            profile_dirs = []
-            for settings_dir in server_dir.glob('settings_*'):
-                if settings_dir.is_dir() and settings_dir.name != 'cache':
-                    profile_dirs.append(settings_dir)
-            
-            if not profile_dirs:
-                self.profile_combo.addItem("No profiles found", None)
-                return
-            
-            # Sort and add profiles
-            for settings_dir in sorted(profile_dirs, key=lambda x: x.name):
-                # Remove "settings_" prefix to get profile name
-                profile_name = settings_dir.name[9:]  # Remove "settings_" (9 chars)
-                if profile_name:  # Make sure we have a name after removing prefix
-                    self.profile_combo.addItem(profile_name, settings_dir.name)
-                    
-        except Exception as e:
-            print(f"Error populating profiles: {e}")
-            self.profile_combo.addItem(f"Error: {str(e)}", None)
+        """Populate the profile dropdown based on selected server."""
+        self._fill_profile_combo(self.profile_combo, self.server_combo.currentData())
     
     def refresh_profiles(self):
         """Manually refresh the profile list. Call this if profiles might have changed."""
+        index = self._profile_index()
+        if index:
+            index.invalidate()
         self._populate_profiles()
         self._populate_dest_profiles()
     
     def _populate_dest_profiles(self):
-        """Populate the destination profile dropdown based on selected server.
-        Profiles are dynamic and user-specific, so we scan fresh each time."""
-        self.dest_profile_combo.clear()
+        """Populate the destination profile dropdown based on selected server."""
+        self._fill_profile_combo(self.dest_profile_combo, self.dest_server_combo.currentData())
+    
+    def _fill_profile_combo(self, combo: QComboBox, server_path):
+        """List the server's profiles from the shared profile index (re-scanned when
+        the directory changes)."""
+        combo.clear()
         
-        server_path = self.dest_server_combo.currentData()
         if not server_path:
-            self.dest_profile_combo.addItem("-- Select Server First --", None)
+            combo.addItem("-- Select Server First --", None)
             return
             
         # Add blank option first to require explicit selection
-        self.dest_profile_combo.addItem("-- Select Profile --", None)
+        combo.addItem("-- Select Profile --", None)
             
         try:
             # Get the dat_roots from mappings.json
-            if not self.mappings_path.exists():
-                self.dest_profile_combo.addItem("No mappings.json found", None)
+            snap = self.mappings.snapshot()
+            if snap.status == 'missing':
+                combo.addItem("No mappings.json found", None)
                 return
-                
-            data = json.loads(self.mappings_path.read_text())
-            dat_roots = data.get('dat_roots', [])
-            
-            if not dat_roots:
-                self.dest_profile_combo.addItem("No EVE directory configured", None)
+            if not snap.ok:
+                combo.addItem("Error: failed to read mappings.json", None)
                 return
                 
-            base_path = Path(dat_roots[0])
-            server_dir = base_path / server_path
-            
-            if not server_dir.exists():
-                self.dest_profile_combo.addItem(f"Server directory not found", None)
+            base_path = snap.first_dat_root()
+            if not base_path:
+                combo.addItem("No EVE directory configured", None)
                 return
+            index = profile_index(base_path)
             
-            # Find all directories starting with "settings_" (excluding cache)
-            profile_dirs = []
-            for settings_dir in server_dir.glob('settings_*'):
-                if settings_dir.is_dir() and settings_dir.name != 'cache':
-                    profile_dirs.append(settings_dir)
+            if not index.server_exists(server_path):
+                combo.addItem(f"Server directory not found", None)
+                return
             
-            if not profile_dirs:
-                self.dest_profile_combo.addItem("No profiles found", None)
+            profiles = index.profiles(server_path)
+            if not profiles:
+                combo.addItem("No profiles found", None)
                 return
             
-            # Sort and add profiles
-            for settings_dir in sorted(profile_dirs, key=lambda x: x.name):
-                # Remove "settings_" prefix to get profile name
-                profile_name = settings_dir.name[9:]  # Remove "settings_" (9 chars)
-                if profile_name:  # Make sure we have a name after removing prefix
-                    self.dest_profile_combo.addItem(profile_name, settings_dir.name)
+            # Sorted by directory name
+            for profile in profiles:
+                combo.addItem(profile.name, profile.dir_name)
                     
         except Exception as e:
-            print(f"Error populating destination profiles: {e}")
-            self.dest_profile_combo.addItem(f"Error: {str(e)}", None)
+            print(f"Error populating profiles: {e}")
+            combo.addItem(f"Error: {str(e)}", None)
     
     def _update_file_status(self):
         """Check if the required data files exist and update status indicators."""
@@ -788,20 +727,21 @@ class CopyConfigTab(QWidget):
         self._account_file_exists = False
         self._character_file_exists = False
         
-        profile_path = self.get_selected_profile_path()
-        if not profile_path or not profile_path.exists():
+        server_path = self.get_selected_server()
+        profile_name = self.get_selected_profile()
+        index = self._profile_index()
+        if not (server_path and profile_name and index and index.has_profile(server_path, profile_name)):
             self._set_status_indicators(False, False)
             return
+        files = index.files(server_path, profile_name)
         
         # Check account file
         if self._current_account_id:
-            account_file = profile_path / f"core_user_{self._current_account_id}.dat"
-            self._account_file_exists = account_file.exists()
+            self._account_file_exists = f"core_user_{self._current_account_id}.dat" in files
         
         # Check character file
         if self._current_character_id:
-            char_file = profile_path / f"core_char_{self._current_character_id}.dat"
-            self._character_file_exists = char_file.exists()
+            self._character_file_exists = f"core_char_{self._current_character_id}.dat" in files
         
         self._set_status_indicators(self._account_file_exists, self._character_file_exists)
     
@@ -854,15 +794,9 @@ class CopyConfigTab(QWidget):
         if not server_path or not profile_name:
             return None
             
-        try:
-            if self.mappings_path.exists():
-                data = json.loads(self.mappings_path.read_text())
-                dat_roots = data.get('dat_roots', [])
-                if dat_roots:
-                    base_path = Path(dat_roots[0])
-                    return base_path / server_path / profile_name
-        except Exception:
-            pass
+        base_path = self.mappings.snapshot().first_dat_root()
+        if base_path:
+            return base_path / server_path / profile_name
         return None
     
     def get_selected_dest_server(self):
@@ -906,29 +840,8 @@ class CopyConfigTab(QWidget):
         if not server_path:
             return False
             
-        try:
-            if self.mappings_path.exists():
-                data = json.loads(self.mappings_path.read_text())
-                dat_roots = data.get('dat_roots', [])
-                if dat_roots:
-                    base_path = Path(dat_roots[0])
-                    server_dir = base_path / server_path
-                    
-                    if server_dir.exists():
-                        # Get all existing profile directories and check case-insensitively
-                        existing_profiles = []
-                        for settings_dir in server_dir.glob('settings_*'):
-                            if settings_dir.is_dir() and settings_dir.name != 'cache':
-                                # Remove "settings_" prefix to get profile name
-                                existing_name = settings_dir.name[9:]
-                                if existing_name:
-                                    existing_profiles.append(existing_name.lower())
-                        
-                        # Check if entered name conflicts case-insensitively
-                        return profile_name.lower() in existing_profiles
-        except Exception:
-            pass
-        return False
+        index = self._profile_index()
+        return bool(index and index.has_profile(server_path, profile_name))
     
     def get_selected_characters(self) -> list:
         """Get list of selected character IDs from the tree."""
@@ -989,34 +902,30 @@ class CopyConfigTab(QWidget):
         if not server_path or not profile_name:
             return None
             
-        try:
-            if self.mappings_path.exists():
-                data = json.loads(self.mappings_path.read_text())
-                dat_roots = data.get('dat_roots', [])
-                if dat_roots:
-                    base_path = Path(dat_roots[0])
-                    profile_path = base_path / server_path / profile_name
-                    
-                    # If creating new profile, the path may not exist yet
-                    if self.is_creating_new_profile():
-                        # Return the path where the new profile would be created
-                        return profile_path
-                    else:
-                        # Only return existing profile paths
-                        return profile_path if profile_path.exists() else None
-        except Exception:
-            pass
+        base_path = self.mappings.snapshot().first_dat_root()
+        if base_path:
+            profile_path = base_path / server_path / profile_name
+            
+            # If creating new profile, the path may not exist yet
+            if self.is_creating_new_profile():
+                # Return the path where the new profile would be created
+                return profile_path
+            else:
+                # Only return existing profile paths
+                return profile_path if profile_index(base_path).has_profile(server_path, profile_name) else None
         return None
 
     def _on_completer_activated(self, text: str):
         """Called when user selects a character from the completer popup."""
-        cid = self._char_map.get(text)
+        cid = self._names.id_of_label(text)
         if cid:
             self._on_char_selected(cid)
 
     def _on_search_text(self, text: str):
-        # deprecated: old popup handler, kept for compatibility
-        pass
+        """Show the best matching names for what the user typed."""
+        self._model.setStringList(self._names.search_labels(text, limit=COMPLETER_LIMIT))
+        if text.strip():
+            self._completer.complete()
 
     def _on_popup_clicked(self, item: 'QListWidgetItem'):
         # deprecated: old popup handler, kept for compatibility
@@ -1024,10 +933,9 @@ class CopyConfigTab(QWidget):
 
     def reload(self):
         """Reload both character list and profiles (since both can change dynamically)."""
-        # list all cached char JSONs and populate completer with 'Full Name'
-        self._char_map.clear()
+        # list all cached char JSONs and index their 'Full Name'
         chars_dir = self.cache.base / 'char'
-        names = []
+        pairs = []
         if chars_dir.exists():
             for p in sorted(chars_dir.glob('*.json')):
                 cid = p.stem
@@ -1036,32 +944,36 @@ class CopyConfigTab(QWidget):
                     name = data.get('name') or f'{cid}'
                 except Exception:
                     name = f'{cid}'
-                names.append(name)
-                self._char_map[name] = cid
+                pairs.append((cid, name))
+        self._names.rebuild(pairs)
         # update completer model
-        self._model.setStringList(sorted(names, key=lambda x: x.lower()))
+        self._model.setStringList(self._names.search_labels(self.char_search.text(), limit=COMPLETER_LIMIT))
         
         # Also refresh profiles since they can change
         self._populate_profiles()
         # Update status after reload
         self._update_file_status()
 
+    def _on_mappings_changed(self, old, new):
+        """mappings.json changed on disk (scan, account deleted in another tab)."""
+        if old.dat_roots != new.dat_roots:
+            self._populate_profiles()
+            self._populate_dest_profiles()
+        if old.items() != new.items():
+            self._populate_character_tree()
+            self._update_select_all_checkbox()
+        if self._current_character_id:
+            self._on_char_selected(self._current_character_id)
+        else:
+            self._update_copy_preview()
+
     def _on_char_changed(self, idx: int):
         if idx < 0:
             self.account_label.setText('')
             return
         cid = self.char_combo.itemData(idx)
         # find account from mappings.json that contains this char
-        account = None
-        try:
-            if self.mappings_path.exists():
-                data = json.loads(self.mappings_path.read_text())
-                for acc, info in data.get('mappings', {}).items():
-                    if str(cid) in [str(x) for x in info.get('chars', [])]:
-                        account = acc
-                        break
-        except Exception:
-            account = None
+        account = self.mappings.snapshot().account_of(cid)
         if account is not None:
             self.account_label.setText(f'Account {account}')
         else:
@@ -1070,18 +982,8 @@ class CopyConfigTab(QWidget):
     def _on_char_selected(self, cid: str):
         """Update account label when a character is selected from the popup."""
         self._current_character_id = cid
-        account = None
-        try:
-            if self.mappings_path.exists():
-                data = json.loads(self.mappings_path.read_text())
-                for acc, info in data.get('mappings', {}).items():
-                    if str(cid) in [str(x) for x in info.get('chars', [])]:
-                        account = acc
-                        self._current_account_id = acc
-                        break
-        except Exception:
-            account = None
-            self._current_account_id = None
+        account = self.mappings.snapshot().account_of(cid)
+        self._current_account_id = account
         
         if account is not None:
             self.account_label.setText(f'Account {account}')
@@ -1091,10 +993,6 @@ class CopyConfigTab(QWidget):
         # Update file status and preview after character selection
         self._update_file_status()
         self._update_copy_preview()
-            
-        # Update file status and preview after character selection
-        self._update_file_status()
-        self._update_copy_preview()
     
     def _on_account_config_toggled(self, checked: bool):
         """Called when account config checkbox is toggled."""
@@ -1104,168 +1002,137 @@ class CopyConfigTab(QWidget):
         """Called when character input editing is finished (focus lost or Enter pressed)."""
         # Try to match the current text to a character
         current_text = self.char_search.text().strip()
-        if current_text and current_text in self._char_map:
-            cid = self._char_map[current_text]
+        cid = self._names.id_of_label(current_text) if current_text else None
+        if cid:
             self._on_char_selected(cid)
             
     def _copy_settings(self):
-        """Copy settings according to the defined logic."""
+        """Validate the selection and start copying on a worker thread."""
+        if self._copy_active or (self._copy_thread is not None and self._copy_thread.isRunning()):
+            return
         try:
-            # Validate inputs
-            if not self._current_character_id:
-                self._set_copy_status("Please select a source character", "error")
-                return
-                
-            selected_chars = self.get_selected_characters()
-            if not selected_chars:
-                self._set_copy_status("Please select destination characters", "error")
-                return
-                
-            source_profile_path = self.get_selected_profile_path()
-            if not source_profile_path or not source_profile_path.exists():
-                self._set_copy_status("Source profile not found", "error")
-                return
-                
-            # Get destination profile path
-            dest_profile_path = self.get_selected_dest_profile_path()
-            if not dest_profile_path:
-                self._set_copy_status("Invalid destination profile", "error")
-                return
-                
-            # Check for profile conflicts if creating new profile
-            if self.is_creating_new_profile() and self.has_profile_name_conflict():
-                self._set_copy_status("Profile name already exists", "error")
-                return
-                
-            # SCENARIO 3: Handle new profile creation
-            if self.is_creating_new_profile():
-                success = self._create_new_profile_with_templates(source_profile_path, dest_profile_path)
-                if not success:
-                    return
-                    
-            # CHECK A: Get donor account ID
-            donor_account_id = self._current_account_id
-            if not donor_account_id:
-                self._set_copy_status("Could not determine source account", "error")
-                return
-                
-            # Get source character file
-            source_char_file = source_profile_path / f"core_char_{self._current_character_id}.dat"
-            if not source_char_file.exists():
-                self._set_copy_status(f"Source character file not found: {source_char_file.name}", "error")
-                return
-                
-            copied_files = []
-            use_account_config = self.use_account_cfg_chk.isChecked()
-            
-            # Process each selected destination character
-            for char_id in selected_chars:
-                # CHECK B: Get receiving character's account ID
-                receiving_account_id = self._get_account_id_for_character(char_id)
-                if not receiving_account_id:
-                    self._set_copy_status(f"Could not determine account for character {char_id}", "error")
-                    return
-                    
-                # Copy character file
-                dest_char_file = dest_profile_path / f"core_char_{char_id}.dat"
-                
-                # Skip copying if source and destination are the same file
-                if source_char_file.resolve() == dest_char_file.resolve():
-                    # Silently skip - user selected source character as destination
-                    pass
-                else:
-                    try:
-                        shutil.copy2(source_char_file, dest_char_file)
-                        copied_files.append(f"core_char_{char_id}.dat")
-                    except Exception as e:
-                        self._set_copy_status(f"Error copying character file for {char_id}: {str(e)}", "error")
-                        return
-                    
-                # Handle account file (CHECK C with modifications)
-                dest_account_file = dest_profile_path / f"core_user_{receiving_account_id}.dat"
-                source_account_file = source_profile_path / f"core_user_{donor_account_id}.dat"
-                
-                if source_account_file.exists():
-                    should_copy_account = False
-                    
-                    if use_account_config:
-                        # Always copy/overwrite if "Use account config as well" is checked
-                        should_copy_account = True
-                    elif not dest_account_file.exists():
-                        # Copy only if destination account file doesn't exist
-                        should_copy_account = True
-                        
-                    if should_copy_account:
-                        # Skip copying if source and destination are the same file
-                        if source_account_file.resolve() == dest_account_file.resolve():
-                            # Silently skip - same account file
-                            pass
-                        else:
-                            try:
-                                shutil.copy2(source_account_file, dest_account_file)
-                                if f"core_user_{receiving_account_id}.dat" not in copied_files:
-                                    copied_files.append(f"core_user_{receiving_account_id}.dat")
-                            except Exception as e:
-                                self._set_copy_status(f"Error copying account file for {receiving_account_id}: {str(e)}", "error")
-                                return
-                            
-            # Success message
-            char_count = len(selected_chars)
-            file_count = len(copied_files)
-            message = f"Successfully copied {file_count} files to {char_count} character(s)"
-            if self.is_creating_new_profile():
-                message += f" in new profile '{self.get_new_profile_name()}'"
-            self._set_copy_status(message, "success")
-            
+            job = self._build_copy_job()
         except Exception as e:
             self._set_copy_status(f"Unexpected error: {str(e)}", "error")
+            return
+        if job is None:
+            return
+
+        self._copy_thread = QThread()
+        self._copy_worker = CopyWorker(job)
+        self._copy_worker.moveToThread(self._copy_thread)
+        self._copy_worker.started.connect(self._on_copy_started)
+        self._copy_worker.progress.connect(self._on_copy_progress)
+        self._copy_worker.finished.connect(self._on_copy_finished)
+        self._copy_worker.finished.connect(self._copy_thread.quit)
+        self._copy_worker.finished.connect(self._copy_worker.deleteLater)
+        thread = self._copy_thread
+        thread.finished.connect(lambda: self._forget_copy_thread(thread))
+        thread.finished.connect(thread.deleteLater)
+        self._copy_thread.started.connect(self._copy_worker.run)
+        self._copy_active = True
+        self.copy_btn.setEnabled(False)
+        self._copy_thread.start()
+        self.busy_changed.emit(True)
+
+    def _build_copy_job(self):
+        """CopyJob for the current selection, or None (with a status message) if invalid."""
+        if not self._current_character_id:
+            self._set_copy_status("Please select a source character", "error")
+            return None
+
+        selected_chars = self.get_selected_characters()
+        if not selected_chars:
+            self._set_copy_status("Please select destination characters", "error")
+            return None
+
+        source_profile_path = self.get_selected_profile_path()
+        if not source_profile_path or not source_profile_path.exists():
+            self._set_copy_status("Source profile not found", "error")
+            return None
+
+        dest_profile_path = self.get_selected_dest_profile_path()
+        if not dest_profile_path:
+            self._set_copy_status("Invalid destination profile", "error")
+            return None
+
+        creating = self.is_creating_new_profile()
+        if creating and self.has_profile_name_conflict():
+            self._set_copy_status("Profile name already exists", "error")
+            return None
+
+        donor_account_id = self._current_account_id
+        if not donor_account_id:
+            self._set_copy_status("Could not determine source account", "error")
+            return None
+
+        snap = self.mappings.snapshot()
+        return CopyJob(
+            source_profile=source_profile_path,
+            dest_profile=dest_profile_path,
+            source_char_id=self._current_character_id,
+            source_account_id=donor_account_id,
+            destinations=[(cid, snap.account_of(cid)) for cid in selected_chars],
+            use_account_config=self.use_account_cfg_chk.isChecked(),
+            new_profile=creating,
+            new_profile_name=self.get_new_profile_name() if creating else '',
+        )
+
+    def _cancel_copy(self):
+        # the token is thread-safe; the worker stops before its next file
+        if self._copy_worker is not None:
+            self._copy_worker.cancel()
+            self.cancel_copy_btn.setEnabled(False)
+            self._set_copy_status("Cancelling...", "warning")
+
+    def _on_copy_started(self):
+        self.copy_btn.setEnabled(False)
+        self.cancel_copy_btn.setEnabled(True)
+        self.copy_progress.setValue(0)
+        self.copy_progress.setMaximum(1)
+        self.copy_progress_row.setVisible(True)
+        self._set_copy_status("Copying...", "info")
+
+    def _on_copy_progress(self, done: int, total: int, name: str):
+        self.copy_progress.setMaximum(max(total, 1))
+        self.copy_progress.setValue(done)
+        self.copy_progress.setFormat(f"%v/%m  {name}")
+
+    def _on_copy_finished(self, result):
+        self._copy_active = False
+        # deleted on its own thread from here on
+        self._copy_worker = None
+        self.copy_progress_row.setVisible(False)
+        status_type = {'ok': 'success', 'cancelled': 'warning'}.get(result.status, 'error')
+        self._set_copy_status(result.message, status_type)
+        # per-file outcome, including how each copy was made (reflink, ...)
+        self.copy_status.setToolTip('\n'.join(
+            f"{f.name}: {f.method if f.status == 'copied' else f.status}" for f in result.files))
+        # files (and maybe a new profile) were written: drop cached listings
+        index = self._profile_index()
+        if index:
+            index.invalidate(self.get_selected_dest_server())
+        self._update_file_status()
+        self._update_copy_preview()
     
-    def _create_new_profile_with_templates(self, source_profile_path: Path, dest_profile_path: Path) -> bool:
-        """Create new profile directory and copy template files."""
-        try:
-            # Create the new profile directory
-            dest_profile_path.mkdir(parents=True, exist_ok=True)
-            
-            # Template files to copy from source profile
-            template_files = [
-                "core_char__.dat",
-                "core_char_('char', None, 'dat').dat", 
-                "core_user__.dat",
-                "core_public__.yaml",
-                "prefs.ini"
-            ]
-            
-            copied_templates = []
-            for template_file in template_files:
-                source_file = source_profile_path / template_file
-                dest_file = dest_profile_path / template_file
-                
-                if source_file.exists():
-                    try:
-                        shutil.copy2(source_file, dest_file)
-                        copied_templates.append(template_file)
-                    except Exception as e:
-                        self._set_copy_status(f"Error copying template {template_file}: {str(e)}", "error")
-                        return False
-                        
-            self._set_copy_status(f"Created new profile with {len(copied_templates)} template files", "info")
-            return True
-            
-        except Exception as e:
-            self._set_copy_status(f"Error creating new profile: {str(e)}", "error")
-            return False
-    
+    def _forget_copy_thread(self, thread):
+        # a newer copy may already have replaced it
+        if self._copy_thread is thread:
+            self._copy_thread = None
+            self.busy_changed.emit(False)
+
+    def shutdown(self):
+        """Cancel a running copy and wait for its thread; call before closing the window."""
+        if self._copy_worker is not None:
+            self._copy_worker.cancel()
+        if self._copy_thread is not None and self._copy_thread.isRunning():
+            # its quit() is queued to this (now blocked) thread, so ask directly
+            self._copy_thread.quit()
+            self._copy_thread.wait()
+
     def _get_account_id_for_character(self, char_id: str) -> str:
         """Get account ID for a given character ID from mappings."""
-        try:
-            if self.mappings_path.exists():
-                data = json.loads(self.mappings_path.read_text())
-                for account_id, info in data.get('mappings', {}).items():
-                    if str(char_id) in [str(x) for x in info.get('chars', [])]:
-                        return account_id
-        except Exception:
-            pass
-        return None
+        return self.mappings.snapshot().account_of(char_id)
     
     def _set_copy_status(self, message: str, status_type: str = "info"):
         """Set copy status message with appropriate styling."""
@@ -1342,8 +1209,8 @@ class CopyConfigTab(QWidget):
                 self.files_details.setText(files_text)
                 self.files_details.setStyleSheet('margin-left: 12px; font-family: monospace; color: #333; font-size: 11px;')
                 
-                # Enable copy button
-                self.copy_btn.setEnabled(True)
+                # Enable copy button, unless a copy is still running
+                self.copy_btn.setEnabled(not self._copy_active)
             else:
                 self.files_details.setText('No operations to preview')
                 self.files_details.setStyleSheet('margin-left: 12px; font-family: monospace; color: #888;')
@@ -1356,10 +1223,7 @@ class CopyConfigTab(QWidget):
     
     def _get_character_name_by_id(self, char_id: str) -> str:
         """Get character name by ID, with fallback."""
-        for name, cid in self._char_map.items():
-            if cid == char_id:
-                return name
-        return self._get_character_name(char_id)  # Fallback to cache lookup
+        return self._names.name_of(char_id) or self._get_character_name(char_id)  # Fallback to cache lookup
     
     def _generate_files_preview(self) -> str:
         """Generate preview of files that will be copied/created."""
@@ -1375,16 +1239,8 @@ class CopyConfigTab(QWidget):
                 new_profile_name = self.get_new_profile_name()
                 files_text += f"📁 Create: settings_{new_profile_name}/\n\n"
                 
-                template_files = [
-                    "core_char__.dat",
-                    "core_char_('char', None, 'dat').dat",
-                    "core_user__.dat", 
-                    "core_public__.yaml",
-                    "prefs.ini"
-                ]
-                
                 files_text += "Template files:\n"
-                for template in template_files:
+                for template in TEMPLATE_FILES:
                     files_text += f"📄 Copy: {template}\n"
                 files_text += "\n"
             
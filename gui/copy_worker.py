@@ -0,0 +1,36 @@
+from PySide6.QtCore import QObject, Signal, Slot
+
+from eve_backend.copy_engine import CopyEngine, CopyJob, CopyResult
+from eve_backend.prefetcher import CancelToken
+
+
+class CopyWorker(QObject):
+    """Runs a CopyEngine job; move to a QThread and call its `run` slot."""
+
+    started = Signal()
+    # (done, total, file name)
+    progress = Signal(int, int, str)
+    finished = Signal(object)  # copy_engine.CopyResult
+
+    def __init__(self, job: CopyJob):
+        super().__init__()
+        self.job = job
+        self._cancel = CancelToken()
+
+    @Slot()
+    def run(self):
+        try:
+            self.started.emit()
+            res = CopyEngine(self.job).run(progress_callback=self._on_progress, cancel_token=self._cancel)
+        except Exception as e:
+            res = CopyResult('error', f'Unexpected error: {e}', [])
+        self.finished.emit(res)
+
+    def cancel(self):
+        self._cancel.cancel()
+
+    def _on_progress(self, done: int, total: int, f):
+        try:
+            self.progress.emit(done, total, f.name)
+        except Exception:
+            pass
@@ -0,0 +1,120 @@
+"""Process-wide LRU of decoded images, shared by all views and render threads.
+
+Entries are QImages (safe to share across threads, unlike QPixmaps) keyed by
+(cache base, kind, id, size in device pixels, source fingerprint), so e.g. a corp logo used by
+fifty characters is decoded once. The registry holds at most `budget_bytes`
+of pixel data; least recently used entries are evicted first.
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from PySide6.QtGui import QImage
+
+DEFAULT_BUDGET_MB = 64
+
+Key = Tuple[str, str, str, int, str]
+
+
+class ImageRegistry:
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_MB * 1024 * 1024):
+        self.budget_bytes = max(0, int(budget_bytes))
+        self._lock = threading.Lock()
+        self._images: 'OrderedDict[Key, QImage]' = OrderedDict()
+        self._loading: Dict[Key, threading.Event] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Key) -> Optional[QImage]:
+        with self._lock:
+            img = self._images.get(key)
+            if img is not None:
+                self._images.move_to_end(key)
+                self.hits += 1
+            return img
+
+    def put(self, key: Key, img: QImage) -> None:
+        size = img.sizeInBytes()
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self._bytes -= old.sizeInBytes()
+            if size > self.budget_bytes:
+                return
+            self._images[key] = img
+            self._bytes += size
+            self._evict()
+
+    def get_or_load(self, key: Key, loader: Callable[[], Optional[QImage]]) -> Optional[QImage]:
+        """Return the cached image or decode it with `loader` (once, even if several threads ask)."""
+        while True:
+            with self._lock:
+                img = self._images.get(key)
+                if img is not None:
+                    self._images.move_to_end(key)
+                    self.hits += 1
+                    return img
+                pending = self._loading.get(key)
+                if pending is None:
+                    self.misses += 1
+                    self._loading[key] = threading.Event()
+                    break
+            # another thread is decoding this image; wait and look again
+            pending.wait()
+        try:
+            img = loader()
+            if img is not None and not img.isNull():
+                self.put(key, img)
+            return img
+        finally:
+            with self._lock:
+                self._loading.pop(key).set()
+
+    def discard(self, base: str, kind: str, id: str) -> None:
+        """Drop every size of one image, e.g. after a newer copy was downloaded."""
+        with self._lock:
+            for key in [k for k in self._images if k[:3] == (base, kind, id)]:
+                self._bytes -= self._images.pop(key).sizeInBytes()
+
+    def set_budget(self, budget_bytes: int) -> None:
+        with self._lock:
+            self.budget_bytes = max(0, int(budget_bytes))
+            self._evict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._images.clear()
+            self._bytes = 0
+
+    def _evict(self):
+        while self._bytes > self.budget_bytes and self._images:
+            _, img = self._images.popitem(last=False)
+            self._bytes -= img.sizeInBytes()
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Resident size and hit counters."""
+        with self._lock:
+            return {
+                'entries': len(self._images),
+                'bytes': self._bytes,
+                'budget_bytes': self.budget_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def image_registry() -> ImageRegistry:
+    """The shared registry instance."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ImageRegistry()
+        return _registry
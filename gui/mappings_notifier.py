@@ -0,0 +1,26 @@
+from PySide6.QtCore import QObject, Signal
+
+from eve_backend.mappings import MappingsModel
+
+
+class MappingsNotifier(QObject):
+    """Re-emits MappingsModel changes as the Qt signal `changed(old, new)`.
+
+    The model may notice a change on any thread (e.g. a prefetch or backup
+    worker reading it); the signal is delivered queued to receivers living on
+    the GUI thread.
+    """
+
+    changed = Signal(object, object)
+
+    def __init__(self, model: MappingsModel, parent=None):
+        super().__init__(parent)
+        self.model = model
+        self._unsubscribe = model.subscribe(self._on_change)
+
+    def _on_change(self, old, new):
+        try:
+            self.changed.emit(old, new)
+        except RuntimeError:
+            # the Qt object is gone; stop listening
+            self._unsubscribe()
@@ -1,5 +1,7 @@
+import threading
+
 from PySide6.QtCore import QObject, Signal, Slot
-from typing import Optional, List
+from typing import Optional
 
 from eve_backend.prefetcher import Prefetcher, CancelToken
 
@@ -7,20 +9,32 @@ from eve_backend.prefetcher import Prefetcher, CancelToken
 class PrefetchWorker(QObject):
     started = Signal()
     progress = Signal(str)
+    event = Signal(object)  # prefetch_progress.ProgressEvent
+    # (stage, id) of each item that landed in the cache; ids exceed 32 bits, so not int
+    item_done = Signal(str, object)
     finished = Signal(object)
     error = Signal(str)
 
-    def __init__(self, mappings_path: Optional[str] = None):
+    def __init__(self, mappings_path: Optional[str] = None, workers: int = 4):
         super().__init__()
         self.mappings_path = mappings_path
+        self.workers = workers
         self._cancel = CancelToken()
+        # guards _prefetcher/_priority: prioritize() runs on the GUI thread
+        self._lock = threading.Lock()
+        self._prefetcher = None
+        self._priority = []
 
     @Slot()
     def run(self):
         try:
             self.started.emit()
-            pre = Prefetcher(mappings_path=self.mappings_path)
-            res = pre.run(progress_callback=self._on_progress, cancel_token=self._cancel)
+            pre = Prefetcher(mappings_path=self.mappings_path, workers=self.workers)
+            with self._lock:
+                self._prefetcher = pre
+                pre.prioritize(self._priority)
+            res = pre.run(progress_callback=self._on_progress, cancel_token=self._cancel,
+                          event_callback=self._on_event, item_callback=self._on_item)
             self.finished.emit(res)
         except Exception as e:
             self.error.emit(str(e))
@@ -28,8 +42,27 @@ class PrefetchWorker(QObject):
     def cancel(self):
         self._cancel.cancel()
 
+    def prioritize(self, char_ids):
+        """Fetch these characters next; safe to call from the GUI thread while run() is busy."""
+        with self._lock:
+            self._priority = list(char_ids)
+            if self._prefetcher is not None:
+                self._prefetcher.prioritize(self._priority)
+
     def _on_progress(self, msg: str):
         try:
             self.progress.emit(str(msg))
         except Exception:
             pass
+
+    def _on_event(self, ev):
+        try:
+            self.event.emit(ev)
+        except Exception:
+            pass
+
+    def _on_item(self, stage: str, id: int):
+        try:
+            self.item_done.emit(stage, id)
+        except Exception:
+            pass
@@ -0,0 +1,111 @@
+"""Sprite atlases: many same-sized images packed into a few large sheets.
+
+Painting sub-rects of a handful of shared sheets instead of one pixmap per
+character keeps texture uploads and QPixmapCache churn down when a large
+roster is scrolled. Sheets are QImages, so an atlas can be packed on a worker
+thread; once handed to the GUI thread each sheet is converted to a QPixmap on
+first use. Atlases are not counted against QPixmapCache or the image registry
+budget (a full 2048px sheet is 16 MB).
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from PySide6.QtCore import QRect
+from PySide6.QtGui import QImage, QPainter, QPixmap
+
+DEFAULT_SHEET_SIDE = 2048
+
+
+class SpriteAtlas:
+    """Fixed-size cells of `cell_px` device pixels on square sheets, indexed by id."""
+
+    def __init__(self, cell_px: int, sheet_side: int = DEFAULT_SHEET_SIDE):
+        self.cell_px = int(cell_px)
+        self.sheet_side = max(int(sheet_side), self.cell_px)
+        self._per_line = self.sheet_side // self.cell_px
+        self._sheets: List[QImage] = []
+        self._pixmaps: Dict[int, QPixmap] = {}
+        self._index: Dict[int, Tuple[int, QRect]] = {}
+        self._free: List[Tuple[int, QRect]] = []
+        self._next = 0
+
+    @property
+    def per_sheet(self) -> int:
+        return self._per_line * self._per_line
+
+    @property
+    def sheet_count(self) -> int:
+        return len(self._sheets)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, id) -> bool:
+        return id in self._index
+
+    def ids(self) -> List:
+        return list(self._index)
+
+    def locate(self, id) -> Optional[Tuple[int, QRect]]:
+        """(sheet number, rect in device pixels) of an image, or None."""
+        return self._index.get(id)
+
+    def _slot(self) -> Tuple[int, QRect]:
+        if self._free:
+            return self._free.pop()
+        sheet, i = divmod(self._next, self.per_sheet)
+        self._next += 1
+        if sheet == len(self._sheets):
+            img = QImage(self.sheet_side, self.sheet_side, QImage.Format_ARGB32_Premultiplied)
+            img.fill(0)
+            self._sheets.append(img)
+        line, col = divmod(i, self._per_line)
+        return sheet, QRect(col * self.cell_px, line * self.cell_px, self.cell_px, self.cell_px)
+
+    def add(self, id, image: QImage) -> bool:
+        """Copy `image` into a free cell (replacing an earlier copy of `id`)."""
+        if image is None or image.isNull():
+            return False
+        self.remove(id)
+        sheet, rect = self._slot()
+        painter = QPainter(self._sheets[sheet])
+        painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.fillRect(rect, 0)
+        painter.drawImage(rect.topLeft(), image, QRect(0, 0, self.cell_px, self.cell_px))
+        painter.end()
+        self._index[id] = (sheet, rect)
+        # the converted pixmap of this sheet is outdated now
+        self._pixmaps.pop(sheet, None)
+        return True
+
+    def remove(self, id) -> None:
+        loc = self._index.pop(id, None)
+        if loc is not None:
+            self._free.append(loc)
+
+    def sheet(self, n: int) -> QImage:
+        return self._sheets[n]
+
+    def pixmap(self, n: int) -> QPixmap:
+        """Sheet `n` as a pixmap; GUI thread only."""
+        pix = self._pixmaps.get(n)
+        if pix is None:
+            pix = self._pixmaps[n] = QPixmap.fromImage(self._sheets[n])
+        return pix
+
+    def draw(self, painter: QPainter, target: QRect, id) -> bool:
+        """Paint the image of `id` into `target` (logical pixels); False if not in the atlas."""
+        loc = self._index.get(id)
+        if loc is None:
+            return False
+        sheet, rect = loc
+        painter.drawPixmap(target, self.pixmap(sheet), rect)
+        return True
+
+
+def build_atlas(ids: Iterable, cell_px: int, load: Callable[[object], Optional[QImage]],
+                sheet_side: int = DEFAULT_SHEET_SIDE) -> SpriteAtlas:
+    """Pack the images returned by `load(id)` into a new atlas; ids without an image are skipped."""
+    atlas = SpriteAtlas(cell_px, sheet_side)
+    for id in ids:
+        atlas.add(id, load(id))
+    return atlas
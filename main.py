@@ -6,6 +6,7 @@ Requires `PySide6` (see `requirements.txt`).
 import os
 import json
 import sys
+import time
 from pathlib import Path
 
 # Truncate backend log file at startup to avoid huge logs accumulating.
@@ -33,13 +34,17 @@ from PySide6.QtWidgets import (
     QSpacerItem,
     QSizePolicy,
 )
-from PySide6.QtCore import QThread
+from PySide6.QtCore import QEvent, QThread
 from PySide6.QtGui import QIcon
 
 from eve_backend.path_detector import PathDetector
 from gui.worker import ScanWorker
 from gui.widgets import StatusIndicator
 
+# the background refresher waits this long after the user last typed or clicked
+USER_IDLE_SECONDS = 60
+_INPUT_EVENTS = (QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.Wheel)
+
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -64,10 +69,18 @@ class MainWindow(QMainWindow):
         from gui.backup_tab import BackupTab
         from gui.help_tab import HelpTab
 
+        # idle state for the background refresher; only ever written on this
+        # (GUI) thread, and read as plain values from the refresher's thread
+        self._busy_jobs = set()
+        self._last_input = time.monotonic()
+        QApplication.instance().installEventFilter(self)
+
         tabs = QTabWidget()
         self.all_chars_tab = AllCharactersTab(main_window=self)
+        self.all_chars_tab.busy_changed.connect(lambda busy: self._set_busy('prefetch', busy))
         tabs.addTab(self.all_chars_tab, 'All Characters')
         self.copy_config_tab = CopyConfigTab()
+        self.copy_config_tab.busy_changed.connect(lambda busy: self._set_busy('copy', busy))
         tabs.addTab(self.copy_config_tab, 'Copy Config')
         self.backup_tab = BackupTab()
         tabs.addTab(self.backup_tab, 'Backup')
@@ -87,6 +100,8 @@ class MainWindow(QMainWindow):
         self.mappings_path = Path.cwd() / 'mappings.json'
         # initialize indicators
         self.update_indicators()
+        self._refresher = None
+        self.update_background_refresh()
 
     def update_indicators(self):
         # check for settings
@@ -112,6 +127,48 @@ class MainWindow(QMainWindow):
         if dlg.exec():
             # saved; refresh indicators
             self.update_indicators()
+            self.update_background_refresh()
+
+    def update_background_refresh(self):
+        """Start or stop the opt-in background cache refresher to match the saved config."""
+        from eve_backend.config_store import ConfigStore
+        from eve_backend.refresher import CacheRefresher, DEFAULT_REQUESTS_PER_HOUR
+        cfg = ConfigStore().load()
+        if self._refresher:
+            self._refresher.stop()
+            self._refresher = None
+        if not cfg.get('background_refresh'):
+            return
+        self._refresher = CacheRefresher(
+            mappings_path=str(self.mappings_path),
+            requests_per_hour=int(cfg.get('refresh_requests_per_hour', DEFAULT_REQUESTS_PER_HOUR)),
+            is_idle=self._is_idle,
+        )
+        self._refresher.start()
+
+    def _set_busy(self, job: str, busy: bool):
+        if busy:
+            self._busy_jobs.add(job)
+        else:
+            self._busy_jobs.discard(job)
+
+    def eventFilter(self, obj, event):
+        if event.type() in _INPUT_EVENTS:
+            self._last_input = time.monotonic()
+        return super().eventFilter(obj, event)
+
+    def _is_idle(self) -> bool:
+        # called from the refresher thread: reads only state the GUI thread keeps
+        # up to date, never Qt objects that may be replaced or deleted meanwhile
+        return not self._busy_jobs and time.monotonic() - self._last_input >= USER_IDLE_SECONDS
+
+    def closeEvent(self, event):
+        if self._refresher:
+            self._refresher.stop()
+        # destroying a running QThread aborts the process
+        self.all_chars_tab.shutdown()
+        self.copy_config_tab.shutdown()
+        super().closeEvent(event)
 
     # GUI no longer displays mappings contents; removed file open and tree view
 
@@ -130,8 +187,10 @@ class MainWindow(QMainWindow):
         self._worker.finished.connect(self._on_worker_finished)
         self._worker.finished.connect(self._thread.quit)
         self._worker.finished.connect(self._worker.deleteLater)
+        self._thread.finished.connect(lambda: self._set_busy('scan', False))
         self._thread.finished.connect(self._thread.deleteLater)
         self._thread.start()
+        self._set_busy('scan', True)
 
     def _on_worker_error(self, err: str):
         QMessageBox.critical(self, 'Extractor error', err)
@@ -142,8 +201,10 @@ class MainWindow(QMainWindow):
     def _on_worker_finished(self, result):
         # result is ScanResult from backend
         if getattr(result, 'success', False):
-            # update indicators and reload tabs
-            self.all_chars_tab.reload()
+            # tabs listening to the shared mappings model update themselves;
+            # the copy tab also re-reads character names from the cache
+            from eve_backend.mappings import shared_mappings
+            shared_mappings(self.mappings_path).refresh()
             self.copy_config_tab.reload()
         else:
             QMessageBox.warning(self, 'Scan', f'Scan failed: {getattr(result, "errors", [])}')
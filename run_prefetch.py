@@ -3,8 +3,12 @@
 
 Usage:
   EVE_BACKEND_LOG_ESI_RESPONSE=1 python3 run_prefetch.py
+  EVE_BACKEND_OFFLINE=1 python3 run_prefetch.py   # cache-only, no network
+  python3 run_prefetch.py --json                  # progress events as JSON lines
 """
 import os
+import sys
+import json
 import logging
 from pathlib import Path
 
@@ -20,6 +24,11 @@ configure_logging(level=logging.DEBUG, log_file=log_file)
 from eve_backend.prefetcher import Prefetcher
 
 if __name__ == '__main__':
+    if '--json' in sys.argv[1:]:
+        # one JSON object per line on stdout, for scripts and dashboards
+        res = Prefetcher().run(event_callback=lambda e: print(json.dumps(e.to_dict()), flush=True))
+        print(json.dumps({'kind': 'result', 'result': res}), flush=True)
+        sys.exit(0)
     print('Running Prefetcher (headless). Log file:', log_file)
     p = Prefetcher()
     res = p.run(progress_callback=lambda m: print('PROG:', m))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Benchmark Prefetcher against the local ESI stand-in server (no internet needed).
+
+Usage:
+  python tests/bench_prefetch.py --chars 200 --latency 0.05
+  python tests/bench_prefetch.py --cassette esi_cassette.json   # replay recorded traffic
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from eve_backend import esi_client  # noqa: E402
+from eve_backend.cache import CacheManager  # noqa: E402
+from eve_backend.prefetcher import Prefetcher  # noqa: E402
+from esi_stub import ESIStubServer  # noqa: E402
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('--chars', type=int, default=100, help='number of characters in the synthetic roster')
+    ap.add_argument('--accounts', type=int, default=0, help='number of accounts (default: chars / 3)')
+    ap.add_argument('--corps', type=int, default=10, help='number of distinct corporations')
+    ap.add_argument('--latency', type=float, default=0.02, help='per-request server latency in seconds')
+    ap.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 502')
+    ap.add_argument('--cassette', help='replay responses from this cassette instead of generating them')
+    args = ap.parse_args(argv)
+
+    accounts = args.accounts or max(1, args.chars // 3)
+    mappings = {}
+    for i in range(args.chars):
+        acc = str(1000 + i % accounts)
+        mappings.setdefault(acc, {'chars': []})['chars'].append(str(2100000000 + i))
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            ESIStubServer(latency=args.latency, error_rate=args.error_rate, corp_count=args.corps,
+                          error_limit=10 ** 9, cassette=args.cassette) as srv:
+        esi_client.ESI_BASE = srv.esi_base
+        esi_client.IMG_BASE = srv.img_base
+        mp = Path(tmp) / 'mappings.json'
+        mp.write_text(json.dumps({'mappings': mappings}))
+        cache = CacheManager(base=Path(tmp) / 'cache')
+
+        for label in ('cold', 'warm'):
+            served_before = len(srv.request_log)
+            t0 = time.perf_counter()
+            res = Prefetcher(cache=cache, mappings_path=str(mp)).run()
+            elapsed = time.perf_counter() - t0
+            served = len(srv.request_log) - served_before
+            rate = served / elapsed if elapsed else 0.0
+            print(f'{label}: {res} in {elapsed:.3f}s, {served} requests ({rate:.1f} req/s), '
+                  f'{srv.connections} connections total')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+import pytest
+
+# eve_backend configures file logging on import; keep test runs out of ./logs
+os.environ['EVE_BACKEND_LOG_FILE'] = os.path.join(tempfile.mkdtemp(prefix='eve_backend_tests_'), 'eve_backend.log')
+
+from eve_backend import esi_client
+from esi_stub import ESIStubServer
+
+
+@pytest.fixture
+def esi_server(monkeypatch):
+    """Start a local ESI/image stand-in and point esi_client at it."""
+    server = ESIStubServer().start()
+    monkeypatch.setattr(esi_client, 'ESI_BASE', server.esi_base)
+    monkeypatch.setattr(esi_client, 'IMG_BASE', server.img_base)
+    esi_client.circuit_breaker.reset()
+    yield server
+    server.stop()
+    esi_client.circuit_breaker.reset()
@@ -0,0 +1,259 @@
+"""Local stand-in for ESI and the EVE image server, for tests and benchmarks.
+
+ESIStubServer serves ESI-shaped character/corporation JSON and PNG portraits
+and logos over real HTTP on 127.0.0.1, so esi_client and Prefetcher can be
+exercised (connection handling, concurrency, headers) without the internet.
+
+Features:
+- configurable per-request latency and error rate (seeded, deterministic)
+- `missing_ids` answered with 404, like deleted characters/corporations
+- POST /characters/affiliation/ answered from the same character -> corp
+  mapping; `corp_overrides` moves characters to other corporations
+- ESI error-limit headers (X-ESI-Error-Limit-Remain / -Reset); once the
+  budget is used up the server answers 420 like ESI does
+- record/replay: every served response can be saved to a JSON "cassette"
+  and served back later; with `upstream=True` misses are proxied to the
+  real ESI/image servers and recorded
+
+Usage:
+    with ESIStubServer(latency=0.05) as srv:
+        esi_client.ESI_BASE = srv.esi_base
+        esi_client.IMG_BASE = srv.img_base
+        ...
+"""
+import base64
+import json
+import random
+import re
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+from urllib.parse import urlsplit, parse_qs
+
+UPSTREAM_ESI = 'https://esi.evetech.net'
+UPSTREAM_IMG = 'https://images.evetech.net'
+
+CHAR_RE = re.compile(r'^/latest/characters/(\d+)/?$')
+CORP_RE = re.compile(r'^/latest/corporations/(\d+)/?$')
+PORTRAIT_RE = re.compile(r'^/characters/(\d+)/portrait$')
+LOGO_RE = re.compile(r'^/corporations/(\d+)/logo$')
+AFFILIATION_PATH = '/latest/characters/affiliation/'
+
+
+def make_png(size: int, rgb=(80, 120, 160)) -> bytes:
+    """Build a solid-colour RGB PNG of `size` x `size` pixels (pure Python)."""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    row = b'\x00' + bytes(rgb) * size
+    raw = row * size
+    ihdr = struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b'')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: '_StubHTTPServer'
+
+    def setup(self):
+        super().setup()
+        self.server.stub._on_connection()
+
+    def log_message(self, format, *args):
+        # keep test output quiet
+        pass
+
+    def do_GET(self):
+        self._respond(*self.server.stub._handle(self.path))
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self._respond(*self.server.stub._handle(self.path, self.rfile.read(length)))
+
+    def _respond(self, status, headers, body):
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    stub: 'ESIStubServer'
+
+
+class ESIStubServer:
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0,
+                 error_limit: int = 100, error_limit_reset: int = 60, corp_count: int = 10,
+                 cassette: Optional[str] = None, record: bool = False, upstream: bool = False,
+                 missing_ids=()):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_limit = error_limit
+        self.error_limit_reset = error_limit_reset
+        self.corp_count = corp_count
+        # IDs answered with 404 everywhere (e.g. deleted characters)
+        self.missing_ids = set(int(i) for i in missing_ids)
+        # character id -> corporation id, overriding the default mapping
+        self.corp_overrides: Dict[int, int] = {}
+        self.record = record or upstream
+        self.upstream = upstream
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._error_remain = error_limit
+        self._recorded: Dict[str, dict] = {}
+        self._replay: Optional[Dict[str, dict]] = None
+        if cassette:
+            self._replay = self.load_cassette(cassette)
+        self.request_log = []
+        self.connections = 0
+        self._httpd = None
+        self._thread = None
+
+    # -- lifecycle -------------------------------------------------------
+
+    def start(self) -> 'ESIStubServer':
+        self._httpd = _StubHTTPServer(('127.0.0.1', 0), _Handler)
+        self._httpd.stub = self
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05},
+                                        daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def esi_base(self) -> str:
+        return f'{self.base_url}/latest/'
+
+    @property
+    def img_base(self) -> str:
+        return f'{self.base_url}/'
+
+    # -- cassettes -------------------------------------------------------
+
+    @staticmethod
+    def load_cassette(path: str) -> Dict[str, dict]:
+        data = json.loads(Path(path).read_text())
+        return {it['path']: it for it in data.get('interactions', [])}
+
+    def save_cassette(self, path: str) -> None:
+        with self._lock:
+            interactions = list(self._recorded.values())
+        Path(path).write_text(json.dumps({'version': 1, 'interactions': interactions}, indent=2))
+
+    # -- request handling ------------------------------------------------
+
+    def _on_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def corp_of(self, cid: int) -> int:
+        return self.corp_overrides.get(cid, 98000000 + cid % max(1, self.corp_count))
+
+    def _handle(self, raw_path: str, request_body: Optional[bytes] = None):
+        with self._lock:
+            self.request_log.append(raw_path)
+            inject_error = self.error_rate > 0 and self._rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self._lock:
+            error_limited = self._error_remain <= 0
+        if error_limited:
+            return self._with_limits(420, {'Content-Type': 'application/json'},
+                                     b'{"error": "This software has exceeded the error limit for ESI."}')
+        if inject_error:
+            return self._with_limits(502, {'Content-Type': 'application/json'}, b'{"error": "Bad gateway"}')
+
+        if self._replay is not None:
+            it = self._replay.get(raw_path)
+            if it is None:
+                return self._with_limits(404, {'Content-Type': 'application/json'}, b'{"error": "Not recorded"}')
+            return self._with_limits(it['status'], dict(it.get('headers', {})), base64.b64decode(it['body_b64']))
+
+        if self.upstream:
+            status, headers, body = self._proxy(raw_path, request_body)
+        else:
+            status, headers, body = self._generate(raw_path, request_body)
+        if self.record and status < 500:
+            with self._lock:
+                self._recorded.setdefault(raw_path, {
+                    'path': raw_path,
+                    'status': status,
+                    'headers': headers,
+                    'body_b64': base64.b64encode(body).decode('ascii'),
+                })
+        return self._with_limits(status, headers, body)
+
+    def _with_limits(self, status: int, headers: dict, body: bytes):
+        with self._lock:
+            if status >= 400:
+                self._error_remain = max(0, self._error_remain - 1)
+            remain = self._error_remain
+        headers = dict(headers)
+        headers['X-ESI-Error-Limit-Remain'] = str(remain)
+        headers['X-ESI-Error-Limit-Reset'] = str(self.error_limit_reset)
+        return status, headers, body
+
+    def _generate(self, raw_path: str, request_body: Optional[bytes] = None):
+        parts = urlsplit(raw_path)
+        path = parts.path
+        json_headers = {'Content-Type': 'application/json; charset=UTF-8'}
+        if path == AFFILIATION_PATH and request_body is not None:
+            ids = [int(i) for i in json.loads(request_body or b'[]')]
+            body = [{'character_id': i, 'corporation_id': self.corp_of(i)} for i in ids if i not in self.missing_ids]
+            return 200, json_headers, json.dumps(body).encode()
+        m = CHAR_RE.match(path) or CORP_RE.match(path) or PORTRAIT_RE.match(path) or LOGO_RE.match(path)
+        if m and int(m.group(1)) in self.missing_ids:
+            return 404, json_headers, b'{"error": "Not found"}'
+        m = CHAR_RE.match(path)
+        if m:
+            cid = int(m.group(1))
+            corp_id = self.corp_of(cid)
+            body = {'name': f'Stub Char {cid}', 'corporation_id': corp_id, 'security_status': 0.0}
+            return 200, json_headers, json.dumps(body).encode()
+        m = CORP_RE.match(path)
+        if m:
+            corp_id = int(m.group(1))
+            body = {'name': f'Stub Corp {corp_id}', 'ticker': f'S{corp_id % 10000}', 'member_count': 1}
+            return 200, json_headers, json.dumps(body).encode()
+        m = PORTRAIT_RE.match(path) or LOGO_RE.match(path)
+        if m:
+            size = int(parse_qs(parts.query).get('size', ['64'])[0])
+            ident = int(m.group(1))
+            rgb = (ident % 256, (ident // 256) % 256, 128)
+            return 200, {'Content-Type': 'image/png'}, make_png(size, rgb)
+        return 404, json_headers, b'{"error": "Not found"}'
+
+    def _proxy(self, raw_path: str, request_body: Optional[bytes] = None):
+        import requests
+        host = UPSTREAM_ESI if raw_path.startswith('/latest/') else UPSTREAM_IMG
+        if request_body is not None:
+            r = requests.post(host + raw_path, data=request_body, timeout=10,
+                              headers={'Content-Type': 'application/json'})
+        else:
+            r = requests.get(host + raw_path, timeout=10)
+        keep = {k: v for k, v in r.headers.items() if k.lower() in ('content-type', 'expires', 'etag', 'last-modified')}
+        return r.status_code, keep, r.content
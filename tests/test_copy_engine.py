@@ -0,0 +1,130 @@
+import os
+import time
+from pathlib import Path
+
+from eve_backend import filecopy
+from eve_backend.copy_engine import CopyEngine, CopyJob, TEMPLATE_FILES
+from eve_backend.prefetcher import CancelToken
+
+
+def make_source(tmp_path):
+    src = tmp_path / 'settings_Default'
+    src.mkdir()
+    (src / 'core_char_1.dat').write_bytes(b'char one')
+    (src / 'core_user_10.dat').write_bytes(b'account ten')
+    for name in TEMPLATE_FILES[:2]:
+        (src / name).write_bytes(b'template')
+    return src
+
+
+def test_copies_char_and_account_files(tmp_path):
+    src = make_source(tmp_path)
+    (src / 'core_user_20.dat').write_bytes(b'keep me')
+    job = CopyJob(src, src, '1', '10', [('1', '10'), ('2', '20'), ('3', '30'), ('4', '30')])
+    events = []
+    res = CopyEngine(job).run(progress_callback=lambda d, t, f: events.append((d, t, f.name)))
+
+    assert res.ok
+    assert res.message == 'Successfully copied 4 files to 4 character(s)'
+    assert (src / 'core_char_3.dat').read_bytes() == b'char one'
+    assert (src / 'core_user_30.dat').read_bytes() == b'account ten'
+    # existing account files are kept unless the account config is wanted
+    assert (src / 'core_user_20.dat').read_bytes() == b'keep me'
+    # source char onto itself and the donor account file are skipped
+    assert [f.name for f in res.files if f.status == 'skipped'] == ['core_char_1.dat', 'core_user_10.dat', 'core_user_20.dat']
+    assert [e[0] for e in events] == list(range(1, len(res.files) + 1))
+    assert {e[1] for e in events} == {len(res.files)}
+
+
+def test_new_profile_gets_templates(tmp_path):
+    src = make_source(tmp_path)
+    dest = tmp_path / 'settings_New'
+    job = CopyJob(src, dest, '1', '10', [('2', '20')], use_account_config=True,
+                  new_profile=True, new_profile_name='New')
+    res = CopyEngine(job).run()
+
+    assert res.ok
+    assert res.message == "Successfully copied 2 files to 1 character(s) in new profile 'New'"
+    assert sorted(f.name for f in res.copied('template')) == sorted(TEMPLATE_FILES[:2])
+    assert sorted(p.name for p in dest.iterdir()) == sorted(TEMPLATE_FILES[:2] + ['core_char_2.dat', 'core_user_20.dat'])
+
+
+def test_errors_and_cancellation(tmp_path):
+    src = make_source(tmp_path)
+    res = CopyEngine(CopyJob(src, src, '1', '10', [('2', None)])).run()
+    assert res.status == 'error' and 'character 2' in res.message
+    assert not (src / 'core_char_2.dat').exists()
+
+    res = CopyEngine(CopyJob(src, src, '5', '10', [('2', '20')])).run()
+    assert res.status == 'error' and 'core_char_5.dat' in res.message
+
+    token = CancelToken()
+    job = CopyJob(src, src, '1', '10', [('2', '20'), ('3', '30')])
+    res = CopyEngine(job).run(progress_callback=lambda d, t, f: token.cancel(), cancel_token=token)
+    assert res.status == 'cancelled'
+    # character files go out together; the account files after them are not written
+    assert [(f.kind, f.status) for f in res.files if f.kind == 'account'] == [('account', 'cancelled')] * 2
+    assert not (src / 'core_user_20.dat').exists()
+
+
+def test_fan_out_writes_every_destination_with_metadata(tmp_path, monkeypatch):
+    src = make_source(tmp_path)
+    os.utime(src / 'core_char_1.dat', ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+    # force userspace copies, which share one read of the source
+    monkeypatch.setattr(filecopy, 'METHODS', [])
+    reads = []
+    read_bytes = Path.read_bytes
+    monkeypatch.setattr(Path, 'read_bytes', lambda self: reads.append(self.name) or read_bytes(self))
+    dests = [(str(c), '10') for c in range(100, 150)]
+    res = CopyEngine(CopyJob(src, src, '1', '10', dests)).run()
+
+    assert res.ok and len(res.copied('char')) == 50
+    assert res.methods() == {'userspace': 50}
+    assert reads == ['core_char_1.dat']
+    for c, _ in dests:
+        out = src / f'core_char_{c}.dat'
+        assert out.read_bytes() == b'char one'
+        assert out.stat().st_mtime_ns == 1_600_000_000_000_000_000
+
+
+def test_rerun_skips_unchanged_destinations(tmp_path):
+    src = make_source(tmp_path)
+    old = 1_600_000_000_000_000_000
+    os.utime(src / 'core_char_1.dat', ns=(old, old))
+    job = CopyJob(src, src, '1', '10', [('2', '20'), ('3', '20'), ('4', '20')], use_account_config=True)
+    assert CopyEngine(job).run().ok
+    (src / 'core_char_3.dat').write_bytes(b'char 333')  # same size, other content
+    os.utime(src / 'core_char_4.dat', ns=(old + 5, old + 5))
+
+    res = CopyEngine(job).run()
+    assert res.ok
+    assert res.message == 'Successfully copied 1 files to 3 character(s), 3 skipped unchanged'
+    assert [f.name for f in res.copied()] == ['core_char_3.dat']
+    assert (src / 'core_char_3.dat').read_bytes() == b'char one'
+    # identical files are not rewritten, so their mtimes stay as they were
+    assert (src / 'core_char_4.dat').stat().st_mtime_ns == old + 5
+
+
+def test_fan_out_hashes_the_source_once(tmp_path, monkeypatch):
+    src = make_source(tmp_path)
+    old = 1_600_000_000_000_000_000
+    dests = [(str(c), '10') for c in range(100, 120)]
+    for c, _ in dests:
+        out = src / f'core_char_{c}.dat'
+        out.write_bytes(b'char one')
+        os.utime(out, ns=(old, old))
+    os.utime(src / 'core_char_1.dat', ns=(old, old))
+    hashed = []
+    hash_file = filecopy.HashCache._hash
+
+    def slow_hash(path):
+        # long enough for every fan-out worker to be checking at once
+        hashed.append(Path(path).name)
+        time.sleep(0.05)
+        return hash_file(path)
+
+    monkeypatch.setattr(filecopy.HashCache, '_hash', staticmethod(slow_hash))
+    res = CopyEngine(CopyJob(src, src, '1', '10', dests)).run()
+
+    assert res.ok and len(res.unchanged()) == 20
+    assert hashed.count('core_char_1.dat') == 1
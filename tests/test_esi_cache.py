@@ -8,14 +8,19 @@ from eve_backend import esi_client
 
 
 class DummyResponse:
-    def __init__(self, status_code=200, json_data=None, content=b''):
+    def __init__(self, status_code=200, json_data=None, content=b'', headers=None):
         self.status_code = status_code
         self._json = json_data or {}
         self.content = content
+        self.headers = headers or {}
 
     def json(self):
         return self._json
 
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
 
 def test_get_character_caches_json(tmp_path, monkeypatch):
     cache = CacheManager(base=tmp_path)
@@ -29,10 +34,10 @@ def test_get_character_caches_json(tmp_path, monkeypatch):
         assert str(char_id) in url
         return DummyResponse(status_code=200, json_data=payload)
 
-    # requests is imported lazily inside esi_client; inject a fake requests module
-    import types, sys
-    fake_requests = types.SimpleNamespace(get=fake_get)
-    monkeypatch.setitem(sys.modules, 'requests', fake_requests)
+    # requests go through esi_client's shared session; inject a fake one
+    import types
+    fake_session = types.SimpleNamespace(get=fake_get)
+    monkeypatch.setattr(esi_client, '_session', fake_session)
 
     # first call should fetch and cache
     res = esi_client.get_character(char_id, cache=cache)
@@ -46,7 +51,7 @@ def test_get_character_caches_json(tmp_path, monkeypatch):
         raise AssertionError('requests.get should not be called on cached data')
 
     # replace the fake module's get to ensure no network call
-    sys.modules['requests'].get = fail_get
+    esi_client._session.get = fail_get
     res2 = esi_client.get_character(char_id, cache=cache)
     assert res2 == payload
 
@@ -54,15 +59,15 @@ def test_get_character_caches_json(tmp_path, monkeypatch):
 def test_fetch_character_image_caches_file(tmp_path, monkeypatch):
     cache = CacheManager(base=tmp_path)
     char_id = 22222
-    img_bytes = b'PNGDATA'
+    img_bytes = b'\x89PNG\r\n\x1a\n' + b'PNGDATA'
 
-    def fake_get(url, timeout=10):
+    def fake_get(url, timeout=10, stream=False):
         assert str(char_id) in url
         return DummyResponse(status_code=200, content=img_bytes)
 
-    import types, sys
-    fake_requests = types.SimpleNamespace(get=fake_get)
-    monkeypatch.setitem(sys.modules, 'requests', fake_requests)
+    import types
+    fake_session = types.SimpleNamespace(get=fake_get)
+    monkeypatch.setattr(esi_client, '_session', fake_session)
 
     p = esi_client.fetch_character_image(char_id, cache=cache)
     assert p.exists()
@@ -72,6 +77,109 @@ def test_fetch_character_image_caches_file(tmp_path, monkeypatch):
     def fail_get(*args, **kwargs):
         raise AssertionError('requests.get should not be called for cached image')
 
-    sys.modules['requests'].get = fail_get
+    esi_client._session.get = fail_get
     p2 = esi_client.fetch_character_image(char_id, cache=cache)
     assert p2 == p
+
+
+def _install_image_response(monkeypatch, resp):
+    import types
+    monkeypatch.setattr(esi_client, '_session', types.SimpleNamespace(get=lambda url, timeout=10, stream=False: resp))
+
+
+def test_fetch_image_rejects_invalid_signature(tmp_path, monkeypatch):
+    cache = CacheManager(base=tmp_path)
+    _install_image_response(monkeypatch, DummyResponse(status_code=200, content=b'<html>error</html>'))
+
+    assert esi_client.fetch_character_image(33333, cache=cache) is None
+    assert not cache.image_path('33333', 'char', 64).exists()
+    # no temp files left behind
+    assert list((tmp_path / 'img' / 'char').iterdir()) == []
+
+
+def test_fetch_image_enforces_size_cap(tmp_path, monkeypatch):
+    cache = CacheManager(base=tmp_path)
+    data = b'\xff\xd8\xff' + b'x' * 5000
+    _install_image_response(monkeypatch, DummyResponse(status_code=200, content=data))
+
+    assert esi_client.fetch_corporation_logo(44444, cache=cache, max_bytes=1024) is None
+    assert not cache.image_path('44444', 'corp', 64).exists()
+    assert list((tmp_path / 'img' / 'corp').iterdir()) == []
+
+    # a Content-Length above the cap is rejected before reading the body
+    resp = DummyResponse(status_code=200, content=data, headers={'Content-Length': str(len(data))})
+    resp.iter_content = None
+    _install_image_response(monkeypatch, resp)
+    assert esi_client.fetch_corporation_logo(44444, cache=cache, max_bytes=1024) is None
+
+    _install_image_response(monkeypatch, DummyResponse(status_code=200, content=data))
+    p = esi_client.fetch_corporation_logo(44444, cache=cache)
+    assert p.read_bytes() == data
+
+
+def _png_bytes(tmp_path, size):
+    from PySide6.QtGui import QImage
+    img = QImage(size, size, QImage.Format_ARGB32)
+    img.fill(0xff336699)
+    p = tmp_path / f'src_{size}.png'
+    assert img.save(str(p), 'PNG')
+    return p.read_bytes()
+
+
+def test_image_cache_is_keyed_by_size_and_derives_smaller(tmp_path, monkeypatch):
+    from PySide6.QtGui import QImage
+    cache = CacheManager(base=tmp_path / 'cache')
+    data = _png_bytes(tmp_path, 128)
+    requested = []
+
+    def fake_get(url, timeout=10, stream=False):
+        requested.append(url)
+        return DummyResponse(status_code=200, content=data)
+
+    import types
+    monkeypatch.setattr(esi_client, '_session', types.SimpleNamespace(get=fake_get))
+
+    p128 = esi_client.fetch_character_image(555, size=128, cache=cache)
+    assert p128 == cache.image_path('555', 'char', 128)
+    assert len(requested) == 1
+
+    # smaller sizes are generated from the cached 128px copy, not fetched
+    p32 = esi_client.fetch_character_image(555, size=32, cache=cache)
+    assert len(requested) == 1
+    assert p32 == cache.image_path('555', 'char', 32)
+    assert QImage(str(p32)).width() == 32
+    assert set(cache.image_sizes('555', 'char')) == {32, 128}
+
+    # a larger size than anything cached goes to the network
+    esi_client.fetch_character_image(555, size=256, cache=cache)
+    assert len(requested) == 2
+    assert 'size=256' in requested[-1]
+
+
+def test_image_lookups_use_the_directory_index(tmp_path, monkeypatch):
+    from pathlib import Path
+    from eve_backend import cache as cache_mod
+    cache = CacheManager(base=tmp_path / 'cache')
+    png = b'\x89PNG\r\n\x1a\n' + b'0' * 32
+    for i in range(50):
+        cache.save_image_bytes(str(i), 'char', png, size=64)
+    (tmp_path / 'cache' / 'img' / 'char' / '7.png').write_bytes(png)
+
+    def no_glob(self, pattern):
+        raise AssertionError('image lookups must not glob')
+    monkeypatch.setattr(Path, 'glob', no_glob)
+
+    assert cache.image_sizes('7', 'char') == {64: cache.image_path('7', 'char', 64)}
+    assert cache.load_image('3', 'char', 64) == cache.image_path('3', 'char', 64)
+    assert cache.image_fingerprint('3', 'char').startswith('64:')
+    cache.save_image_bytes('3', 'char', png, size=128)
+    assert set(cache.image_sizes('3', 'char')) == {128}
+
+    # files removed behind the index's back are noticed on lookup
+    cache.image_path('4', 'char', 64).unlink()
+    assert cache.load_image('4', 'char', 64, derive=False) is None
+    assert cache.image_fingerprint('4', 'char') is None
+    # files written by someone else show up once the directory is re-checked
+    (tmp_path / 'cache' / 'img' / 'char' / '900_32.png').write_bytes(png)
+    monkeypatch.setattr(cache_mod, 'IMAGE_RECHECK_INTERVAL', 0)
+    assert set(cache.image_sizes('900', 'char')) == {32}
@@ -0,0 +1,72 @@
+import types
+
+import pytest
+
+from eve_backend.cache import CacheManager
+from eve_backend import esi_client
+
+
+@pytest.fixture(autouse=True)
+def reset_breaker():
+    esi_client.circuit_breaker.reset()
+    esi_client.set_offline(False)
+    yield
+    esi_client.circuit_breaker.reset()
+    esi_client.set_offline(False)
+
+
+def test_breaker_opens_after_connection_failures(tmp_path, monkeypatch):
+    cache = CacheManager(base=tmp_path)
+    called = {"count": 0}
+
+    def failing_get(url, timeout=10):
+        called["count"] += 1
+        raise ConnectionError('network down')
+
+    monkeypatch.setattr(esi_client, '_session', types.SimpleNamespace(get=failing_get))
+
+    threshold = esi_client.circuit_breaker.failure_threshold
+    for i in range(threshold + 5):
+        assert esi_client.get_character(1000 + i, cache=cache) is None
+
+    # only the calls up to the threshold reached the network
+    assert called["count"] == threshold
+    assert esi_client.circuit_breaker.state == 'open'
+
+
+def test_breaker_half_open_probe_closes_on_success(tmp_path, monkeypatch):
+    cache = CacheManager(base=tmp_path)
+    breaker = esi_client.circuit_breaker
+
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == 'open'
+
+    # pretend the reset timeout elapsed
+    monkeypatch.setattr(breaker, 'reset_timeout', 0.0)
+    assert breaker.state == 'half_open'
+
+    class Resp:
+        status_code = 200
+
+        def json(self):
+            return {"name": "Back"}
+
+    monkeypatch.setattr(esi_client, '_session', types.SimpleNamespace(get=lambda url, timeout=10: Resp()))
+    assert esi_client.get_character(42, cache=cache) == {"name": "Back"}
+    assert breaker.state == 'closed'
+
+
+def test_offline_mode_serves_cache_only(tmp_path, monkeypatch):
+    cache = CacheManager(base=tmp_path)
+    cache.save_json('7', 'char', {"name": "Cached"})
+
+    def fail_get(*args, **kwargs):
+        raise AssertionError('requests.get should not be called in offline mode')
+
+    monkeypatch.setattr(esi_client, '_session', types.SimpleNamespace(get=fail_get))
+    esi_client.set_offline(True)
+
+    assert esi_client.get_character(7, cache=cache) == {"name": "Cached"}
+    assert esi_client.get_character(8, cache=cache) is None
+    assert esi_client.fetch_corporation_logo(9, cache=cache) is None
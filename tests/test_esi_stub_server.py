@@ -0,0 +1,79 @@
+import json
+
+from eve_backend.cache import CacheManager
+from eve_backend.prefetcher import Prefetcher
+from eve_backend import esi_client
+from esi_stub import ESIStubServer
+
+
+def test_esi_client_against_stub_server(tmp_path, esi_server):
+    cache = CacheManager(base=tmp_path)
+
+    char = esi_client.get_character(101, cache=cache)
+    assert char['name'] == 'Stub Char 101'
+    corp = esi_client.get_corporation(char['corporation_id'], cache=cache)
+    assert corp['name'].startswith('Stub Corp')
+
+    p = esi_client.fetch_character_image(101, size=128, cache=cache)
+    assert p == cache.image_path('101', 'char', 128)
+    assert p.read_bytes().startswith(b'\x89PNG')
+    assert esi_client.fetch_corporation_logo(char['corporation_id'], cache=cache) is not None
+
+    assert len(esi_server.request_log) == 4
+
+
+def test_requests_reuse_pooled_connections(tmp_path, esi_server):
+    cache = CacheManager(base=tmp_path)
+    for cid in range(1, 11):
+        assert esi_client.get_character(cid, cache=cache) is not None
+        assert esi_client.fetch_character_image(cid, cache=cache) is not None
+    assert len(esi_server.request_log) == 20
+    assert esi_server.connections == 1
+
+
+def test_stub_error_rate_and_limit_headers(esi_server):
+    import requests
+    esi_server.error_rate = 1.0
+    r = requests.get(esi_server.esi_base + 'characters/1', timeout=5)
+    assert r.status_code == 502
+    assert int(r.headers['X-ESI-Error-Limit-Remain']) == esi_server.error_limit - 1
+    assert 'X-ESI-Error-Limit-Reset' in r.headers
+
+
+def test_stub_answers_420_when_error_limited():
+    import requests
+    with ESIStubServer(error_rate=1.0, error_limit=2) as srv:
+        for _ in range(2):
+            assert requests.get(srv.esi_base + 'characters/1', timeout=5).status_code == 502
+        r = requests.get(srv.esi_base + 'characters/1', timeout=5)
+        assert r.status_code == 420
+        assert r.headers['X-ESI-Error-Limit-Remain'] == '0'
+
+
+def test_record_and_replay_cassette(tmp_path, monkeypatch):
+    cassette = tmp_path / 'esi.json'
+    with ESIStubServer(record=True) as rec:
+        monkeypatch.setattr(esi_client, 'ESI_BASE', rec.esi_base)
+        monkeypatch.setattr(esi_client, 'IMG_BASE', rec.img_base)
+        esi_client.get_character(7, cache=CacheManager(base=tmp_path / 'a'))
+        rec.save_cassette(str(cassette))
+
+    with ESIStubServer(cassette=str(cassette)) as replay:
+        monkeypatch.setattr(esi_client, 'ESI_BASE', replay.esi_base)
+        monkeypatch.setattr(esi_client, 'IMG_BASE', replay.img_base)
+        cache = CacheManager(base=tmp_path / 'b')
+        assert esi_client.get_character(7, cache=cache)['name'] == 'Stub Char 7'
+        # anything not on the cassette is a 404
+        assert esi_client.get_character(8, cache=cache) is None
+
+
+def test_prefetcher_end_to_end(tmp_path, esi_server):
+    mp = tmp_path / 'mappings.json'
+    mp.write_text(json.dumps({'mappings': {'1': {'chars': ['11', '12']}, '2': {'chars': ['21']}}}))
+    cache = CacheManager(base=tmp_path / 'cache')
+
+    res = Prefetcher(cache=cache, mappings_path=str(mp)).run()
+    assert res['status'] == 'ok'
+    for cid in ('11', '12', '21'):
+        assert cache.load_json(cid, 'char') is not None
+        assert cache.load_image(cid, 'char') is not None
@@ -0,0 +1,101 @@
+import errno
+import os
+
+import pytest
+
+from eve_backend.filecopy import FileCopier, HashCache, same_content
+
+
+def make_src(tmp_path):
+    src = tmp_path / 'core_char_1.dat'
+    src.write_bytes(b'layout' * 1000)
+    os.utime(src, ns=(1_600_000_000_000_000_000, 1_600_000_000_000_000_000))
+    return src
+
+
+def test_copy_preserves_content_and_metadata(tmp_path):
+    src = make_src(tmp_path)
+    dst = tmp_path / 'core_char_2.dat'
+    method = FileCopier().copy(src, dst)
+
+    assert method in ('reflink', 'copy_file_range', 'sendfile', 'userspace')
+    assert dst.read_bytes() == src.read_bytes()
+    assert dst.stat().st_mtime_ns == 1_600_000_000_000_000_000
+
+
+def test_falls_back_and_remembers_unsupported_methods(tmp_path):
+    src = make_src(tmp_path)
+    calls = []
+
+    def broken(in_fd, out_fd, size):
+        calls.append('broken')
+        os.write(out_fd, b'partial')
+        raise OSError(errno.EOPNOTSUPP, 'not here')
+
+    def declines(in_fd, out_fd, size):
+        calls.append('declines')
+        return False
+
+    copier = FileCopier([('broken', broken), ('declines', declines)])
+    assert copier.copy(src, tmp_path / 'a.dat') == 'userspace'
+    assert copier.copy(src, tmp_path / 'b.dat', read=src.read_bytes) == 'userspace'
+    # an unsupported method is skipped from then on; one that made no progress
+    # only failed for that file
+    assert calls == ['broken', 'declines', 'declines']
+    assert (tmp_path / 'a.dat').read_bytes() == src.read_bytes()
+    assert (tmp_path / 'b.dat').read_bytes() == src.read_bytes()
+
+
+def test_per_file_errors_do_not_disable_a_method(tmp_path):
+    src = make_src(tmp_path)
+    errors = [errno.EPERM, None, errno.EINVAL, None]
+
+    def flaky(in_fd, out_fd, size):
+        err = errors.pop(0)
+        if err:
+            raise OSError(err, os.strerror(err))
+        os.write(out_fd, os.pread(in_fd, size, 0))
+        return True
+
+    copier = FileCopier([('flaky', flaky)])
+    methods = [copier.copy(src, tmp_path / f'{i}.dat') for i in range(4)]
+    # EINVAL only means "unsupported" for a method that never worked
+    assert methods == ['userspace', 'flaky', 'userspace', 'flaky']
+
+    def invalid(in_fd, out_fd, size):
+        errors.append('invalid')
+        raise OSError(errno.EINVAL, 'Invalid argument')
+
+    copier = FileCopier([('invalid', invalid)])
+    copier.copy(src, tmp_path / 'x.dat')
+    copier.copy(src, tmp_path / 'y.dat')
+    assert errors == ['invalid']
+
+
+def test_real_errors_are_raised(tmp_path):
+    src = make_src(tmp_path)
+
+    def disk_full(in_fd, out_fd, size):
+        raise OSError(errno.ENOSPC, 'No space left on device')
+
+    with pytest.raises(OSError):
+        FileCopier([('full', disk_full)]).copy(src, tmp_path / 'a.dat')
+
+
+def test_hash_cache_reuses_digests_of_settled_files(tmp_path, monkeypatch):
+    src = make_src(tmp_path)
+    fresh = tmp_path / 'fresh.dat'
+    fresh.write_bytes(src.read_bytes())
+    hashed = []
+    real_hash = HashCache._hash
+    monkeypatch.setattr(HashCache, '_hash', staticmethod(lambda p: hashed.append(p.name) or real_hash(p)))
+    cache = HashCache()
+
+    assert same_content(src, fresh, cache)
+    assert same_content(src, fresh, cache)
+    # the just-written file may still change within its mtime tick, so it is re-hashed
+    assert hashed == ['core_char_1.dat', 'fresh.dat', 'fresh.dat']
+    assert not same_content(src, tmp_path / 'missing.dat', cache)
+    (tmp_path / 'short.dat').write_bytes(b'layout')
+    assert not same_content(src, tmp_path / 'short.dat', cache)
+    assert len(hashed) == 3
@@ -65,3 +65,330 @@ def test_scan_worker_signals():
 
     assert finished_flag['ok'], 'worker did not finish'
     assert getattr(finished_flag['result'], 'success', False)
+
+
+def test_character_grid_lists_visible_characters(tmp_path):
+    import json
+    from gui.all_characters import AllCharactersTab
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    mp = tmp_path / 'mappings.json'
+    mappings = {str(1000 + i): {'chars': [str(500 + 3 * i + j) for j in range(3)]} for i in range(500)}
+    mp.write_text(json.dumps({'mappings': mappings}))
+
+    tab = AllCharactersTab(mappings_path=str(mp))
+    tab.resize(800, 500)
+    tab.show()
+    app.processEvents()
+
+    # one model row per account, no widgets per character
+    assert tab.view.grid_model.rowCount() == 500
+    visible = tab._visible_char_ids()
+    assert visible[:3] == [500, 501, 502]
+    assert len(visible) < 30
+
+    tab.view.verticalScrollBar().setValue(tab.view.verticalScrollBar().maximum())
+    app.processEvents()
+    assert tab._visible_char_ids()[-1] == 500 + 3 * 500 - 1
+    tab.close()
+
+
+def test_portrait_provider_renders_tiles_off_the_gui_thread(tmp_path):
+    from eve_backend.cache import CacheManager
+    from gui.character_grid import PortraitProvider, PORTRAIT_SIDE
+    from esi_stub import make_png
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    cache = CacheManager(base=tmp_path / 'cache')
+    cache.save_json('500', 'char', {'name': 'Pilot', 'corporation_id': 98000001})
+    cache.save_image_bytes('500', 'char', make_png(256, (200, 0, 0)), size=256)
+    provider = PortraitProvider(cache)
+    ready = []
+    provider.tile_ready.connect(ready.append)
+
+    # first request returns a placeholder at once and renders in the background
+    placeholder = provider.pixmap(500, 1.0)
+    assert placeholder.width() == PORTRAIT_SIDE
+    assert provider.info(500) == (None, None)
+    provider.wait_idle(3000)
+    app.processEvents()
+
+    assert ready == [500]
+    assert provider.info(500) == ('Pilot', 98000001)
+    tile = provider.pixmap(500, 1.0).toImage()
+    assert tile.pixelColor(10, 10).red() == 200
+
+
+def test_image_registry_shares_decodes_within_budget():
+    import threading
+    from PySide6.QtGui import QImage
+    from gui.image_registry import ImageRegistry
+
+    def image():
+        img = QImage(20, 20, QImage.Format_ARGB32_Premultiplied)  # 1600 bytes
+        img.fill(0)
+        return img
+
+    reg = ImageRegistry(budget_bytes=4000)
+    decodes = []
+
+    def loader():
+        decodes.append(1)
+        return image()
+
+    threads = [threading.Thread(target=reg.get_or_load, args=(('base', 'corp', '1', 20), loader)) for _ in range(8)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert len(decodes) == 1
+    assert reg.stats()['hits'] == 7 and reg.stats()['bytes'] == 1600
+
+    reg.put(('base', 'corp', '2', 20), image())
+    reg.put(('base', 'corp', '3', 20), image())
+    stats = reg.stats()
+    assert stats['entries'] == 2 and stats['bytes'] <= stats['budget_bytes'] and stats['evictions'] == 1
+    assert reg.get(('base', 'corp', '1', 20)) is None
+
+    reg.discard('base', 'corp', '3')
+    assert reg.stats()['entries'] == 1
+
+
+def test_rendered_tiles_persist_until_a_source_changes(tmp_path, monkeypatch):
+    import gui.character_grid as grid
+    from eve_backend.cache import CacheManager
+    from esi_stub import make_png
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    cache = CacheManager(base=tmp_path / 'cache')
+    cache.save_json('500', 'char', {'name': 'Pilot', 'corporation_id': 98000001})
+    cache.save_image_bytes('500', 'char', make_png(256, (200, 0, 0)), size=256)
+    cache.save_image_bytes('98000001', 'corp', make_png(64, (0, 0, 200)), size=64)
+
+    _, first = grid.compose_tile(cache, 500, 1.0)
+    tiles = list((cache.base / 'img' / 'tile').glob('500_80_*.png'))
+    assert len(tiles) == 1
+
+    # a second render is a single load of the stored tile
+    def no_decode(*args):
+        raise AssertionError('tile should come from disk')
+
+    monkeypatch.setattr(grid, '_load_image', no_decode)
+    _, again = grid.compose_tile(cache, 500, 1.0)
+    assert again.pixelColor(70, 70) == first.pixelColor(70, 70)
+    monkeypatch.undo()
+
+    # a new corp logo changes the key; the outdated tile is removed
+    cache.save_image_bytes('98000001', 'corp', make_png(256, (0, 200, 0)), size=256)
+    _, updated = grid.compose_tile(cache, 500, 1.0)
+    assert updated.pixelColor(70, 70).green() == 200
+    assert [p.name for p in (cache.base / 'img' / 'tile').glob('500_80_*.png')] != [tiles[0].name]
+    assert len(list((cache.base / 'img' / 'tile').glob('500_80_*.png'))) == 1
+
+
+def test_tile_fingerprints_are_memoized_until_forgotten(tmp_path, monkeypatch):
+    from eve_backend.cache import CacheManager
+    from gui.character_grid import TileFingerprints
+    from esi_stub import make_png
+
+    cache = CacheManager(base=tmp_path / 'cache')
+    cache.save_image_bytes('500', 'char', make_png(64, (200, 0, 0)), size=64)
+    fps = TileFingerprints(cache)
+    assert fps.get(500, 'corp') is None
+    first = fps.get(500, 'char')
+    assert first.startswith('64:')
+
+    calls = []
+    real = cache.image_fingerprint
+    monkeypatch.setattr(cache, 'image_fingerprint', lambda *a: calls.append(a) or real(*a))
+    assert fps.get(500, 'char') == first and calls == []
+
+    cache.save_image_bytes('500', 'char', make_png(256, (200, 0, 0)), size=256)
+    fps.forget('char', [500])
+    assert fps.get(500, 'char').startswith('256:') and len(calls) == 1
+
+
+def test_sprite_atlas_packs_cells_and_paints_packed_tiles(tmp_path):
+    from PySide6.QtCore import Qt
+    from PySide6.QtGui import QColor, QImage, QPainter
+    from eve_backend.cache import CacheManager
+    from gui.character_grid import PortraitProvider
+    from gui.sprite_atlas import SpriteAtlas
+    from esi_stub import make_png
+
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    def solid(color):
+        img = QImage(20, 20, QImage.Format_ARGB32_Premultiplied)
+        img.fill(QColor(*color))
+        return img
+
+    atlas = SpriteAtlas(20, sheet_side=64)  # 3x3 cells per sheet
+    for i in range(10):
+        atlas.add(i, solid((i * 20, 0, 0)))
+    assert atlas.sheet_count == 2 and len(atlas) == 10
+    sheet, rect = atlas.locate(4)
+    assert (sheet, rect.x(), rect.y()) == (0, 20, 20)
+    assert atlas.sheet(0).pixelColor(25, 25).red() == 80
+    atlas.remove(4)
+    atlas.add(10, solid((0, 0, 250)))  # reuses the freed cell
+    assert atlas.locate(10) == (0, rect) and atlas.sheet_count == 2
+
+    cache = CacheManager(base=tmp_path / 'cache')
+    for cid in (500, 501):
+        cache.save_json(str(cid), 'char', {'name': f'Pilot {cid}', 'corporation_id': 98000001})
+        cache.save_image_bytes(str(cid), 'char', make_png(256, (200, 0, 0)), size=256)
+    cache.save_image_bytes('98000001', 'corp', make_png(64, (0, 0, 200)), size=64)
+    provider = PortraitProvider(cache)
+    provider.build_atlases([500, 501], 1.0)
+    provider.wait_idle(3000)
+    app.processEvents()
+    assert provider.info(501) == ('Pilot 501', 98000001)
+
+    out = QImage(80, 80, QImage.Format_ARGB32_Premultiplied)
+    out.fill(0)
+    painter = QPainter(out)
+    provider.draw_tile(painter, 0, 0, 501, 1.0)
+    painter.end()
+    assert out.pixelColor(10, 10).red() == 200
+    assert out.pixelColor(70, 70).blue() == 200
+
+    # an invalidated character falls back to its own (here: not yet rendered) tile
+    provider.invalidate([501])
+    painter = QPainter(out)
+    provider.draw_tile(painter, 0, 0, 501, 1.0)
+    painter.end()
+    assert out.pixelColor(10, 10) == QColor(Qt.lightGray)
+    provider.wait_idle(3000)
+    app.processEvents()
+
+
+def test_atlases_are_built_one_sheet_per_job(tmp_path, monkeypatch):
+    import gui.character_grid as grid
+    from eve_backend.cache import CacheManager
+    from esi_stub import make_png
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    cache = CacheManager(base=tmp_path / 'cache')
+    for cid in (500, 501, 502):
+        cache.save_json(str(cid), 'char', {'name': f'Pilot {cid}', 'corporation_id': 98000001})
+        cache.save_image_bytes(str(cid), 'char', make_png(80, (200, 0, 0)), size=80)
+    cache.save_image_bytes('98000001', 'corp', make_png(64, (0, 0, 200)), size=64)
+    monkeypatch.setattr(grid, 'DEFAULT_SHEET_SIDE', 160)  # 2x2 portraits per sheet
+    for cid in (503, 504):
+        cache.save_image_bytes(str(cid), 'char', make_png(80, (200, 0, 0)), size=80)
+    jobs = []
+    real_job = grid._AtlasJob
+    monkeypatch.setattr(grid, '_AtlasJob', lambda cache, ids, *a: jobs.append(list(ids)) or real_job(cache, ids, *a))
+    provider = grid.PortraitProvider(cache)
+    provider.build_atlases([500, 501, 502, 503, 504], 1.0)
+    provider.wait_idle(3000)
+    app.processEvents()
+
+    assert jobs == [[500, 501, 502, 503], [504]]
+    assert sorted(len(p) for p, _ in provider._atlases[1.0]) == [1, 4]
+    assert provider.info(502) == ('Pilot 502', 98000001)
+
+
+def test_grid_model_applies_roster_changes_incrementally():
+    from gui.character_grid import AccountRole, CharacterGridModel, CharsRole
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    model = CharacterGridModel()
+    accounts = [(str(1000 + i), [500 + i]) for i in range(100)]
+    model.set_accounts(accounts)
+    signals = []
+    model.modelReset.connect(lambda: signals.append('reset'))
+    model.rowsRemoved.connect(lambda _, first, last: signals.append(('removed', first, last)))
+    model.rowsInserted.connect(lambda _, first, last: signals.append(('inserted', first, last)))
+    model.rowsMoved.connect(lambda *args: signals.append('moved'))
+    model.dataChanged.connect(lambda top, bottom, roles: signals.append(('changed', top.row())))
+
+    # deleting one account out of 100 is a single row removal
+    del accounts[42]
+    assert model.set_accounts(accounts) == {'removed': 1, 'inserted': 0, 'moved': 0, 'changed': 0}
+    assert signals == [('removed', 42, 42)]
+
+    del signals[:]
+    accounts.insert(0, ('999', [1, 2]))
+    accounts[5] = (accounts[5][0], [9000, 9001])
+    accounts[10], accounts[11] = accounts[11], accounts[10]
+    stats = model.set_accounts(accounts)
+    assert stats == {'removed': 0, 'inserted': 1, 'moved': 1, 'changed': 1}
+    assert 'reset' not in signals
+    assert [model.index(r, 0).data(AccountRole) for r in range(model.rowCount())] == [a for a, _ in accounts]
+    assert list(model.index(5, 0).data(CharsRole)) == [9000, 9001]
+    assert sorted(model.char_ids()) == sorted(c for _, chars in accounts for c in chars)
+
+
+def test_prefetch_items_mark_only_affected_tiles_dirty(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from gui.all_characters import AllCharactersTab
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    tab = AllCharactersTab(mappings_path=str(tmp_path / 'mappings.json'))
+    tab._on_prefetch_item('char', 500)
+    tab._on_prefetch_item('corp', 98000001)
+    tab._on_prefetch_item('logo', 98000002)
+    # corp JSON changes no image, so its characters' tiles are left alone
+    assert tab._dirty_chars == {500}
+    assert tab._dirty_corps == {98000002}
+    tab._refresh_timer.stop()
+
+
+def test_finished_prefetch_keeps_its_summary(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from gui.all_characters import AllCharactersTab
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    tab = AllCharactersTab(mappings_path=str(tmp_path / 'mappings.json'))
+    tab._on_prefetch_finished({'status': 'ok', 'done': 480, 'cached': 440, 'fetched': 37, 'failed': 3,
+                               'deferred': 2})
+    assert tab.progress_label.text() == 'Done — 37 fetched, 440 already cached, 3 failed, 2 deferred'
+    tab._on_prefetch_finished({'status': 'cancelled', 'done': 7, 'fetched': 6})
+    assert tab.progress_label.text() == 'Cancelled — 6 fetched'
+
+
+def test_copy_button_stays_disabled_while_copying(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from gui.copy_config import CopyConfigTab
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    tab = CopyConfigTab(mappings_path=str(tmp_path / 'mappings.json'))
+    tab._current_character_id = '1'
+    monkeypatch.setattr(tab, 'get_selected_characters', lambda: ['2'])
+    tab._copy_active = True
+    tab._update_copy_preview()
+    assert not tab.copy_btn.isEnabled()
+    tab._copy_active = False
+    tab._update_copy_preview()
+    assert tab.copy_btn.isEnabled()
+
+
+def test_shutdown_waits_for_a_running_prefetch(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from gui.all_characters import AllCharactersTab
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    tab = AllCharactersTab(mappings_path=str(tmp_path / 'mappings.json'))
+    tab._on_prefetch()
+    thread = tab._thread
+    tab.shutdown()
+    assert not thread.isRunning()
+
+
+def test_main_window_idle_tracks_jobs_and_input(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    from PySide6.QtCore import QEvent, Qt
+    from PySide6.QtGui import QKeyEvent
+    import main
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    win = main.MainWindow()
+    win._last_input -= main.USER_IDLE_SECONDS
+    assert win._is_idle()
+    win.copy_config_tab.busy_changed.emit(True)
+    assert not win._is_idle()
+    win.copy_config_tab.busy_changed.emit(False)
+    assert win._is_idle()
+    QApplication.sendEvent(win, QKeyEvent(QEvent.KeyPress, Qt.Key_A, Qt.NoModifier))
+    assert not win._is_idle()
+    app.removeEventFilter(win)
@@ -0,0 +1,52 @@
+import json
+
+from eve_backend.mappings import MappingsModel, shared_mappings
+
+
+def write(path, mappings, dat_roots=()):
+    path.write_text(json.dumps({'dat_roots': list(dat_roots), 'mappings': mappings}))
+
+
+def test_snapshot_indexes_and_status(tmp_path):
+    mp = tmp_path / 'mappings.json'
+    model = MappingsModel(mp)
+    assert model.snapshot().status == 'missing'
+
+    write(mp, {'20': {'chars': ['3', 1]}, '3': {'chars': ['2']}}, dat_roots=['/eve'])
+    snap = model.snapshot()
+    assert snap.ok and snap.accounts == ['3', '20']
+    assert snap.account_of(1) == '20' and snap.account_of('2') == '3' and snap.account_of(9) is None
+    assert snap.chars_of('20') == ('3', '1')
+    assert snap.char_ids() == [1, 2, 3]
+    assert str(snap.first_dat_root()) == '/eve'
+    # unchanged file: same snapshot object, no re-parse
+    assert model.snapshot() is snap
+
+    mp.write_text('{broken')
+    assert model.snapshot().status == 'bad'
+
+
+def test_rewrites_are_detected_and_announced(tmp_path):
+    mp = tmp_path / 'mappings.json'
+    write(mp, {'1': {'chars': ['10']}})
+    model = MappingsModel(mp)
+    model.snapshot()
+    changes = []
+    model.subscribe(lambda old, new: changes.append((old.account_of(10), new.account_of(10))))
+
+    # same size, and likely the same mtime tick: caught by the racy-load content check
+    write(mp, {'2': {'chars': ['10']}})
+    assert model.refresh()
+    assert changes == [('1', '2')]
+    assert not model.refresh()
+
+    assert model.remove_account('2')
+    assert not model.remove_account('2')
+    assert changes[-1] == ('2', None)
+    assert json.loads(mp.read_text())['mappings'] == {}
+
+
+def test_shared_instance_per_path(tmp_path):
+    mp = tmp_path / 'mappings.json'
+    assert shared_mappings(mp) is shared_mappings(str(mp))
+    assert shared_mappings(mp) is not shared_mappings(tmp_path / 'other.json')
@@ -0,0 +1,47 @@
+import time
+
+from eve_backend.name_index import NameIndex
+
+
+def test_lookups_both_ways():
+    index = NameIndex([('500', 'Amarr Trader'), ('501', 'Caldari Pilot'), ('502', None)])
+    assert index.name_of(501) == 'Caldari Pilot'
+    assert index.name_of('502') == '502'
+    assert index.id_of('Amarr Trader') == '500'
+    assert index.id_of('amarr trader') == '500'
+    assert index.id_of('nobody') is None
+
+
+def test_search_ranks_prefix_word_substring_then_fuzzy():
+    index = NameIndex(enumerate(['Jita Trader', 'Trader Joe', 'Pilot Smith', 'Smithers', 'Blacksmith X',
+                                 'Completely Different']))
+    assert index.search('trad') == ['Trader Joe', 'Jita Trader']
+    assert index.search('smith') == ['Smithers', 'Pilot Smith', 'Blacksmith X']
+    # typo: no exact substring, but most trigrams match
+    assert index.search('traderr')[:2] == ['Jita Trader', 'Trader Joe']
+    assert index.search('', limit=2) == ['Blacksmith X', 'Completely Different']
+
+
+def test_search_over_large_roster_is_fast():
+    index = NameIndex((str(i), f'Pilot {i:05d} Of Corp {i % 97}') for i in range(5000))
+    start = time.perf_counter()
+    for q in ('pil', 'corp 4', '01234', 'plot 0123'):
+        assert index.search(q, limit=50)
+    assert (time.perf_counter() - start) / 4 < 0.016
+
+
+def test_short_queries_match_substrings_and_duplicate_names_keep_all_ids():
+    index = NameIndex([('1', 'Gabriel'), ('2', 'Abigail'), ('3', 'Zed'), ('4', 'Gabriel')])
+    assert index.search('ab') == ['Abigail', 'Gabriel']
+    assert index.search('d') == ['Zed']
+    assert index.id_of('gabriel') == '1'
+    assert index.ids_of('Gabriel') == ['1', '4']
+
+
+def test_characters_sharing_a_name_get_their_own_labels():
+    index = NameIndex([('1', 'Gabriel'), ('2', 'Abigail'), ('4', 'Gabriel')])
+    assert index.search_labels('gab') == ['Gabriel (1)', 'Gabriel (4)']
+    assert index.search_labels('abi') == ['Abigail']
+    assert index.label_of('4') == 'Gabriel (4)'
+    assert index.id_of_label('Gabriel (4)') == '4'
+    assert index.id_of_label('Abigail') == '2'
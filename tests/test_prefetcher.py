@@ -0,0 +1,284 @@
+import json
+import re
+import threading
+import time
+
+from eve_backend.cache import CacheManager
+from eve_backend.prefetcher import Prefetcher, CancelToken
+
+
+def write_mappings(path, n_chars, per_account=3):
+    mappings = {}
+    for i in range(n_chars):
+        mappings.setdefault(str(1000 + i // per_account), {'chars': []})['chars'].append(str(500 + i))
+    path.write_text(json.dumps({'mappings': mappings}))
+
+
+def test_pipeline_runs_concurrently_and_dedupes_corps(tmp_path, esi_server):
+    esi_server.latency = 0.05
+    esi_server.corp_count = 3
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 24)
+    messages = []
+
+    t0 = time.perf_counter()
+    res = Prefetcher(cache=CacheManager(base=tmp_path / 'cache'), mappings_path=str(mp), workers=8).run(
+        progress_callback=messages.append)
+    elapsed = time.perf_counter() - t0
+
+    assert res == {'status': 'ok', 'done': 24, 'cached': 0, 'fetched': 24, 'failed': 0, 'deferred': 0}
+    # 24 chars * 2 requests + 3 corps * 2 requests, sequentially >= 2.7s
+    assert elapsed < 1.5
+    paths = esi_server.request_log
+    assert len([p for p in paths if '/latest/corporations/' in p]) == 3
+    assert len([p for p in paths if p.startswith('/corporations/')]) == 3
+
+    counts = [tuple(map(int, m.groups())) for m in (re.search(r'\((\d+)/(\d+)\)', x) for x in messages) if m]
+    assert [c[0] for c in counts] == list(range(1, 25))
+    assert all(c[1] == 24 for c in counts)
+    assert messages[0] == '0 of 24 already cached'
+    assert messages[-1] == 'prefetch complete'
+
+
+def test_pipeline_cancel(tmp_path, esi_server):
+    esi_server.latency = 0.02
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 200)
+    token = CancelToken()
+
+    def on_progress(msg):
+        if msg.startswith('Fetched char'):
+            token.cancel()
+
+    res = Prefetcher(cache=CacheManager(base=tmp_path / 'cache'), mappings_path=str(mp), workers=2).run(
+        progress_callback=on_progress, cancel_token=token)
+    assert res['status'] == 'cancelled'
+    assert res['done'] < 200
+
+
+def test_cancel_returns_promptly_during_slow_requests(tmp_path, esi_server):
+    esi_server.latency = 3.0
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 12)
+    token = CancelToken()
+    cache = CacheManager(base=tmp_path / 'cache')
+    timer = threading.Timer(0.2, token.cancel)
+    timer.start()
+
+    t0 = time.perf_counter()
+    res = Prefetcher(cache=cache, mappings_path=str(mp), workers=4).run(cancel_token=token)
+    elapsed = time.perf_counter() - t0
+
+    assert res == {'status': 'cancelled', 'done': 0, 'fetched': 0}
+    assert elapsed < 2.0
+    # cancelled items stay planned for the next run instead of being marked failed
+    journal = json.loads((cache.base / 'prefetch_journal.json').read_text())
+    assert journal['failures'] == {}
+    assert 'char:500' in journal['planned']
+
+
+def test_cancel_leaves_nothing_running_behind(tmp_path, esi_server):
+    esi_server.latency = 0.5
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 12)
+    token = CancelToken()
+    cache = CacheManager(base=tmp_path / 'cache')
+    items = []
+    timer = threading.Timer(0.1, token.cancel)
+    timer.start()
+
+    res = Prefetcher(cache=cache, mappings_path=str(mp), workers=4).run(
+        cancel_token=token, item_callback=lambda stage, id: items.append((stage, id)))
+    assert res['status'] == 'cancelled'
+    assert not [t for t in threading.enumerate() if t.name.startswith('prefetch-')]
+
+    # the abandoned requests get their answers now; none of them is written
+    time.sleep(0.8)
+    assert items == []
+    assert all(cache.load_json(str(500 + i), 'char') is None for i in range(12))
+
+
+def test_progress_events_report_stages_requests_and_bytes(tmp_path, esi_server):
+    esi_server.corp_count = 2
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 6)
+    events = []
+
+    Prefetcher(cache=CacheManager(base=tmp_path / 'cache'), mappings_path=str(mp), workers=2).run(
+        event_callback=events.append)
+
+    assert events[0].kind == 'plan'
+    assert events[0].message == '0 of 6 already cached'
+    last = events[-1]
+    assert last.kind == 'complete' and last.eta == 0.0
+    assert last.stages['char'] == {'total': 6, 'done': 6, 'errors': 0}
+    assert last.stages['portrait'] == {'total': 6, 'done': 6, 'errors': 0}
+    assert last.stages['corp'] == {'total': 2, 'done': 2, 'errors': 0}
+    assert last.stages['logo'] == {'total': 2, 'done': 2, 'errors': 0}
+    assert (last.done, last.total) == (16, 16)
+    assert last.requests == len(esi_server.request_log) == 16
+    assert last.bytes > 0 and last.rate > 0
+    # events are plain data for JSON-lines output
+    assert json.loads(json.dumps(last.to_dict()))['stages']['corp']['done'] == 2
+
+
+def test_prioritized_characters_are_fetched_first(tmp_path, esi_server):
+    esi_server.latency = 0.01
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 30)
+    pre = Prefetcher(cache=CacheManager(base=tmp_path / 'cache'), mappings_path=str(mp), workers=1)
+    pre.prioritize([525, 526])
+    fetched = []
+
+    def on_progress(msg):
+        if msg.startswith('Fetched char'):
+            fetched.append(int(msg.split()[2]))
+            if len(fetched) == 3:
+                # the user scrolled: reprioritize while the run is in progress
+                pre.prioritize([529, 510])
+
+    pre.run(progress_callback=on_progress)
+    assert fetched[:2] == [525, 526]
+    assert fetched.index(529) < 7 and fetched.index(510) < 8
+    assert sorted(fetched) == list(range(500, 530))
+
+
+def test_item_callback_reports_each_cached_entity(tmp_path, esi_server):
+    esi_server.corp_count = 2
+    esi_server.missing_ids = {503}
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 4)
+    items = []
+
+    Prefetcher(cache=CacheManager(base=tmp_path / 'cache'), mappings_path=str(mp)).run(
+        item_callback=lambda stage, id: items.append((stage, id)))
+
+    assert sorted(i for s, i in items if s == 'char') == [500, 501, 502]
+    assert sorted(i for s, i in items if s == 'portrait') == [500, 501, 502]
+    assert sorted(i for s, i in items if s == 'corp') == [98000000, 98000001]
+    assert sorted(i for s, i in items if s == 'logo') == [98000000, 98000001]
+
+
+def test_warm_cache_prefetch_skips_network(tmp_path, esi_server):
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 30)
+    cache = CacheManager(base=tmp_path / 'cache')
+    Prefetcher(cache=cache, mappings_path=str(mp)).run()
+    served = len(esi_server.request_log)
+
+    messages = []
+    t0 = time.perf_counter()
+    res = Prefetcher(cache=cache, mappings_path=str(mp)).run(progress_callback=messages.append)
+    assert time.perf_counter() - t0 < 0.5
+    assert res == {'status': 'ok', 'done': 30, 'cached': 30, 'fetched': 0, 'failed': 0, 'deferred': 0}
+    assert messages == ['30 of 30 already cached', 'prefetch complete']
+    assert len(esi_server.request_log) == served
+
+
+def test_plan_lists_only_missing_items(tmp_path, esi_server):
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 6)
+    cache = CacheManager(base=tmp_path / 'cache')
+    pre = Prefetcher(cache=cache, mappings_path=str(mp))
+    pre.run()
+
+    # drop one portrait, one character JSON and one corp logo
+    for p in cache.image_sizes('501', 'char').values():
+        p.unlink()
+    cache.json_path('502', 'char').unlink()
+    corp_id = cache.load_json('503', 'char')['corporation_id']
+    for p in cache.image_sizes(str(corp_id), 'corp').values():
+        p.unlink()
+
+    plan = pre.plan(list(range(500, 506)))
+    assert plan.portraits == [501]
+    assert plan.chars == [502]
+    assert plan.logos == [corp_id]
+    assert plan.corps == []
+    assert plan.cached == 4
+
+    served = len(esi_server.request_log)
+    pre.run()
+    assert len(esi_server.request_log) - served == 3
+
+
+def test_failed_items_back_off_across_runs(tmp_path, esi_server):
+    esi_server.missing_ids = {501}
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 3)
+    cache = CacheManager(base=tmp_path / 'cache')
+
+    res = Prefetcher(cache=cache, mappings_path=str(mp)).run()
+    assert (res['fetched'], res['failed']) == (2, 1)
+    journal = json.loads((tmp_path / 'cache' / 'prefetch_journal.json').read_text())
+    assert journal['failures']['char:501']['attempts'] == 1
+    assert 'portrait:501' in journal['failures']
+    assert journal['planned'] == []
+
+    # the next run does not hit the network for items still in backoff
+    served = len(esi_server.request_log)
+    messages = []
+    res = Prefetcher(cache=cache, mappings_path=str(mp)).run(progress_callback=messages.append)
+    assert res['deferred'] == 2
+    assert '2 failed item(s) deferred until retry' in messages
+    assert len(esi_server.request_log) == served
+
+
+def test_unanswered_requests_stay_pending(tmp_path, esi_server, monkeypatch):
+    from eve_backend import esi_client
+    # keep the breaker closed: failures below its threshold must not be journaled either
+    monkeypatch.setattr(esi_client.circuit_breaker, 'failure_threshold', 1000)
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 2)
+    cache = CacheManager(base=tmp_path / 'cache')
+
+    esi_server.error_rate = 1.0  # every request answered with 502
+    Prefetcher(cache=cache, mappings_path=str(mp)).run()
+    journal = json.loads((cache.base / 'prefetch_journal.json').read_text())
+    assert journal['failures'] == {}
+    assert set(journal['planned']) == {'char:500', 'char:501', 'portrait:500', 'portrait:501'}
+
+    # nothing listening: connection errors
+    monkeypatch.setattr(esi_client, 'ESI_BASE', 'http://127.0.0.1:9/latest/')
+    monkeypatch.setattr(esi_client, 'IMG_BASE', 'http://127.0.0.1:9/')
+    res = Prefetcher(cache=cache, mappings_path=str(mp)).run()
+    assert res['deferred'] == 0
+    journal = json.loads((cache.base / 'prefetch_journal.json').read_text())
+    assert journal['failures'] == {}
+    assert len(journal['planned']) == 4
+
+
+def test_wrong_size_portrait_is_not_taken_for_the_planned_one(tmp_path, esi_server, monkeypatch):
+    from eve_backend import esi_client
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 1)
+    cache = CacheManager(base=tmp_path / 'cache')
+    cache.save_image_stream('500', 'char', [b'\x89PNG\r\n\x1a\n' + b'PNGDATA'], size=64)
+    items = []
+
+    monkeypatch.setattr(esi_client.circuit_breaker, 'offline', True)
+    Prefetcher(cache=cache, mappings_path=str(mp)).run(item_callback=lambda stage, id: items.append(stage))
+    assert items == []
+    journal = json.loads((cache.base / 'prefetch_journal.json').read_text())
+    assert 'portrait:500' in journal['planned']
+
+
+def test_interrupted_run_is_resumed_first(tmp_path, esi_server):
+    from eve_backend.prefetch_journal import PrefetchJournal
+
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, 6)
+    cache = CacheManager(base=tmp_path / 'cache')
+    # pretend an earlier run planned 504/505 and was interrupted
+    PrefetchJournal(cache.base / 'prefetch_journal.json').start(['char:505', 'portrait:504'])
+
+    pre = Prefetcher(cache=cache, mappings_path=str(mp))
+    plan = pre.plan(list(range(500, 506)))
+    plan.apply_journal(pre.journal)
+    assert plan.work_chars[:2] == [505, 504]
+
+    messages = []
+    Prefetcher(cache=cache, mappings_path=str(mp), workers=1).run(progress_callback=messages.append)
+    fetched = [m.split()[2] for m in messages if m.startswith('Fetched char')]
+    assert fetched[:2] == ['505', '504']
+    assert json.loads((cache.base / 'prefetch_journal.json').read_text())['planned'] == []
@@ -0,0 +1,58 @@
+from eve_backend.profiles import ProfileIndex, RECHECK_INTERVAL
+
+SERVER = 'c_ccp_eve_tq_tranquility'
+
+
+def make_profile(root, name, files=()):
+    d = root / SERVER / f'settings_{name}'
+    d.mkdir(parents=True)
+    for f in files:
+        (d / f).write_bytes(b'x')
+    return d
+
+
+def test_profiles_are_indexed_case_insensitively(tmp_path):
+    make_profile(tmp_path, 'Default', ['core_char_1.dat', 'core_user_9.dat'])
+    make_profile(tmp_path, 'pvp')
+    (tmp_path / SERVER / 'cache').mkdir()
+    (tmp_path / SERVER / 'settings_notes.txt').write_text('not a profile')
+    index = ProfileIndex(tmp_path)
+
+    assert [p.name for p in index.profiles(SERVER)] == ['Default', 'pvp']
+    assert index.find(SERVER, 'default').dir_name == 'settings_Default'
+    assert index.has_profile(SERVER, 'settings_PVP')
+    assert not index.has_profile(SERVER, 'notes.txt')
+    assert index.has_file(SERVER, 'settings_Default', 'core_user_9.dat')
+    assert not index.has_file(SERVER, 'settings_Default', 'core_user_8.dat')
+    assert index.profiles('c_ccp_eve_sisi_singularity') == []
+
+
+def test_listing_follows_directory_changes(tmp_path):
+    now = [0.0]
+    make_profile(tmp_path, 'Default')
+    index = ProfileIndex(tmp_path, clock=lambda: now[0])
+    assert not index.has_profile(SERVER, 'new')
+
+    make_profile(tmp_path, 'New', ['core_char_5.dat'])
+    # within the recheck interval the cached listing is served as is
+    assert not index.has_profile(SERVER, 'new')
+    now[0] += RECHECK_INTERVAL
+    assert index.has_file(SERVER, 'new', 'core_char_5.dat')
+
+    (tmp_path / SERVER / 'settings_New' / 'core_user_7.dat').write_bytes(b'x')
+    index.invalidate(SERVER)
+    assert index.has_file(SERVER, 'new', 'core_user_7.dat')
+
+
+def test_profiles_differing_only_in_case_are_both_kept(tmp_path, caplog):
+    make_profile(tmp_path, 'Foo', ['core_char_1.dat'])
+    make_profile(tmp_path, 'foo', ['core_char_2.dat'])
+    index = ProfileIndex(tmp_path)
+
+    assert [p.dir_name for p in index.profiles(SERVER)] == ['settings_Foo', 'settings_foo']
+    assert index.has_file(SERVER, 'settings_foo', 'core_char_2.dat')
+    assert index.has_file(SERVER, 'Foo', 'core_char_1.dat')
+    assert index.find(SERVER, 'FOO').dir_name == 'settings_Foo'
+    assert [[p.dir_name for p in group] for group in index.case_collisions(SERVER)] == [
+        ['settings_Foo', 'settings_foo']]
+    assert 'differing only in case' in caplog.text
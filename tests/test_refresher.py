@@ -0,0 +1,121 @@
+import json
+import os
+import time
+
+from eve_backend.cache import CacheManager
+from eve_backend.prefetcher import Prefetcher
+from eve_backend.refresher import CacheRefresher, RequestBudget
+
+
+def write_mappings(path, char_ids):
+    path.write_text(json.dumps({'mappings': {'1000': {'chars': [str(c) for c in char_ids]}}}))
+
+
+def age(cache, kind, id, seconds):
+    p = cache.json_path(str(id), kind)
+    t = time.time() - seconds
+    os.utime(p, (t, t))
+
+
+def test_request_budget_refills_per_hour():
+    now = [0.0]
+    budget = RequestBudget(360, clock=lambda: now[0])
+    # five minutes' worth (30 requests) may be spent at once, then one per 10s
+    assert sum(budget.try_acquire() for _ in range(40)) == 30
+    assert budget.wait_time() == 10.0
+    now[0] += 10
+    assert budget.try_acquire() and not budget.try_acquire()
+
+
+def test_refresh_detects_corp_change_and_stale_entries(tmp_path, esi_server):
+    esi_server.corp_count = 2
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, range(500, 506))
+    cache = CacheManager(base=tmp_path / 'cache')
+    Prefetcher(cache=cache, mappings_path=str(mp)).run()
+
+    esi_server.corp_overrides[501] = 98000042
+    age(cache, 'char', 503, 10 * 24 * 3600)
+    del esi_server.request_log[:]
+
+    refresher = CacheRefresher(cache=cache, mappings_path=str(mp), requests_per_hour=3600)
+    res = refresher.run_once()
+
+    assert res == {'status': 'ok', 'requests': 5, 'changed': 1, 'refreshed': 1}
+    assert cache.load_json('501', 'char')['corporation_id'] == 98000042
+    assert cache.load_json('98000042', 'corp') is not None
+    assert cache.load_image('98000042', 'corp') is not None
+    log = esi_server.request_log
+    assert log.count('/latest/characters/affiliation/') == 1
+    assert '/latest/characters/503' in log
+    assert '/latest/characters/500' not in log
+
+    # affiliations were just checked and nothing is stale any more
+    assert refresher.run_once() == {'status': 'ok', 'requests': 0, 'changed': 0, 'refreshed': 0}
+
+
+def test_stale_pass_skips_corps_without_roster_characters(tmp_path, esi_server):
+    esi_server.corp_count = 1
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, range(500, 503))
+    cache = CacheManager(base=tmp_path / 'cache')
+    Prefetcher(cache=cache, mappings_path=str(mp)).run()
+    cache.save_json('98000077', 'corp', {'name': 'Former corp'})
+    age(cache, 'corp', 98000000, 10 * 24 * 3600)
+    age(cache, 'corp', 98000077, 10 * 24 * 3600)
+    del esi_server.request_log[:]
+
+    res = CacheRefresher(cache=cache, mappings_path=str(mp), requests_per_hour=3600).run_once()
+    assert res['refreshed'] == 1
+    assert '/latest/corporations/98000000' in esi_server.request_log
+    assert '/latest/corporations/98000077' not in esi_server.request_log
+
+
+def test_refresh_stops_when_budget_is_spent(tmp_path, esi_server):
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, range(500, 510))
+    cache = CacheManager(base=tmp_path / 'cache')
+    Prefetcher(cache=cache, mappings_path=str(mp)).run()
+    for cid in range(500, 510):
+        age(cache, 'char', cid, 10 * 24 * 3600)
+
+    now = [0.0]
+    budget = RequestBudget(36, clock=lambda: now[0])  # three requests available
+    refresher = CacheRefresher(cache=cache, mappings_path=str(mp), budget=budget)
+    res = refresher.run_once()
+    assert res['status'] == 'budget'
+    assert res['requests'] == 3 and res['refreshed'] == 2
+
+    busy = CacheRefresher(cache=cache, mappings_path=str(mp), is_idle=lambda: False)
+    assert busy.run_once()['status'] == 'busy'
+
+
+def test_refresh_resumes_after_circuit_breaker_trips(tmp_path, esi_server, monkeypatch):
+    from eve_backend import esi_client, refresher as refresher_mod
+    mp = tmp_path / 'mappings.json'
+    write_mappings(mp, range(500, 503))
+    cache = CacheManager(base=tmp_path / 'cache')
+    Prefetcher(cache=cache, mappings_path=str(mp)).run()
+    age(cache, 'char', 501, 10 * 24 * 3600)
+
+    breaker = esi_client.circuit_breaker
+    monkeypatch.setattr(breaker, 'reset_timeout', 0.2)
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    refresher = CacheRefresher(cache=cache, mappings_path=str(mp), requests_per_hour=3600)
+    assert refresher.run_once()['status'] == 'unavailable'
+
+    # past reset_timeout the breaker is half-open: the background loop sends the probe
+    monkeypatch.setattr(refresher_mod, 'PASS_INTERVAL', 0.05)
+    time.sleep(0.25)
+    assert breaker.state == 'half_open'
+    del esi_server.request_log[:]
+    refresher.start()
+    try:
+        deadline = time.monotonic() + 5
+        while '/latest/characters/501' not in esi_server.request_log and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        refresher.stop()
+    assert '/latest/characters/501' in esi_server.request_log
+    assert breaker.state == 'closed'